@@ -1,7 +1,273 @@
+import math
+import threading
+from collections import deque
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from typing import Dict, List, Tuple
+from typing import Dict, Hashable, List, Tuple
+from .indicator_cache import indicator_cache
+
+INDICATOR_COLUMNS = [
+    'rsi', 'macd', 'macd_signal', 'macd_hist',
+    'sma_20', 'sma_50', 'ema_20',
+    'bb_upper', 'bb_middle', 'bb_lower'
+]
+
+# Mask name and the signal tuple it stands for, in generate_signals order
+SIGNAL_RULES = [
+    ('rsi_buy', ("RSI", "Oversold", "BUY")),
+    ('rsi_sell', ("RSI", "Overbought", "SELL")),
+    ('macd_buy', ("MACD", "Bullish Crossover", "BUY")),
+    ('macd_sell', ("MACD", "Bearish Crossover", "SELL")),
+    ('ma_buy', ("MA", "Price crossed above SMA20", "BUY")),
+    ('ma_sell', ("MA", "Price crossed below SMA20", "SELL")),
+]
+
+
+def _lagged(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    """Shift ``values`` forward along the time axis, padding with NaN"""
+    out = np.full(values.shape, np.nan)
+    out[periods:] = values[:-periods]
+    return out
+
+
+def _rolling_moments(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Trailing mean and sample std over axis 0 with pandas' min_periods=window"""
+    valid = ~np.isnan(values)
+    first = valid.argmax(axis=0)
+    reference = np.take_along_axis(values, first[np.newaxis], axis=0)[0]
+    reference = np.where(np.isnan(reference), 0.0, reference)
+    shifted = np.where(valid, values - reference, 0.0)
+
+    def window_sum(x):
+        total = np.cumsum(x, axis=0)
+        out = total.copy()
+        out[window:] = total[window:] - total[:-window]
+        return out
+
+    counts = window_sum(valid.astype(np.int64))
+    nonzero = window_sum((valid & (values != 0)).astype(np.int64))
+    total = window_sum(shifted)
+    total_sq = window_sum(shifted * shifted)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(nonzero == 0, 0.0, reference + total / window)
+        variance = (total_sq - total * total / window) / (window - 1)
+        std = np.sqrt(np.maximum(variance, 0.0))
+    full = counts == window
+    return np.where(full, mean, np.nan), np.where(full, std, np.nan)
+
+
+def _ewm_mean(values: np.ndarray, span: int) -> np.ndarray:
+    """``ewm(span=...).mean()`` along axis 0 with pandas' adjust=True weights.
+
+    The recursion is evaluated in blocks with cumulative sums so there is
+    no Python loop per row; each block is short enough that the rescaling
+    factors stay well inside float64 range.
+    """
+    decay = 1 - 2 / (span + 1)
+    valid = ~np.isnan(values)
+    x = np.where(valid, values, 0.0)
+    weights = valid.astype(float)
+    block = max(1, int(300 / -math.log(decay)))
+    trailing = (1,) * (values.ndim - 1)
+
+    out = np.empty(values.shape)
+    numerator = np.zeros(values.shape[1:])
+    denominator = np.zeros(values.shape[1:])
+    for start in range(0, len(values), block):
+        stop = min(start + block, len(values))
+        powers = (decay ** np.arange(stop - start)).reshape((-1,) + trailing)
+        carry = decay * powers
+        num = np.cumsum(x[start:stop] / powers, axis=0) * powers + carry * numerator
+        den = np.cumsum(weights[start:stop] / powers, axis=0) * powers + carry * denominator
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[start:stop] = np.where(den > 0, num / den, np.nan)
+        numerator, denominator = num[-1], den[-1]
+    return out
+
+
+class _RollingWindow:
+    """Fixed-size window with running sum and sum of squares"""
+
+    def __init__(self, size: int, shift: bool = True):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.use_shift = shift
+        self.shift = 0.0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.nonzero = 0
+        self.updates = 0
+
+    def push(self, value: float) -> None:
+        if not self.values and self.use_shift:
+            self.shift = value
+        if len(self.values) == self.size:
+            self._remove(self.values[0])
+        self.values.append(value)
+        self._add(value)
+        self.updates += 1
+        if self.updates >= self.size:
+            self._resum()
+
+    def replace_last(self, value: float) -> None:
+        self._remove(self.values[-1])
+        self.values[-1] = value
+        self._add(value)
+
+    def _add(self, value: float) -> None:
+        x = value - self.shift
+        self.total += x
+        self.total_sq += x * x
+        self.nonzero += value != 0
+
+    def _remove(self, value: float) -> None:
+        x = value - self.shift
+        self.total -= x
+        self.total_sq -= x * x
+        self.nonzero -= value != 0
+
+    def _resum(self) -> None:
+        """Rebuild the sums from the window values to stop floating point drift"""
+        if self.use_shift:
+            self.shift = self.values[-1]
+        xs = [v - self.shift for v in self.values]
+        self.total = math.fsum(xs)
+        self.total_sq = math.fsum(x * x for x in xs)
+        self.updates = 0
+
+    def mean(self) -> float:
+        if len(self.values) < self.size:
+            return math.nan
+        if self.nonzero == 0:
+            return 0.0
+        return self.shift + self.total / self.size
+
+    def std(self) -> float:
+        if len(self.values) < self.size:
+            return math.nan
+        n = self.size
+        variance = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+class _ExponentialMean:
+    """Running ``ewm(span=...).mean()`` using pandas' default adjust=True weights"""
+
+    def __init__(self, span: int):
+        self.decay = 1 - 2 / (span + 1)
+        self.numerator = 0.0
+        self.denominator = 0.0
+        self._previous = (0.0, 0.0)
+
+    def push(self, value: float) -> float:
+        self._previous = (self.numerator, self.denominator)
+        self.numerator = value + self.decay * self.numerator
+        self.denominator = 1 + self.decay * self.denominator
+        return self.numerator / self.denominator
+
+    def replace_last(self, value: float) -> float:
+        self.numerator, self.denominator = self._previous
+        return self.push(value)
+
+
+class IndicatorStream:
+    """Incrementally maintained indicators for a single candle series.
+
+    Every update costs O(1) regardless of how much history has been seen.
+    Feeding a candle with the same timestamp as the last one revises it
+    (the still-open candle); older timestamps are rejected. Values match
+    ``TechnicalAnalyzer.calculate_indicators`` run over the same candles.
+    """
+
+    def __init__(self, rsi_period=14, macd_fast=12, macd_slow=26, macd_signal=9, history=2):
+        self.gains = _RollingWindow(rsi_period, shift=False)
+        self.losses = _RollingWindow(rsi_period, shift=False)
+        self.ema_fast = _ExponentialMean(macd_fast)
+        self.ema_slow = _ExponentialMean(macd_slow)
+        self.ema_signal = _ExponentialMean(macd_signal)
+        self.ema_20 = _ExponentialMean(20)
+        self.window_20 = _RollingWindow(20)
+        self.window_50 = _RollingWindow(50)
+        self.rows = deque(maxlen=max(history, 2))
+        self.last_timestamp = None
+        self.last_close = None
+        self.prev_close = None
+        self.lock = threading.Lock()
+
+    def update(self, timestamp, close: float) -> Dict[str, float]:
+        """Add a new candle close or revise the last one"""
+        close = float(close)
+        revise = self.last_timestamp is not None and timestamp == self.last_timestamp
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            raise ValueError(f"Candle {timestamp} is older than {self.last_timestamp}")
+
+        previous = self.prev_close if revise else self.last_close
+        delta = 0.0 if previous is None else close - previous
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+
+        if revise:
+            self.gains.replace_last(gain)
+            self.losses.replace_last(loss)
+            self.window_20.replace_last(close)
+            self.window_50.replace_last(close)
+            fast = self.ema_fast.replace_last(close)
+            slow = self.ema_slow.replace_last(close)
+            ema_20 = self.ema_20.replace_last(close)
+            macd = fast - slow
+            signal = self.ema_signal.replace_last(macd)
+        else:
+            self.gains.push(gain)
+            self.losses.push(loss)
+            self.window_20.push(close)
+            self.window_50.push(close)
+            fast = self.ema_fast.push(close)
+            slow = self.ema_slow.push(close)
+            ema_20 = self.ema_20.push(close)
+            macd = fast - slow
+            signal = self.ema_signal.push(macd)
+            self.prev_close = self.last_close
+            self.last_timestamp = timestamp
+        self.last_close = close
+
+        avg_gain, avg_loss = self.gains.mean(), self.losses.mean()
+        if math.isnan(avg_gain) or (avg_gain == 0 and avg_loss == 0):
+            rsi = math.nan
+        elif avg_loss == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+
+        sma_20 = self.window_20.mean()
+        std_20 = self.window_20.std()
+        row = {
+            'close': close,
+            'rsi': rsi,
+            'macd': macd,
+            'macd_signal': signal,
+            'macd_hist': macd - signal,
+            'sma_20': sma_20,
+            'sma_50': self.window_50.mean(),
+            'ema_20': ema_20,
+            'bb_upper': sma_20 + std_20 * 2,
+            'bb_middle': sma_20,
+            'bb_lower': sma_20 - std_20 * 2
+        }
+        if revise:
+            self.rows[-1] = (timestamp, row)
+        else:
+            self.rows.append((timestamp, row))
+        return row
+
+    def frame(self) -> pd.DataFrame:
+        """Return the most recent indicator rows as a dataframe"""
+        return pd.DataFrame(
+            [row for _, row in self.rows],
+            index=pd.Index([ts for ts, _ in self.rows], name='timestamp'),
+            columns=['close'] + INDICATOR_COLUMNS
+        )
+
 
 class TechnicalAnalyzer:
     def __init__(self, rsi_period=14, macd_fast=12, macd_slow=26, macd_signal=9):
@@ -9,6 +275,8 @@ class TechnicalAnalyzer:
         self.macd_fast = macd_fast
         self.macd_slow = macd_slow
         self.macd_signal = macd_signal
+        self._streams: Dict[Hashable, IndicatorStream] = {}
+        self._streams_lock = threading.Lock()
 
     def calculate_rsi(self, data: pd.Series, periods: int = 14) -> pd.Series:
         """Calculate RSI indicator"""
@@ -43,8 +311,21 @@ class TechnicalAnalyzer:
         lower_band = middle_band - (std * num_std)
         return upper_band, middle_band, lower_band
 
-    def calculate_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Calculate technical indicators for the given dataframe"""
+    def calculate_indicators(self, df: pd.DataFrame, use_cache: bool = True) -> pd.DataFrame:
+        """Calculate technical indicators for the given dataframe.
+
+        Frames returned by ``ExchangeHandler.get_ohlcv`` are looked up in the
+        shared indicator cache first, so the same candles are only processed
+        once across the dashboard and the monitor.
+        """
+        key = indicator_cache.make_key(df, self._params()) if use_cache else None
+        if key is not None:
+            cached = indicator_cache.get(key)
+            if cached is not None:
+                for column in INDICATOR_COLUMNS:
+                    df[column] = cached[column].to_numpy()
+                return df
+
         try:
             # RSI
             df['rsi'] = self.calculate_rsi(df['close'], self.rsi_period)
@@ -60,10 +341,144 @@ class TechnicalAnalyzer:
             # Bollinger Bands
             df['bb_upper'], df['bb_middle'], df['bb_lower'] = self.calculate_bollinger_bands(df['close'])
 
+            if key is not None:
+                indicator_cache.put(key, df[INDICATOR_COLUMNS].copy())
             return df
         except Exception as e:
             raise Exception(f"Error calculating indicators: {str(e)}")
 
+    def _params(self) -> Tuple[int, int, int, int]:
+        return (self.rsi_period, self.macd_fast, self.macd_slow, self.macd_signal)
+
+    def warmup_bars(self) -> int:
+        """Bars of history before every signal rule sees settled indicators.
+
+        RSI and SMA20 need their full window plus the previous bar for the
+        crossover rules; MACD is given its slow and signal spans to settle.
+        """
+        return max(self.rsi_period + 1, 20 + 1, self.macd_slow + self.macd_signal)
+
+    def calculate_indicator_panel(self, closes) -> Dict[str, np.ndarray]:
+        """Calculate every indicator at once for a (time x symbol) close panel.
+
+        ``closes`` is a 2-D array or a dataframe with one column per symbol.
+        Symbols with a shorter history may be NaN-padded at the top. Every
+        returned array has the shape of ``closes`` and matches what
+        ``calculate_indicators`` gives for that symbol's column.
+        """
+        close = np.asarray(closes, dtype=float)
+        if close.ndim == 1:
+            close = close[:, np.newaxis]
+
+        # A symbol's first close has no delta and counts as zero, as in calculate_rsi;
+        # the padding before it stays NaN so those windows are not filled early
+        delta = np.diff(close, axis=0, prepend=np.nan)
+        listed = ~np.isnan(close)
+        avg_gain, _ = _rolling_moments(np.where(listed, np.fmax(delta, 0.0), np.nan), self.rsi_period)
+        avg_loss, _ = _rolling_moments(np.where(listed, np.fmax(-delta, 0.0), np.nan), self.rsi_period)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+
+        macd = _ewm_mean(close, self.macd_fast) - _ewm_mean(close, self.macd_slow)
+        macd_signal = _ewm_mean(macd, self.macd_signal)
+
+        sma_20, std_20 = _rolling_moments(close, 20)
+        sma_50, _ = _rolling_moments(close, 50)
+
+        return {
+            'close': close,
+            'rsi': rsi,
+            'macd': macd,
+            'macd_signal': macd_signal,
+            'macd_hist': macd - macd_signal,
+            'sma_20': sma_20,
+            'sma_50': sma_50,
+            'ema_20': _ewm_mean(close, 20),
+            'bb_upper': sma_20 + std_20 * 2,
+            'bb_middle': sma_20,
+            'bb_lower': sma_20 - std_20 * 2
+        }
+
+    @staticmethod
+    def signal_masks(panel: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Evaluate the generate_signals rules on every row of an indicator panel"""
+        close, rsi = panel['close'], panel['rsi']
+        macd, macd_signal, sma_20 = panel['macd'], panel['macd_signal'], panel['sma_20']
+        prev_close, prev_macd = _lagged(close), _lagged(macd)
+        prev_macd_signal, prev_sma_20 = _lagged(macd_signal), _lagged(sma_20)
+
+        return {
+            'rsi_buy': rsi < 30,
+            'rsi_sell': rsi > 70,
+            'macd_buy': (macd > macd_signal) & (prev_macd <= prev_macd_signal),
+            'macd_sell': (macd < macd_signal) & (prev_macd >= prev_macd_signal),
+            'ma_buy': (close > sma_20) & (prev_close <= prev_sma_20),
+            'ma_sell': (close < sma_20) & (prev_close >= prev_sma_20)
+        }
+
+    def generate_signals_panel(self, closes, symbols: List[str] = None) -> Dict[str, List[Tuple[str, str, str]]]:
+        """Generate trading signals for every symbol of a close panel in one pass.
+
+        Signals are read from the last row, so the panel should be aligned on
+        the latest candle. ``symbols`` defaults to the dataframe columns.
+        """
+        if symbols is None:
+            symbols = list(closes.columns)
+        masks = self.signal_masks(self.calculate_indicator_panel(closes))
+        latest = {name: mask[-1] for name, mask in masks.items()}
+
+        signals = {symbol: [] for symbol in symbols}
+        for name, signal in SIGNAL_RULES:
+            for column in np.flatnonzero(latest[name]):
+                signals[symbols[column]].append(signal)
+        return signals
+
+    @staticmethod
+    def close_panel(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """Align the close columns of several OHLCV frames into a (time x symbol) panel"""
+        return pd.concat({symbol: df['close'] for symbol, df in frames.items()}, axis=1).sort_index()
+
+    def update_indicators(self, df: pd.DataFrame, key: Hashable) -> pd.DataFrame:
+        """Feed new or revised candles into the indicator stream for ``key``.
+
+        ``key`` identifies the series, e.g. ``(pair, timeframe)``. Only the
+        candles from the last seen timestamp onwards are processed; if ``df``
+        no longer overlaps that timestamp the stream is rebuilt from ``df``.
+        Returns the most recent indicator rows.
+        """
+        with self._streams_lock:
+            stream = self._streams.get(key)
+            if stream is None:
+                stream = self._streams[key] = self._new_stream()
+
+        with stream.lock:
+            index = df.index
+            start = 0
+            if stream.last_timestamp is not None:
+                if stream.last_timestamp in index:
+                    start = index.get_loc(stream.last_timestamp)
+                else:
+                    with self._streams_lock:
+                        fresh = self._streams[key] = self._new_stream()
+                    with fresh.lock:
+                        return self._feed(fresh, df, 0)
+            return self._feed(stream, df, start)
+
+    def reset_stream(self, key: Hashable) -> None:
+        """Drop the indicator stream state for ``key``"""
+        with self._streams_lock:
+            self._streams.pop(key, None)
+
+    def _new_stream(self) -> IndicatorStream:
+        return IndicatorStream(*self._params())
+
+    @staticmethod
+    def _feed(stream: IndicatorStream, df: pd.DataFrame, start: int) -> pd.DataFrame:
+        closes = df['close'].to_numpy()
+        for timestamp, close in zip(df.index[start:], closes[start:]):
+            stream.update(timestamp, close)
+        return stream.frame()
+
     def add_indicators_to_plot(self, fig: go.Figure, df: pd.DataFrame) -> None:
         """Add technical indicators to the plotly figure"""
         # Calculate indicators
@@ -141,13 +556,25 @@ class TechnicalAnalyzer:
             )
         )
 
-    def generate_signals(self, df: pd.DataFrame) -> List[Tuple[str, str, str]]:
-        """Generate trading signals based on technical indicators"""
-        signals = []
-        df = self.calculate_indicators(df)
+    def generate_signals(self, df: pd.DataFrame, stream_key: Hashable = None) -> List[Tuple[str, str, str]]:
+        """Generate trading signals based on technical indicators.
+
+        With ``stream_key`` the indicators come from the incremental stream for
+        that series and only the latest rows of ``df`` get indicator values.
+        """
+        if stream_key is None:
+            df = self.calculate_indicators(df)
+            return self._signals_from_rows(df.iloc[-1], df.iloc[-2])
 
-        # Get the latest data point
-        latest = df.iloc[-1]
+        recent = self.update_indicators(df, stream_key)
+        for column in INDICATOR_COLUMNS:
+            df.loc[recent.index, column] = recent[column]
+        return self._signals_from_rows(recent.iloc[-1], recent.iloc[-2])
+
+    @staticmethod
+    def _signals_from_rows(latest: pd.Series, previous: pd.Series) -> List[Tuple[str, str, str]]:
+        """Apply the signal rules to the latest and previous indicator rows"""
+        signals = []
 
         # RSI signals
         if latest['rsi'] < 30:
@@ -156,15 +583,15 @@ class TechnicalAnalyzer:
             signals.append(("RSI", "Overbought", "SELL"))
 
         # MACD signals
-        if latest['macd'] > latest['macd_signal'] and df.iloc[-2]['macd'] <= df.iloc[-2]['macd_signal']:
+        if latest['macd'] > latest['macd_signal'] and previous['macd'] <= previous['macd_signal']:
             signals.append(("MACD", "Bullish Crossover", "BUY"))
-        elif latest['macd'] < latest['macd_signal'] and df.iloc[-2]['macd'] >= df.iloc[-2]['macd_signal']:
+        elif latest['macd'] < latest['macd_signal'] and previous['macd'] >= previous['macd_signal']:
             signals.append(("MACD", "Bearish Crossover", "SELL"))
 
         # Moving Average signals
-        if latest['close'] > latest['sma_20'] and df.iloc[-2]['close'] <= df.iloc[-2]['sma_20']:
+        if latest['close'] > latest['sma_20'] and previous['close'] <= previous['sma_20']:
             signals.append(("MA", "Price crossed above SMA20", "BUY"))
-        elif latest['close'] < latest['sma_20'] and df.iloc[-2]['close'] >= df.iloc[-2]['sma_20']:
+        elif latest['close'] < latest['sma_20'] and previous['close'] >= previous['sma_20']:
             signals.append(("MA", "Price crossed below SMA20", "SELL"))
 
-        return signals
\ No newline at end of file
+        return signals
@@ -0,0 +1,199 @@
+import asyncio
+import threading
+from typing import Dict, List, Tuple
+import ccxt.async_support as ccxt_async
+from .candle_store import CandleStore, candle_store as default_candle_store
+from .exchange_handler import MAX_OHLCV_LIMIT, OHLCVStoreMixin, build_exchange_config, store_markets
+from .rate_limiter import endpoint_cost, get_rate_limiter
+
+
+class AsyncExchangeHandler(OHLCVStoreMixin):
+    """ExchangeHandler counterpart built on ccxt's asyncio support.
+
+    One ccxt exchange instance (and therefore one HTTP session) serves all
+    requests; ``max_concurrency`` bounds how many are in flight at once.
+    """
+
+    def __init__(self, exchange_id='binance', candle_store: CandleStore = None, max_concurrency=10,
+                 exchange=None):
+        self.exchange_id = exchange_id
+        self.candle_store = candle_store or getattr(exchange, 'candle_store', None) or default_candle_store
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._markets_lock = asyncio.Lock()
+        self.rate_limiter = get_rate_limiter(exchange_id)
+        self.exchange = exchange or getattr(ccxt_async, exchange_id)(build_exchange_config())
+
+    async def _request(self, endpoint, function, *args, cost=None, **kwargs):
+        """Call the exchange through the shared rate limiter and concurrency cap"""
+        async with self._semaphore:
+            return await self.rate_limiter.call_async(
+                endpoint, function, *args, cost=cost, exchange=self.exchange, **kwargs
+            )
+
+    async def _ensure_markets(self):
+        """Load market metadata from the shared cache, downloading it only when stale"""
+        if self._apply_cached_markets():
+            return
+        async with self._markets_lock:
+            if self._apply_cached_markets():
+                return
+            await self._request('load_markets', self.exchange.load_markets)
+            store_markets(self.exchange_id, self.exchange.markets, self.exchange.currencies)
+
+    async def close(self):
+        """Close the shared HTTP session"""
+        await self.exchange.close()
+
+    async def get_ohlcv(self, symbol, timeframe='1h', limit=100, since=None):
+        """Get OHLCV data for a symbol, fetching only candles missing from the store (or from ``since``)"""
+        try:
+            await self._ensure_markets()
+            if since is None:
+                since = self._incremental_since(symbol, timeframe, limit)
+            ohlcv = await self._request(
+                'fetch_ohlcv',
+                self.exchange.fetch_ohlcv,
+                symbol,
+                timeframe=timeframe,
+                since=since,
+                limit=self._page_limit(timeframe, since, limit)
+            )
+
+            if not ohlcv:
+                raise Exception("Empty OHLCV data received")
+
+            # A store more than ``limit`` candles behind is caught up page by page
+            batch, ohlcv = ohlcv, list(ohlcv)
+            since = self._next_page(timeframe, since, batch)
+            while since is not None:
+                batch = await self._request(
+                    'fetch_ohlcv', self.exchange.fetch_ohlcv,
+                    symbol, timeframe=timeframe, since=since, limit=MAX_OHLCV_LIMIT
+                )
+                ohlcv.extend(batch)
+                since = self._next_page(timeframe, since, batch)
+
+            return self._store_candles(symbol, timeframe, ohlcv, limit)
+
+        except Exception as e:
+            print(f"Error fetching OHLCV data for {symbol}: {str(e)}")
+            return None
+
+    async def get_ticker(self, symbol):
+        """Get current ticker information"""
+        try:
+            await self._ensure_markets()
+            return await self._request('fetch_ticker', self.exchange.fetch_ticker, symbol)
+        except Exception as e:
+            print(f"Error fetching ticker: {str(e)}")
+            return None
+
+    async def get_order_book(self, symbol, limit=20):
+        """Get order book for a symbol"""
+        try:
+            await self._ensure_markets()
+            return await self._request(
+                'fetch_order_book', self.exchange.fetch_order_book, symbol, limit,
+                cost=endpoint_cost('fetch_order_book', limit)
+            )
+        except Exception as e:
+            print(f"Error fetching order book: {str(e)}")
+            return None
+
+    async def get_resampled_ohlcv(self, symbol, timeframe, base_timeframe='1h', limit=100):
+        """Get ``timeframe`` bars built locally from stored ``base_timeframe`` candles"""
+        try:
+            start_ms, needed = self._resample_window(timeframe, base_timeframe, limit)
+            df = self._resample_from_store(symbol, timeframe, base_timeframe, limit, start_ms)
+            if df is None:
+                await self.get_ohlcv(symbol, timeframe=base_timeframe, limit=min(needed, MAX_OHLCV_LIMIT),
+                                     since=self._store_hole(symbol, base_timeframe, start_ms))
+                df = self._resample_from_store(
+                    symbol, timeframe, base_timeframe, limit, start_ms, require_complete=False
+                )
+            return df
+        except Exception as e:
+            print(f"Error resampling OHLCV data: {str(e)}")
+            return None
+
+    async def calculate_price_levels(self, symbol):
+        """Calculate important price levels"""
+        try:
+            ohlcv = await self.get_resampled_ohlcv(symbol, '1d', base_timeframe='1h', limit=30)
+            if ohlcv is None:
+                return None
+
+            return self._price_levels(ohlcv)
+
+        except Exception as e:
+            print(f"Error calculating price levels: {str(e)}")
+            return None
+
+    async def get_ohlcv_many(self, symbols: List[str], timeframe='1h', limit=100) -> Dict:
+        """Fetch OHLCV data for many symbols concurrently"""
+        frames = await asyncio.gather(*(self.get_ohlcv(s, timeframe, limit) for s in symbols))
+        return dict(zip(symbols, frames))
+
+    async def get_market_data_many(self, symbols: List[str], timeframe='1h', limit=100) -> Dict[str, Tuple]:
+        """Fetch OHLCV data and price levels for many symbols concurrently.
+
+        Price levels run after the OHLCV fetch so they can be built from the
+        freshly stored candles. Returns ``{symbol: (ohlcv, price_levels)}``;
+        either may be None on failure.
+        """
+        frames = await self.get_ohlcv_many(symbols, timeframe, limit)
+        levels = await asyncio.gather(*(self.calculate_price_levels(s) for s in symbols))
+        return {symbol: (frames[symbol], level) for symbol, level in zip(symbols, levels)}
+
+
+class BlockingExchangeHandler:
+    """Synchronous facade over AsyncExchangeHandler for thread-based callers.
+
+    Runs the async handler on a private event loop in a daemon thread and
+    exposes the ExchangeHandler methods plus the ``*_many`` batch calls.
+    """
+
+    def __init__(self, exchange_id='binance', candle_store: CandleStore = None, max_concurrency=10,
+                 exchange=None):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self.handler = self._run(self._create(exchange_id, candle_store, max_concurrency, exchange))
+        self.exchange_id = exchange_id
+        self.exchange = self.handler.exchange
+
+    @staticmethod
+    async def _create(exchange_id, candle_store, max_concurrency, exchange):
+        # Built inside the loop so the semaphore and HTTP session belong to it
+        return AsyncExchangeHandler(exchange_id, candle_store, max_concurrency, exchange)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def get_ohlcv(self, symbol, timeframe='1h', limit=100, since=None):
+        return self._run(self.handler.get_ohlcv(symbol, timeframe, limit, since))
+
+    def get_ticker(self, symbol):
+        return self._run(self.handler.get_ticker(symbol))
+
+    def get_order_book(self, symbol, limit=20):
+        return self._run(self.handler.get_order_book(symbol, limit))
+
+    def calculate_price_levels(self, symbol):
+        return self._run(self.handler.calculate_price_levels(symbol))
+
+    def get_resampled_ohlcv(self, symbol, timeframe, base_timeframe='1h', limit=100):
+        return self._run(self.handler.get_resampled_ohlcv(symbol, timeframe, base_timeframe, limit))
+
+    def get_ohlcv_many(self, symbols, timeframe='1h', limit=100):
+        return self._run(self.handler.get_ohlcv_many(symbols, timeframe, limit))
+
+    def get_market_data_many(self, symbols, timeframe='1h', limit=100):
+        return self._run(self.handler.get_market_data_many(symbols, timeframe, limit))
+
+    def close(self):
+        """Close the HTTP session and stop the event loop thread"""
+        self._run(self.handler.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
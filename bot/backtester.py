@@ -0,0 +1,218 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple, Union
+from .analysis import TechnicalAnalyzer, SIGNAL_RULES
+from .signal_generator import SignalGenerator
+
+BUY, SELL = 1, -1
+
+
+class Backtester:
+    """Replay the live signal rules over full candle histories.
+
+    Indicators and rules come from ``TechnicalAnalyzer`` (as boolean masks
+    over every bar) and the strength threshold, targets and stop loss from
+    ``SignalGenerator``, so results reflect the settings used live. A signal
+    on bar ``t`` enters at its close; bars ``t+1 .. t+horizon`` decide which
+    targets and the stop were reached. When a target and the stop fall in
+    the same bar the stop is assumed to come first.
+    """
+
+    def __init__(self, technical_analyzer: TechnicalAnalyzer = None,
+                 signal_generator: SignalGenerator = None, horizon: int = 168,
+                 apply_cooldown: bool = True, batch_size: int = 5000):
+        self.technical_analyzer = technical_analyzer or TechnicalAnalyzer()
+        self.signal_generator = signal_generator or SignalGenerator()
+        self.horizon = horizon
+        self.apply_cooldown = apply_cooldown
+        self.batch_size = batch_size
+
+    def signal_directions(self, close: np.ndarray) -> np.ndarray:
+        """Return +1 (BUY), -1 (SELL) or 0 per bar and symbol of a close panel.
+
+        Each symbol's first ``TechnicalAnalyzer.warmup_bars`` closes give no
+        signal, as the live monitor always evaluates a settled window.
+        """
+        masks = self.technical_analyzer.signal_masks(
+            self.technical_analyzer.calculate_indicator_panel(close)
+        )
+        buy = sum(masks[name].astype(np.int64) for name, rule in SIGNAL_RULES if rule[2] == "BUY")
+        sell = sum(masks[name].astype(np.int64) for name, rule in SIGNAL_RULES if rule[2] == "SELL")
+        directions = self.signal_generator.signal_directions(buy, sell, buy + sell)
+
+        close = np.asarray(close, dtype=float)
+        seen = np.cumsum(~np.isnan(close), axis=0).reshape(directions.shape)
+        return np.where(seen > self.technical_analyzer.warmup_bars(), directions, 0)
+
+    def run(self, data: Union[pd.DataFrame, Dict[str, pd.DataFrame]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Backtest one OHLCV frame or a dict of them keyed by pair.
+
+        Returns a frame with one row per signal and a per-pair summary.
+        """
+        index, pairs, high, low, close = self.align(data)
+        trades = self.run_arrays(high, low, close, index.as_unit('ns').asi8, pairs)
+        trades.insert(1, 'timestamp', index[trades.pop('bar').to_numpy()])
+        return trades, self.summarize(trades, pairs)
+
+    @staticmethod
+    def align(data: Union[pd.DataFrame, Dict[str, pd.DataFrame]]):
+        """Align OHLCV frames into (time x pair) high, low and close panels.
+
+        Returns ``(index, pairs, high, low, close)``; pairs missing a bar get NaN.
+        """
+        frames = data if isinstance(data, dict) else {data.attrs.get('symbol', 'PAIR'): data}
+        pairs = list(frames)
+        index = frames[pairs[0]].index
+        for df in frames.values():
+            if not index.equals(df.index):
+                index = index.union(df.index)
+        high, low, close = (
+            np.column_stack([frames[p][column].reindex(index).to_numpy(dtype=float) for p in pairs])
+            for column in ('high', 'low', 'close')
+        )
+        return index, pairs, high, low, close
+
+    def run_arrays(self, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                   timestamps: np.ndarray, pairs) -> pd.DataFrame:
+        """Backtest aligned (time x pair) high/low/close panels.
+
+        ``timestamps`` are int64 nanoseconds, used for the signal cooldown.
+        """
+        directions = self.signal_directions(close)
+        bars, columns = self._select_signals(directions, timestamps)
+        sides = directions[bars, columns]
+        entries = close[bars, columns]
+
+        generator = self.signal_generator
+        multipliers = np.where(
+            (sides == BUY)[:, np.newaxis],
+            np.array(generator.buy_target_multipliers + (generator.buy_stop_multiplier,)),
+            np.array(generator.sell_target_multipliers + (generator.sell_stop_multiplier,))
+        )
+        levels = entries[:, np.newaxis] * multipliers
+
+        outcomes = [
+            self._evaluate(high, low, close, bars[i:i + self.batch_size], columns[i:i + self.batch_size],
+                           sides[i:i + self.batch_size], levels[i:i + self.batch_size])
+            for i in range(0, len(bars), self.batch_size)
+        ] or [self._evaluate(high, low, close, bars, columns, sides, levels)]
+        target_bars, stop_bar, exit_bar, exit_price = (
+            np.concatenate([o[k] for o in outcomes]) for k in range(4)
+        )
+
+        targets_hit = (target_bars < stop_bar[:, np.newaxis]).sum(axis=1)
+        outcome = np.where(targets_hit == 3, 'target_3',
+                           np.where(stop_bar <= self.horizon, 'stop', 'expired'))
+        returns = np.where(sides == BUY, exit_price / entries - 1, 1 - exit_price / entries) * 100
+
+        return pd.DataFrame({
+            'pair': np.asarray(pairs, dtype=object)[columns],
+            'bar': bars,
+            'type': np.where(sides == BUY, 'BUY', 'SELL'),
+            'entry': entries,
+            'target_1': levels[:, 0],
+            'target_2': levels[:, 1],
+            'target_3': levels[:, 2],
+            'stop_loss': levels[:, 3],
+            'targets_hit': targets_hit.astype(np.int64),
+            'outcome': outcome,
+            'bars_held': exit_bar.astype(np.int64),
+            'exit_price': exit_price,
+            'return_pct': returns
+        })
+
+    def _select_signals(self, directions: np.ndarray, timestamps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (bar, column) of signals, dropping those inside the cooldown.
+
+        Mirrors ``SignalGenerator.min_signal_interval``: a signal suppresses
+        later ones for the same pair until the interval has passed. The loop
+        jumps from one emitted signal to the next, never bar by bar.
+        """
+        bars, columns = np.nonzero(directions)
+        if not self.apply_cooldown or len(bars) == 0:
+            order = np.lexsort((columns, bars))
+            return bars[order], columns[order]
+
+        interval = int(self.signal_generator.min_signal_interval * 1e9)
+        order = np.lexsort((bars, columns))
+        bars, columns = bars[order], columns[order]
+        keep = np.zeros(len(bars), dtype=bool)
+        starts = np.searchsorted(columns, np.arange(directions.shape[1]))
+        ends = np.searchsorted(columns, np.arange(directions.shape[1]), side='right')
+        for start, end in zip(starts, ends):
+            times = timestamps[bars[start:end]]
+            i = 0
+            while i < len(times):
+                keep[start + i] = True
+                i = np.searchsorted(times, times[i] + interval, side='left')
+        bars, columns = bars[keep], columns[keep]
+        order = np.lexsort((columns, bars))
+        return bars[order], columns[order]
+
+    def _evaluate(self, high, low, close, bars, columns, sides, levels):
+        """Find first target/stop hits for a batch of signals in one pass"""
+        n_bars = len(close)
+        offsets = np.arange(1, self.horizon + 1)
+        rows = bars[:, np.newaxis] + offsets
+        inside = rows < n_bars
+        rows = np.minimum(rows, n_bars - 1)
+        cols = columns[:, np.newaxis]
+        future_high = np.where(inside, high[rows, cols], np.nan)
+        future_low = np.where(inside, low[rows, cols], np.nan)
+
+        is_buy = (sides == BUY)[:, np.newaxis]
+        favourable = np.where(is_buy, future_high, -future_low)
+        adverse = np.where(is_buy, future_low, -future_high)
+        signed = np.where(is_buy, levels, -levels)
+
+        never = self.horizon + 1
+        target_bars = np.stack([
+            self._first_bar(favourable >= signed[:, k:k + 1], never) for k in range(3)
+        ], axis=1)
+        stop_bar = self._first_bar(adverse <= signed[:, 3:4], never)
+
+        last_bar = np.minimum(self.horizon, n_bars - 1 - bars)
+        exit_bar = np.minimum(np.minimum(target_bars[:, 2], stop_bar), last_bar)
+        exit_price = np.where(
+            target_bars[:, 2] < stop_bar, levels[:, 2],
+            np.where(stop_bar <= self.horizon, levels[:, 3], close[bars + last_bar, columns])
+        )
+        return target_bars, stop_bar, exit_bar, exit_price
+
+    @staticmethod
+    def _first_bar(hits: np.ndarray, never: int) -> np.ndarray:
+        """1-based offset of the first True per row, ``never`` if none"""
+        return np.where(hits.any(axis=1), hits.argmax(axis=1) + 1, never)
+
+    @staticmethod
+    def summarize(trades: pd.DataFrame, pairs=None) -> pd.DataFrame:
+        """Per-pair statistics of a trades frame"""
+        hits = trades['targets_hit']
+        summary = trades.assign(
+            is_buy=trades['type'] == 'BUY',
+            is_sell=trades['type'] == 'SELL',
+            is_win=trades['return_pct'] > 0,
+            hit_1=hits >= 1,
+            hit_2=hits >= 2,
+            hit_3=hits >= 3,
+            is_stop=trades['outcome'] == 'stop',
+            is_expired=trades['outcome'] == 'expired'
+        ).groupby('pair').agg(
+            signals=('type', 'size'),
+            buy_signals=('is_buy', 'sum'),
+            sell_signals=('is_sell', 'sum'),
+            win_rate=('is_win', 'mean'),
+            target_1_rate=('hit_1', 'mean'),
+            target_2_rate=('hit_2', 'mean'),
+            target_3_rate=('hit_3', 'mean'),
+            stop_rate=('is_stop', 'mean'),
+            expired_rate=('is_expired', 'mean'),
+            avg_return_pct=('return_pct', 'mean'),
+            total_return_pct=('return_pct', 'sum'),
+            avg_bars_held=('bars_held', 'mean')
+        )
+        if pairs is not None:
+            counts = ['signals', 'buy_signals', 'sell_signals']
+            summary = summary.reindex(pairs)
+            summary[counts] = summary[counts].fillna(0).astype(int)
+        return summary
@@ -0,0 +1,118 @@
+import os
+import re
+import threading
+from typing import Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+ROW_BYTES = len(COLUMNS) * 8
+
+
+class CandleStore:
+    """Local OHLCV store with one memory-mappable file per (exchange, symbol, timeframe).
+
+    Each file is a flat little-endian float64 array of
+    ``[timestamp_ms, open, high, low, close, volume]`` rows sorted by
+    timestamp, so reads map the file and slice the tail without parsing.
+    Writes merge by timestamp: new rows replace stored ones with the same
+    timestamp (e.g. the still-open candle). The merged file is written next
+    to the old one and swapped in with ``os.replace``, so readers in other
+    processes (such as the sharded monitor's coordinator) see either the
+    old or the new file, never one that is half rewritten.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = root or os.getenv('CANDLE_STORE_DIR', os.path.join('data', 'candles'))
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def path(self, exchange: str, symbol: str, timeframe: str) -> str:
+        """Return the file path of a candle series"""
+        safe_symbol = re.sub(r'[^A-Za-z0-9_.-]', '_', symbol)
+        return os.path.join(self.root, exchange, safe_symbol, f"{timeframe}.f64")
+
+    def _lock(self, path: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    @staticmethod
+    def _map(path: str) -> Optional[np.ndarray]:
+        if not os.path.exists(path) or os.path.getsize(path) < ROW_BYTES:
+            return None
+        rows = os.path.getsize(path) // ROW_BYTES
+        return np.memmap(path, dtype='<f8', mode='r', shape=(rows, len(COLUMNS)))
+
+    def count(self, exchange: str, symbol: str, timeframe: str) -> int:
+        """Return the number of stored candles"""
+        path = self.path(exchange, symbol, timeframe)
+        return os.path.getsize(path) // ROW_BYTES if os.path.exists(path) else 0
+
+    def last_timestamp(self, exchange: str, symbol: str, timeframe: str) -> Optional[int]:
+        """Return the timestamp (ms) of the newest stored candle"""
+        path = self.path(exchange, symbol, timeframe)
+        with self._lock(path):
+            data = self._map(path)
+            return None if data is None else int(data[-1, 0])
+
+    def read(self, exchange: str, symbol: str, timeframe: str, limit: int = None,
+             since: int = None, until: int = None) -> np.ndarray:
+        """Return stored rows, optionally within [since, until) and only the last ``limit``"""
+        path = self.path(exchange, symbol, timeframe)
+        with self._lock(path):
+            data = self._map(path)
+            if data is None:
+                return np.empty((0, len(COLUMNS)))
+            start, stop = 0, len(data)
+            if since is not None:
+                start = int(np.searchsorted(data[:, 0], since, side='left'))
+            if until is not None:
+                stop = int(np.searchsorted(data[:, 0], until, side='left'))
+            if limit is not None:
+                start = max(start, stop - limit)
+            return np.array(data[start:stop])
+
+    def write(self, exchange: str, symbol: str, timeframe: str, rows: Sequence[Sequence[float]]) -> int:
+        """Merge candles into the store and return how many rows it now holds"""
+        new = np.asarray(rows, dtype=np.float64).reshape(-1, len(COLUMNS))
+        path = self.path(exchange, symbol, timeframe)
+        with self._lock(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = self._map(path)
+            if new.size == 0:
+                return 0 if data is None else len(data)
+
+            start = 0 if data is None else int(np.searchsorted(data[:, 0], new[:, 0].min(), side='left'))
+            tail = np.empty((0, len(COLUMNS))) if data is None else np.array(data[start:])
+
+            combined = np.concatenate([tail, new])
+            combined = combined[np.argsort(combined[:, 0], kind='stable')]
+            # Keep the last row for every timestamp so fresh data wins
+            keep = np.append(combined[1:, 0] != combined[:-1, 0], True)
+            merged = combined[keep].astype('<f8')
+
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'wb') as f:
+                    if start:
+                        data[:start].tofile(f)
+                    f.write(merged.tobytes())
+                del data
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            return start + len(merged)
+
+    @staticmethod
+    def to_frame(rows: np.ndarray) -> pd.DataFrame:
+        """Convert stored rows to the OHLCV dataframe layout of get_ohlcv"""
+        df = pd.DataFrame(rows[:, 1:], columns=COLUMNS[1:])
+        df.index = pd.to_datetime(rows[:, 0].astype(np.int64), unit='ms')
+        df.index.name = 'timestamp'
+        return df
+
+
+# Shared by every ExchangeHandler in the process
+candle_store = CandleStore()
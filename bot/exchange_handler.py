@@ -1,95 +1,398 @@
 import ccxt
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+import json
 import os
+import threading
+import time
+from .candle_store import CandleStore, candle_store as default_candle_store
+from .order_book import OrderBook
+from .rate_limiter import endpoint_cost, get_rate_limiter
+from .resampler import bucket_start, ohlcv_resampler, timeframe_ms
 
-class ExchangeHandler:
-    def __init__(self, exchange_id='binance'):
-        self.exchange_id = exchange_id
-        api_key = os.getenv('BINANCE_API_KEY')
-        api_secret = os.getenv('BINANCE_API_SECRET')
-
-        # Initialize exchange with API credentials
-        exchange_config = {
-            'apiKey': api_key,
-            'secret': api_secret,
-            'enableRateLimit': True,
-            'urls': {
-                'api': {
-                    'public': 'https://api.binance.com/api/v3',
-                    'private': 'https://api.binance.com/api/v3',
-                    'sapi': 'https://api.binance.com/sapi/v1'
-                }
-            },
-            'test': False,
-            'options': {
-                'defaultType': 'spot',
-                'adjustForTimeDifference': True,
-                'createMarketBuyOrderRequiresPrice': False,
-                'recvWindow': 60000,
-                'warnOnFetchOHLCVLimitArgument': False,
-                'fetchTrades': {
-                    'sort': 'timestamp',
-                    'limit': 1000
-                }
-            },
-            'timeout': 30000,
-            'timeout': 30000,
-            'proxies': {
-                'http': 'http://proxy.replit.org:8080',
-                'https': 'http://proxy.replit.org:8080'
-            },
-            'headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+MAX_OHLCV_LIMIT = 1000  # most candles a single fetch_ohlcv call returns
+MAX_CATCH_UP_PAGES = 20  # pages fetched to close the gap behind a stale store before refetching the latest window
+MARKETS_CACHE_TTL = 6 * 3600  # seconds before cached market metadata is refreshed
+
+# Market metadata shared by all handlers in the process: exchange_id -> (markets, currencies, loaded_at)
+_markets_cache = {}
+_markets_locks = {}
+_markets_cache_lock = threading.Lock()
+
+
+def _markets_cache_path(exchange_id):
+    return os.path.join(os.getenv('MARKETS_CACHE_DIR', os.path.join('data', 'markets')), f"{exchange_id}.json")
+
+
+def markets_lock(exchange_id):
+    """Lock serializing market loads for one exchange"""
+    with _markets_cache_lock:
+        return _markets_locks.setdefault(exchange_id, threading.Lock())
+
+
+def get_cached_markets(exchange_id, ttl=MARKETS_CACHE_TTL):
+    """Return (markets, currencies) from the process or disk cache if younger than ``ttl``"""
+    entry = _markets_cache.get(exchange_id)
+    if entry is None:
+        try:
+            with open(_markets_cache_path(exchange_id), 'r') as f:
+                cached = json.load(f)
+            entry = (cached['markets'], cached['currencies'], cached['loaded_at'])
+            _markets_cache[exchange_id] = entry
+        except (OSError, ValueError, KeyError):
+            return None
+    markets, currencies, loaded_at = entry
+    if time.time() - loaded_at > ttl:
+        return None
+    return markets, currencies
+
+
+def store_markets(exchange_id, markets, currencies):
+    """Save freshly loaded market metadata to the process and disk caches"""
+    loaded_at = time.time()
+    _markets_cache[exchange_id] = (markets, currencies, loaded_at)
+    try:
+        path = _markets_cache_path(exchange_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'markets': markets, 'currencies': currencies, 'loaded_at': loaded_at}, f, default=str)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Error saving markets cache: {str(e)}")
+
+
+def build_exchange_config():
+    """Build the ccxt exchange configuration with API credentials"""
+    api_key = os.getenv('BINANCE_API_KEY')
+    api_secret = os.getenv('BINANCE_API_SECRET')
+
+    return {
+        'apiKey': api_key,
+        'secret': api_secret,
+        # Throttling is done by the RateLimiter shared by all handlers
+        'enableRateLimit': False,
+        'urls': {
+            'api': {
+                'public': 'https://api.binance.com/api/v3',
+                'private': 'https://api.binance.com/api/v3',
+                'sapi': 'https://api.binance.com/sapi/v1'
             }
+        },
+        'test': False,
+        'options': {
+            'defaultType': 'spot',
+            'adjustForTimeDifference': True,
+            'createMarketBuyOrderRequiresPrice': False,
+            'recvWindow': 60000,
+            'warnOnFetchOHLCVLimitArgument': False,
+            'fetchTrades': {
+                'sort': 'timestamp',
+                'limit': 1000
+            }
+        },
+        'timeout': 30000,
+        'proxies': {
+            'http': 'http://proxy.replit.org:8080',
+            'https': 'http://proxy.replit.org:8080'
+        },
+        'headers': {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        }
+    }
+
+
+class OHLCVStoreMixin:
+    """Candle store bookkeeping shared by the sync and async exchange handlers"""
+
+    def _apply_cached_markets(self):
+        """Set markets from the cache on this handler's exchange; False if none are cached"""
+        if self.exchange.markets:
+            return True
+        cached = get_cached_markets(self.exchange_id)
+        if cached is None:
+            return False
+        self.exchange.set_markets(*cached)
+        return True
+
+    def _incremental_since(self, symbol, timeframe, limit):
+        """Return the fetch start for an incremental update, or None for a full fetch.
+
+        A store more than ``limit`` candles behind is still updated from its
+        newest candle, page by page (see ``_next_page``), so no hole is left
+        between its old tail and the new candles. Only a gap longer than
+        ``MAX_CATCH_UP_PAGES`` pages falls back to the latest window; it is
+        reported so it can be filled with ``backfill_ohlcv``.
+        """
+        try:
+            stored = self.candle_store.count(self.exchange_id, symbol, timeframe)
+            if stored < limit:
+                return None
+            last = self.candle_store.last_timestamp(self.exchange_id, symbol, timeframe)
+            missing = (self.exchange.milliseconds() - last) // timeframe_ms(timeframe) + 1
+            if missing > MAX_CATCH_UP_PAGES * MAX_OHLCV_LIMIT:
+                print(f"Candle store for {symbol} {timeframe} is {missing} candles behind; "
+                      f"refetching the latest window, run backfill_ohlcv to fill the gap")
+                return None
+            return last
+        except Exception as e:
+            print(f"Error reading candle store: {str(e)}")
+            return None
+
+    def _page_limit(self, timeframe, since, limit):
+        """Candles to request from ``since``: ``limit`` if that reaches the current candle, else a full page"""
+        if since is None:
+            return limit
+        missing = (self.exchange.milliseconds() - since) // timeframe_ms(timeframe) + 1
+        return limit if missing <= limit else MAX_OHLCV_LIMIT
+
+    def _next_page(self, timeframe, since, batch):
+        """Start of the next catch-up request after ``batch``, or None once the current candle is reached"""
+        if since is None or not batch:
+            return None
+        last = int(batch[-1][0])
+        if last <= since or last >= self.exchange.milliseconds() - timeframe_ms(timeframe):
+            return None
+        return last + timeframe_ms(timeframe)
+
+    def _store_candles(self, symbol, timeframe, ohlcv, limit):
+        """Merge fetched candles into the store and return the latest ``limit`` as a dataframe"""
+        try:
+            self.candle_store.write(self.exchange_id, symbol, timeframe, ohlcv)
+            rows = self.candle_store.read(self.exchange_id, symbol, timeframe, limit=limit)
+            df = CandleStore.to_frame(rows)
+        except Exception as e:
+            print(f"Error writing candle store: {str(e)}")
+            df = pd.DataFrame(
+                ohlcv,
+                columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
+            )
+
+            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+            df.set_index('timestamp', inplace=True)
+            df = df.tail(limit)
+
+        df.attrs.update(exchange=self.exchange_id, symbol=symbol, timeframe=timeframe)
+        return df
+
+    def _resample_window(self, timeframe, base_timeframe, limit):
+        """Return (start ms, base candles needed) for the latest ``limit`` bars of ``timeframe``"""
+        now_ms = self.exchange.milliseconds()
+        start_ms = int(bucket_start(now_ms, timeframe)) - (limit - 1) * timeframe_ms(timeframe)
+        return start_ms, (now_ms - start_ms) // timeframe_ms(base_timeframe) + 1
+
+    def _resample_from_store(self, symbol, timeframe, base_timeframe, limit, start_ms, require_complete=True):
+        """Build ``timeframe`` bars from stored base candles.
+
+        Returns None if base candles are missing between the stored ones, and
+        with ``require_complete`` also unless the store covers the whole
+        window up to the current base candle.
+        """
+        rows = self.candle_store.read(self.exchange_id, symbol, base_timeframe, since=start_ms)
+        if len(rows) == 0:
+            return None
+        base_ms = timeframe_ms(base_timeframe)
+        if len(rows) < (rows[-1, 0] - rows[0, 0]) // base_ms + 1:
+            return None
+        if require_complete:
+            now_ms = self.exchange.milliseconds()
+            if rows[0, 0] > start_ms or rows[-1, 0] < now_ms - base_ms:
+                return None
+
+        base = CandleStore.to_frame(rows)
+        base.attrs.update(exchange=self.exchange_id, symbol=symbol, timeframe=base_timeframe)
+        return ohlcv_resampler.update(base, timeframe, base_timeframe).tail(limit)
+
+    def _store_hole(self, symbol, base_timeframe, start_ms):
+        """Open time (ms) of the first base candle missing between stored ones since ``start_ms``, or None"""
+        times = self.candle_store.read(self.exchange_id, symbol, base_timeframe, since=start_ms)[:, 0]
+        base_ms = timeframe_ms(base_timeframe)
+        holes = np.flatnonzero(np.diff(times) > base_ms)
+        return int(times[holes[0]]) + base_ms if len(holes) else None
+
+    @staticmethod
+    def _price_levels(ohlcv):
+        """Support/resistance levels from daily candles"""
+        latest_close = ohlcv['close'].iloc[-1]
+
+        return {
+            'support_1': ohlcv['low'].tail(7).min(),
+            'support_2': ohlcv['low'].tail(14).min(),
+            'resistance_1': ohlcv['high'].tail(7).max(),
+            'resistance_2': ohlcv['high'].tail(14).max(),
+            'current_price': latest_close
         }
 
+
+class ExchangeHandler(OHLCVStoreMixin):
+    def __init__(self, exchange_id='binance', candle_store: CandleStore = None, exchange=None):
+        """``exchange`` overrides the ccxt instance, e.g. with a ReplayExchange for offline runs.
+
+        An exchange with its own ``candle_store`` (a replay) uses that
+        store unless ``candle_store`` is given.
+        """
+        self.exchange_id = exchange_id
+        self.candle_store = candle_store or getattr(exchange, 'candle_store', None) or default_candle_store
+        self.rate_limiter = get_rate_limiter(exchange_id)
+        self.order_books = {}
+        if exchange is not None:
+            self.exchange = exchange
+            return
         try:
-            self.exchange = getattr(ccxt, exchange_id)(exchange_config)
-            self.exchange.load_markets()
-            print(f"Successfully connected to {exchange_id} testnet")
+            # Markets are loaded lazily on the first request, see _ensure_markets
+            self.exchange = getattr(ccxt, exchange_id)(build_exchange_config())
         except Exception as e:
             print(f"Error connecting to {exchange_id}: {str(e)}")
             raise
 
-    def get_ohlcv(self, symbol, timeframe='1h', limit=100):
-        """Get OHLCV data for a symbol"""
+    def _ensure_markets(self):
+        """Load market metadata from the shared cache, downloading it only when stale"""
+        if self._apply_cached_markets():
+            return
+        with markets_lock(self.exchange_id):
+            if self._apply_cached_markets():
+                return
+            self._request('load_markets', self.exchange.load_markets)
+            store_markets(self.exchange_id, self.exchange.markets, self.exchange.currencies)
+
+    def _request(self, endpoint, function, *args, cost=None, **kwargs):
+        """Call the exchange through the shared rate limiter"""
+        return self.rate_limiter.call(endpoint, function, *args, cost=cost, exchange=self.exchange, **kwargs)
+
+    def get_ohlcv(self, symbol, timeframe='1h', limit=100, since=None):
+        """Get OHLCV data for a symbol.
+
+        Candles come from the local candle store; only the ones from the
+        newest stored candle (or from ``since``, e.g. to refill a hole)
+        onwards are fetched from the exchange.
+        """
         try:
-            # Add retry mechanism
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    ohlcv = self.exchange.fetch_ohlcv(
-                        symbol,
-                        timeframe=timeframe,
-                        limit=limit
-                    )
-
-                    if not ohlcv:
-                        raise Exception("Empty OHLCV data received")
-
-                    df = pd.DataFrame(
-                        ohlcv,
-                        columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
-                    )
-
-                    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-                    df.set_index('timestamp', inplace=True)
-
-                    return df
-                except Exception as e:
-                    if attempt == max_retries - 1:
-                        raise e
-                    print(f"Attempt {attempt + 1} failed, retrying...")
+            # Retries with backoff happen inside the rate limiter
+            self._ensure_markets()
+            if since is None:
+                since = self._incremental_since(symbol, timeframe, limit)
+            ohlcv = self._request(
+                'fetch_ohlcv',
+                self.exchange.fetch_ohlcv,
+                symbol,
+                timeframe=timeframe,
+                since=since,
+                limit=self._page_limit(timeframe, since, limit)
+            )
+
+            if not ohlcv:
+                raise Exception("Empty OHLCV data received")
+
+            # A store more than ``limit`` candles behind is caught up page by page
+            batch, ohlcv = ohlcv, list(ohlcv)
+            since = self._next_page(timeframe, since, batch)
+            while since is not None:
+                batch = self._request(
+                    'fetch_ohlcv', self.exchange.fetch_ohlcv,
+                    symbol, timeframe=timeframe, since=since, limit=MAX_OHLCV_LIMIT
+                )
+                ohlcv.extend(batch)
+                since = self._next_page(timeframe, since, batch)
+
+            return self._store_candles(symbol, timeframe, ohlcv, limit)
 
         except Exception as e:
             print(f"Error fetching OHLCV data: {str(e)}")
             return None
 
+    def backfill_ohlcv(self, symbol, timeframe='1h', start=None, end=None, page_limit=1000, max_workers=4):
+        """Download a date range of candles into the candle store.
+
+        The range is split into pages of ``page_limit`` candles on a fixed
+        grid which are fetched concurrently under the shared rate limiter
+        and merged into the store in chronological order. Completed
+        pages are recorded next to the store file, so an interrupted backfill
+        resumes where it stopped. Returns throughput statistics.
+        """
+        started = time.monotonic()
+        self._ensure_markets()
+        candle_ms = timeframe_ms(timeframe)
+        page_ms = candle_ms * page_limit
+        now_ms = self.exchange.milliseconds()
+        start_ms = self._to_ms(start) if start is not None else now_ms - 30 * 24 * 3600 * 1000
+        end_ms = min(self._to_ms(end), now_ms) if end is not None else now_ms
+        start_ms -= start_ms % candle_ms
+
+        progress_path = self.candle_store.path(self.exchange_id, symbol, timeframe) + '.backfill.json'
+        done = self._load_backfill_progress(progress_path, page_limit)
+        pages = list(range(start_ms - start_ms % page_ms, end_ms, page_ms))
+        pending = [p for p in pages if p not in done]
+
+        def fetch_page(page_start):
+            page_end = page_start + page_ms
+            rows, since = [], max(page_start, start_ms)
+            while since < min(page_end, end_ms):
+                batch = self._request(
+                    'fetch_ohlcv', self.exchange.fetch_ohlcv,
+                    symbol, timeframe=timeframe, since=since, limit=page_limit
+                )
+                batch = [c for c in batch if since <= c[0] < page_end]
+                if not batch:
+                    break
+                rows.extend(batch)
+                since = batch[-1][0] + candle_ms
+            return page_start, rows
+
+        candles = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for page_start, rows in pool.map(fetch_page, pending):
+                rows = [c for c in rows if start_ms <= c[0] < end_ms]
+                self.candle_store.write(self.exchange_id, symbol, timeframe, rows)
+                candles += len(rows)
+                # Only pages fully inside the range and closed are final;
+                # partial ones at either edge are fetched again next time
+                page_end = page_start + page_ms
+                if page_start >= start_ms and page_end <= end_ms and page_end <= now_ms - candle_ms:
+                    done.add(page_start)
+                    self._save_backfill_progress(progress_path, page_limit, done)
+
+        elapsed = time.monotonic() - started
+        return {
+            'pages': len(pending),
+            'skipped_pages': len(pages) - len(pending),
+            'candles': candles,
+            'seconds': elapsed,
+            'candles_per_second': candles / elapsed if elapsed > 0 else 0.0
+        }
+
+    @staticmethod
+    def _to_ms(value):
+        """Convert a datetime (naive means UTC) or millisecond timestamp to milliseconds"""
+        if isinstance(value, datetime):
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            return int(value.timestamp() * 1000)
+        return int(value)
+
+    @staticmethod
+    def _load_backfill_progress(path, page_limit):
+        try:
+            with open(path, 'r') as f:
+                progress = json.load(f)
+            return set(progress['done']) if progress.get('page_limit') == page_limit else set()
+        except (OSError, ValueError, KeyError):
+            return set()
+
+    @staticmethod
+    def _save_backfill_progress(path, page_limit, done):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'page_limit': page_limit, 'done': sorted(done)}, f)
+        os.replace(tmp_path, path)
+
     def get_ticker(self, symbol):
         """Get current ticker information"""
         try:
-            ticker = self.exchange.fetch_ticker(symbol)
+            self._ensure_markets()
+            ticker = self._request('fetch_ticker', self.exchange.fetch_ticker, symbol)
             return ticker
         except Exception as e:
             print(f"Error fetching ticker: {str(e)}")
@@ -98,30 +401,69 @@ class ExchangeHandler:
     def get_order_book(self, symbol, limit=20):
         """Get order book for a symbol"""
         try:
-            order_book = self.exchange.fetch_order_book(symbol, limit)
+            self._ensure_markets()
+            order_book = self._request(
+                'fetch_order_book', self.exchange.fetch_order_book, symbol, limit,
+                cost=endpoint_cost('fetch_order_book', limit)
+            )
             return order_book
         except Exception as e:
             print(f"Error fetching order book: {str(e)}")
             return None
 
+    def get_local_order_book(self, symbol, snapshot_limit=1000):
+        """Get the locally maintained order book for a symbol.
+
+        The book is seeded from a deep REST snapshot on first use and after
+        sequence gaps; feed depth diff updates to it with ``apply_diff`` and
+        query mid, spread, depth and imbalance without further REST calls.
+        """
+        book = self.order_books.get(symbol)
+        if book is None:
+            book = self.order_books.setdefault(
+                symbol,
+                OrderBook(symbol, fetch_snapshot=lambda: self.get_order_book(symbol, snapshot_limit))
+            )
+        if not book.synced:
+            book.resync()
+        return book
+
+    def get_resampled_ohlcv(self, symbol, timeframe, base_timeframe='1h', limit=100):
+        """Get ``timeframe`` bars built locally from stored ``base_timeframe`` candles.
+
+        Base candles are only requested from the exchange when the store does
+        not cover the window, has a hole in it or lacks the current candle;
+        otherwise no REST call is made. Returns None rather than bars built
+        over a hole that could not be refilled.
+        """
+        try:
+            start_ms, needed = self._resample_window(timeframe, base_timeframe, limit)
+            df = self._resample_from_store(symbol, timeframe, base_timeframe, limit, start_ms)
+            if df is None:
+                hole = self._store_hole(symbol, base_timeframe, start_ms)
+                if hole is not None:
+                    self.get_ohlcv(symbol, timeframe=base_timeframe, limit=min(needed, MAX_OHLCV_LIMIT), since=hole)
+                elif needed <= MAX_OHLCV_LIMIT:
+                    self.get_ohlcv(symbol, timeframe=base_timeframe, limit=needed)
+                else:
+                    self.backfill_ohlcv(symbol, base_timeframe, start=start_ms, page_limit=MAX_OHLCV_LIMIT)
+                df = self._resample_from_store(
+                    symbol, timeframe, base_timeframe, limit, start_ms, require_complete=False
+                )
+            return df
+        except Exception as e:
+            print(f"Error resampling OHLCV data: {str(e)}")
+            return None
+
     def calculate_price_levels(self, symbol):
         """Calculate important price levels"""
         try:
-            ohlcv = self.get_ohlcv(symbol, timeframe='1d', limit=30)
+            # Daily bars are built from the hourly candles the monitor already keeps fresh
+            ohlcv = self.get_resampled_ohlcv(symbol, '1d', base_timeframe='1h', limit=30)
             if ohlcv is None:
                 return None
 
-            latest_close = ohlcv['close'].iloc[-1]
-
-            levels = {
-                'support_1': ohlcv['low'].tail(7).min(),
-                'support_2': ohlcv['low'].tail(14).min(),
-                'resistance_1': ohlcv['high'].tail(7).max(),
-                'resistance_2': ohlcv['high'].tail(14).max(),
-                'current_price': latest_close
-            }
-
-            return levels
+            return self._price_levels(ohlcv)
 
         except Exception as e:
             print(f"Error calculating price levels: {str(e)}")
@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+import pandas as pd
+
+
+class IndicatorCache:
+    """In-process LRU cache of indicator frames with a memory cap.
+
+    Entries are keyed by the candle series they were computed from and the
+    indicator parameters, so every consumer (dashboard, monitor, plotting)
+    computes a given pair's indicators once per new or updated candle.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 2048):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(df: pd.DataFrame, params: Tuple) -> Optional[Tuple]:
+        """Build a cache key for an OHLCV frame, or None if its origin is unknown.
+
+        The frame must carry ``exchange``, ``symbol`` and ``timeframe`` in
+        ``df.attrs`` (set by ``ExchangeHandler.get_ohlcv``). Besides the last
+        candle timestamp the key holds the window start and length, which
+        change EWM warm-up, and the last close and volume, which change while
+        the last candle is still open.
+        """
+        attrs = df.attrs
+        if df.empty or not all(attrs.get(k) for k in ('exchange', 'symbol', 'timeframe')):
+            return None
+        last = df.iloc[-1]
+        return (
+            attrs['exchange'], attrs['symbol'], attrs['timeframe'],
+            df.index[-1], df.index[0], len(df),
+            float(last['close']), float(last.get('volume', 0.0)),
+            params
+        )
+
+    def get(self, key: Hashable) -> Optional[pd.DataFrame]:
+        """Return the cached frame for ``key`` and mark it as recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, frame: pd.DataFrame) -> None:
+        """Store ``frame`` under ``key``, evicting least recently used entries"""
+        size = int(frame.memory_usage(index=True, deep=False).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            self._entries[key] = (frame, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and memory usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes
+            }
+
+
+# Shared by every TechnicalAnalyzer in the process
+indicator_cache = IndicatorCache()
@@ -0,0 +1,242 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIX = 'crypto_bot'
+
+Labels = Tuple[Tuple[str, str], ...]
+_NULL_TIMER = nullcontext()
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside its bucket"""
+        with self._lock:
+            counts, total, largest = list(self.counts), self.count, self.max
+        if total == 0:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else largest
+                return min(lower + (upper - lower) * (rank - seen) / count, largest)
+            seen += count
+        return largest
+
+
+class MetricsRegistry:
+    """Stage latency histograms and counters, rendered in the Prometheus text format.
+
+    While ``enabled`` is False, ``timer`` hands back a shared no-op context
+    and ``inc``/``observe`` return immediately, so instrumented code pays
+    only an attribute check. Collectors registered with
+    ``register_collector`` are polled on export for values other modules
+    already count (cache hits, rate limiter requests).
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]] = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record one latency sample for ``stage``"""
+        if not self.enabled:
+            return
+        key = ('stage_latency_seconds', (('stage', stage),))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        histogram.observe(seconds)
+
+    def timer(self, stage: str):
+        """Context manager timing a block as one ``stage`` sample"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timed(stage)
+
+    @contextmanager
+    def _timed(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Add ``value`` to the counter ``name`` with ``labels``"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]) -> None:
+        """Add a callable returning ``(counter name, labels, value)`` samples on export"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def _samples(self) -> List[Tuple[str, Labels, float]]:
+        with self._lock:
+            samples = [(name, labels, value) for (name, labels), value in self._counters.items()]
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                samples.extend((name, tuple(sorted(labels.items())), value) for name, labels, value in collector())
+            except Exception as e:
+                print(f"Error collecting metrics: {str(e)}")
+        return samples
+
+    @staticmethod
+    def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+    def render_prometheus(self) -> str:
+        """Export all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        declared = set()
+        for (name, labels), histogram in histograms:
+            metric = f"{PREFIX}_{name}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} histogram")
+                declared.add(metric)
+            with histogram._lock:
+                counts, total, count = list(histogram.counts), histogram.sum, histogram.count
+            cumulative = 0
+            for bound, bucket_count in zip([str(b) for b in histogram.buckets] + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{self._format_labels(labels, (('le', bound),))} {cumulative}")
+            lines.append(f"{metric}_sum{self._format_labels(labels)} {total}")
+            lines.append(f"{metric}_count{self._format_labels(labels)} {count}")
+
+        for name, labels, value in sorted(self._samples()):
+            metric = f"{PREFIX}_{name}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} {'counter' if name.endswith('_total') else 'gauge'}")
+                declared.add(metric)
+            lines.append(f"{metric}{self._format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> List[Dict[str, float]]:
+        """Per-stage latency summary rows (milliseconds) for the dashboard"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        rows = []
+        for (_, labels), histogram in histograms:
+            if histogram.count == 0:
+                continue
+            rows.append({
+                'stage': dict(labels).get('stage', ''),
+                'count': histogram.count,
+                'mean_ms': histogram.sum / histogram.count * 1000,
+                'p50_ms': histogram.quantile(0.5) * 1000,
+                'p95_ms': histogram.quantile(0.95) * 1000,
+                'p99_ms': histogram.quantile(0.99) * 1000,
+                'max_ms': histogram.max * 1000
+            })
+        return rows
+
+    def start_http_server(self, port: int = None, host: str = '127.0.0.1') -> int:
+        """Serve ``/metrics`` on a local port in a daemon thread; returns the port"""
+        if self._server is not None:
+            return self._server.server_address[1]
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        port = port if port is not None else int(os.getenv('METRICS_PORT', '9108'))
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def stop_http_server(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _indicator_cache_samples():
+    from .indicator_cache import indicator_cache
+    stats = indicator_cache.stats()
+    return [
+        ('indicator_cache_hits_total', {}, stats['hits']),
+        ('indicator_cache_misses_total', {}, stats['misses']),
+        ('indicator_cache_evictions_total', {}, stats['evictions']),
+        ('indicator_cache_bytes', {}, stats['bytes'])
+    ]
+
+
+def _rate_limiter_samples():
+    from .rate_limiter import all_rate_limiters
+    samples = []
+    for exchange_id, limiter in all_rate_limiters().items():
+        stats = limiter.metrics()
+        labels = {'exchange': exchange_id}
+        samples += [
+            ('api_requests_total', labels, stats['requests']),
+            ('api_rejections_total', labels, stats['rejections']),
+            ('api_retries_total', labels, stats['retries']),
+            ('api_errors_total', labels, stats['errors']),
+            ('api_queue_wait_seconds_total', labels, stats['wait_seconds_total'])
+        ]
+    return samples
+
+
+# Shared by every module in the process; off unless METRICS_ENABLED=1 or switched on at runtime
+metrics = MetricsRegistry(enabled=os.getenv('METRICS_ENABLED') == '1')
+metrics.register_collector(_indicator_cache_samples)
+metrics.register_collector(_rate_limiter_samples)
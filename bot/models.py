@@ -48,6 +48,7 @@ class BotSettings(Base):
     enable_news = Column(Boolean, default=False)
     telegram_token = Column(String)
     telegram_chat_id = Column(String)
+    telegram_digest = Column(Boolean, default=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def to_dict(self):
@@ -61,5 +62,6 @@ class BotSettings(Base):
             'enable_news': self.enable_news,
             'telegram_token': self.telegram_token,
             'telegram_chat_id': self.telegram_chat_id,
+            'telegram_digest': bool(self.telegram_digest),
             'updated_at': self.updated_at.isoformat()
         }
@@ -1,48 +1,265 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
 import pandas as pd
 from textblob import TextBlob
 
+NEWS_FETCH_TTL = 15 * 60  # seconds before a currency's news is fetched again
+NEWS_CACHE_MAX_POSTS = 5000
+NEWS_BATCH_SIZE = 50  # currencies per CryptoPanic request
+NEWS_PAGE_SIZE = 20  # posts CryptoPanic returns per page
+NEWS_SAVE_INTERVAL = 60  # seconds between cache file writes after single-currency fetches
+
+
+def _news_cache_path():
+    return os.path.join(os.getenv('NEWS_CACHE_DIR', os.path.join('data', 'news')), 'cryptopanic.json')
+
+
+@lru_cache(maxsize=20000)
+def headline_sentiment(title):
+    """TextBlob polarity of a headline, computed once per distinct title"""
+    return TextBlob(title).sentiment.polarity
+
+
 class NewsAnalyzer:
-    def __init__(self):
+    """CryptoPanic news and headline sentiment per currency.
+
+    Posts are cached by ID (or URL) together with their sentiment, so a
+    headline is scored once however often it is fetched, and each
+    currency's result is reused for ``fetch_ttl`` seconds. Both survive
+    restarts through a JSON file (``NEWS_CACHE_DIR``), written once per
+    fetch_news_many call and at most every ``save_interval`` seconds after
+    single-currency fetches. Requests go through
+    one pooled session with a timeout; when a fetch fails the last cached
+    result is returned instead.
+    """
+
+    def __init__(self, fetch_ttl: float = NEWS_FETCH_TTL, timeout: float = 10, cache_path: str = None,
+                 max_posts: int = NEWS_CACHE_MAX_POSTS, api_key: str = None,
+                 save_interval: float = NEWS_SAVE_INTERVAL):
         self.crypto_news_api_url = "https://cryptopanic.com/api/v1/posts/"
         self.sentiment_threshold = 0.1
+        self.fetch_ttl = fetch_ttl
+        self.timeout = timeout
+        self.api_key = api_key or os.getenv('CRYPTOPANIC_API_KEY')
+        self.cache_path = cache_path or _news_cache_path()
+        self.max_posts = max_posts
+        self.save_interval = save_interval
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=2))
+        self.posts = OrderedDict()  # post ID or URL -> processed post
+        self.fetched = {}  # currency -> (fetched_at, post keys)
+        self.requests_made = 0
+        self._dirty = False  # posts or fetched changed since the last save
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+        self._load_cache()
 
-    def fetch_news(self, currency, hours=24):
-        """Fetch news for a specific cryptocurrency"""
+    def _load_cache(self):
         try:
+            with open(self.cache_path, 'r') as f:
+                cached = json.load(f)
+            self.posts = OrderedDict(cached['posts'])
+            self.fetched = {currency: (entry[0], entry[1]) for currency, entry in cached['fetched'].items()}
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def save_cache(self, max_age=None):
+        """Write the cache file if anything changed (and, with ``max_age``, the last write is older)"""
+        with self._lock:
+            if not self._dirty or (max_age is not None and time.time() - self._saved_at < max_age):
+                return
+            data = {'posts': dict(self.posts), 'fetched': dict(self.fetched)}
+            self._dirty = False
+            self._saved_at = time.time()
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            tmp_path = self.cache_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"Error saving news cache: {str(e)}")
+            with self._lock:
+                self._dirty = True
+
+    def _cached_news(self, currency, max_age=None):
+        """Posts last fetched for ``currency`` if younger than ``max_age`` seconds.
+
+        With ``max_age`` a result whose posts were partly evicted from
+        ``posts`` counts as a miss; without it (the fallback after a failed
+        fetch) whatever is left is returned.
+        """
+        with self._lock:
+            entry = self.fetched.get(currency)
+            if entry is None:
+                return None
+            fetched_at, keys = entry
+            if max_age is not None and time.time() - fetched_at > max_age:
+                return None
+            news_items = [self.posts[key] for key in keys if key in self.posts]
+            if max_age is not None and len(news_items) < len(keys):
+                return None
+            return news_items
+
+    def _request_page(self, currencies, url=None):
+        """One CryptoPanic request; returns the response body or None"""
+        params = None
+        if url is None:
+            url = self.crypto_news_api_url
             params = {
-                "currencies": currency,
+                "currencies": currencies,
                 "public": "true",
                 "kind": "news"
             }
-            
-            response = requests.get(self.crypto_news_api_url, params=params)
-            if response.status_code == 200:
-                news_data = response.json()
-                return self._process_news(news_data['results'])
-            else:
-                return None
+            if self.api_key:
+                params["auth_token"] = self.api_key
+        self.requests_made += 1
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        if response.status_code == 200:
+            return response.json()
+        print(f"Error fetching news: HTTP {response.status_code}")
+        return None
+
+    def _request_posts(self, currencies):
+        """First page of posts for ``currencies``, or None"""
+        page = self._request_page(currencies)
+        return None if page is None else page['results']
+
+    def fetch_news(self, currency, hours=24):
+        """Fetch news for a specific cryptocurrency"""
+        cached = self._cached_news(currency, self.fetch_ttl)
+        if cached is not None:
+            return cached
+        try:
+            results = self._request_posts(currency)
+            if results is None:
+                return self._cached_news(currency)
+            news_items = self._process_news(results)
+            with self._lock:
+                self.fetched[currency] = (time.time(), [self._post_key(item) for item in results])
+                self._dirty = True
+            self.save_cache(max_age=self.save_interval)
+            return news_items
         except Exception as e:
             print(f"Error fetching news: {str(e)}")
-            return None
+            return self._cached_news(currency)
+
+    def fetch_news_many(self, currencies, batch_size=NEWS_BATCH_SIZE, max_pages=5, posts_per_currency=NEWS_PAGE_SIZE):
+        """Fetch news for many currencies in as few requests as possible.
+
+        Currencies without a fresh cached result are requested
+        ``batch_size`` at a time through the comma-separated ``currencies``
+        filter. Pages are followed until every currency in the batch has
+        ``posts_per_currency`` posts (what a single fetch_news gets) or
+        ``max_pages`` is reached. Posts are split by their currency tags,
+        so a post tagged with several currencies counts for each. Busy
+        currencies can fill every page of a batch, so when the pages ran out
+        before the feed did, currencies left without a post are fetched on
+        their own with fetch_news instead of being cached as having no news.
+        Returns ``{currency: news items}``; currencies whose batch failed get
+        their last cached result, or None.
+        """
+        currencies = list(dict.fromkeys(currencies))
+        news = {}
+        missing = []
+        for currency in currencies:
+            cached = self._cached_news(currency, self.fetch_ttl)
+            if cached is None:
+                missing.append(currency)
+            else:
+                news[currency] = cached
+
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            keys = {currency: [] for currency in batch}
+            try:
+                page = self._request_page(','.join(batch))
+                if page is None:
+                    raise Exception("request failed")
+                pages = 1
+                exhausted = False
+                while True:
+                    self._process_news(page['results'])
+                    for item in page['results']:
+                        key = self._post_key(item)
+                        for tag in item.get('currencies') or []:
+                            if tag.get('code') in keys and key not in keys[tag['code']]:
+                                keys[tag['code']].append(key)
+                    exhausted = not page.get('next')
+                    if exhausted or pages >= max_pages or \
+                            all(len(found) >= posts_per_currency for found in keys.values()):
+                        break
+                    page = self._request_page(None, url=page['next'])
+                    pages += 1
+                    if page is None:
+                        # Keep what the earlier pages gave
+                        break
+            except Exception as e:
+                print(f"Error fetching news for {len(batch)} currencies: {str(e)}")
+                for currency in batch:
+                    news[currency] = self._cached_news(currency)
+                continue
+
+            now = time.time()
+            unmatched = [] if exhausted else [currency for currency, found in keys.items() if not found]
+            with self._lock:
+                for currency, found in keys.items():
+                    if currency not in unmatched:
+                        self.fetched[currency] = (now, found[:posts_per_currency])
+                self._dirty = True
+            for currency in batch:
+                if currency in unmatched:
+                    news[currency] = self.fetch_news(currency)
+                else:
+                    news[currency] = self._cached_news(currency)
+
+        self.save_cache()
+        return {currency: news.get(currency) for currency in currencies}
+
+    def get_trading_signals(self, currencies, **kwargs):
+        """get_trading_signal for many currencies, fetched together by fetch_news_many"""
+        return {
+            currency: self._signal_from_news(news_items)
+            for currency, news_items in self.fetch_news_many(currencies, **kwargs).items()
+        }
+
+    @staticmethod
+    def _post_key(item):
+        return str(item.get('id') or item['url'])
 
     def _process_news(self, news_items):
         """Process news items and calculate sentiment"""
         processed_news = []
-        
-        for item in news_items:
-            # Calculate sentiment using TextBlob
-            blob = TextBlob(item['title'])
-            sentiment = blob.sentiment.polarity
-            
-            processed_news.append({
-                'title': item['title'],
-                'url': item['url'],
-                'published_at': item['published_at'],
-                'sentiment': sentiment
-            })
-            
+
+        with self._lock:
+            for item in news_items:
+                key = self._post_key(item)
+                processed = self.posts.get(key)
+                if processed is None:
+                    # Calculate sentiment using TextBlob
+                    processed = {
+                        'title': item['title'],
+                        'url': item['url'],
+                        'published_at': item['published_at'],
+                        'sentiment': headline_sentiment(item['title']),
+                        'currencies': [c['code'] for c in item.get('currencies') or [] if 'code' in c]
+                    }
+                    self.posts[key] = processed
+                    self._dirty = True
+                else:
+                    self.posts.move_to_end(key)
+                processed_news.append(processed)
+
+            while len(self.posts) > self.max_posts:
+                self.posts.popitem(last=False)
+
         return processed_news
 
     def analyze_sentiment(self, news_items):
@@ -57,7 +274,10 @@ class NewsAnalyzer:
 
     def get_trading_signal(self, currency):
         """Generate trading signal based on news sentiment"""
-        news_items = self.fetch_news(currency)
+        return self._signal_from_news(self.fetch_news(currency))
+
+    def _signal_from_news(self, news_items):
+        """Classify the average sentiment of ``news_items`` as BUY, SELL or NEUTRAL"""
         if news_items:
             sentiment = self.analyze_sentiment(news_items)
             
@@ -0,0 +1,283 @@
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+
+BID = 'bids'
+ASK = 'asks'
+
+
+def _levels(levels) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert ``[[price, size], ...]`` (numbers or strings) to price/size arrays sorted by price"""
+    data = np.asarray(levels, dtype=np.float64).reshape(-1, 2)
+    if len(data) == 0:
+        return np.empty(0), np.empty(0)
+    # Last entry wins when a price appears twice in one message
+    order = np.argsort(data[:, 0], kind='stable')
+    data = data[order]
+    keep = np.append(data[1:, 0] != data[:-1, 0], True)
+    return data[keep, 0].copy(), data[keep, 1].copy()
+
+
+def _merge(prices: np.ndarray, sizes: np.ndarray, update_prices: np.ndarray,
+           update_sizes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Apply absolute level updates to one side; a size of 0 removes the level"""
+    if len(update_prices) == 0:
+        return prices, sizes
+    index = np.searchsorted(prices, update_prices)
+    found = index < len(prices)
+    found[found] = prices[index[found]] == update_prices[found]
+
+    sizes = sizes.copy()
+    sizes[index[found]] = update_sizes[found]
+    added = ~found & (update_sizes > 0)
+    prices = np.insert(prices, index[added], update_prices[added])
+    sizes = np.insert(sizes, index[added], update_sizes[added])
+
+    live = sizes > 0
+    return prices[live], sizes[live]
+
+
+class OrderBook:
+    """Order book for one symbol kept up to date from incremental diff updates.
+
+    Both sides are stored as NumPy price/size arrays sorted by ascending
+    price, so the best bid is the last bid and the best ask the first ask.
+    Diffs follow the Binance depth stream format (``U``/``u`` first and last
+    update ids, ``b``/``a`` absolute level sizes). A gap in the update ids
+    marks the book out of sync; if ``fetch_snapshot`` is given a new REST
+    snapshot is loaded and the buffered diffs are replayed on top of it.
+    Only one snapshot is requested at a time, and after a failed resync the
+    next one waits ``resync_delay`` seconds, doubling up to
+    ``max_resync_delay``; diffs arriving meanwhile are buffered.
+    """
+
+    def __init__(self, symbol: str, fetch_snapshot: Callable[[], Optional[Dict]] = None,
+                 max_levels: int = 5000, max_buffer: int = 1000, resync_delay: float = 1.0,
+                 max_resync_delay: float = 60.0):
+        self.symbol = symbol
+        self.fetch_snapshot = fetch_snapshot
+        self.max_levels = max_levels
+        self.max_buffer = max_buffer
+        self.resync_delay = resync_delay
+        self.max_resync_delay = max_resync_delay
+        self.bid_prices = np.empty(0)
+        self.bid_sizes = np.empty(0)
+        self.ask_prices = np.empty(0)
+        self.ask_sizes = np.empty(0)
+        self.last_update_id: Optional[int] = None
+        self.synced = False
+        self.timestamp: Optional[int] = None
+        self.updates = 0
+        self.gaps = 0
+        self.resyncs = 0
+        self.resync_failures = 0
+        self._next_resync = 0.0  # monotonic time before which no automatic resync starts
+        self._buffer: List[Dict] = []
+        self._lock = threading.Lock()
+        self._resync_lock = threading.Lock()
+
+    def apply_snapshot(self, snapshot: Dict) -> None:
+        """Replace the book with a REST snapshot (ccxt or raw Binance format)"""
+        with self._lock:
+            self._apply_snapshot(snapshot)
+            # Diffs that arrived while out of sync may already be newer than the snapshot
+            buffered, self._buffer = self._buffer, []
+            for event in buffered:
+                self._apply_diff(event)
+
+    def _apply_snapshot(self, snapshot: Dict) -> None:
+        update_id = snapshot.get('lastUpdateId', snapshot.get('nonce'))
+        self.bid_prices, self.bid_sizes = _levels(snapshot.get(BID, []))
+        self.ask_prices, self.ask_sizes = _levels(snapshot.get(ASK, []))
+        self._trim()
+        self.last_update_id = int(update_id) if update_id is not None else None
+        self.timestamp = snapshot.get('timestamp')
+        self.synced = True
+
+    def apply_diff(self, event: Dict) -> bool:
+        """Apply one diff update; returns False if the book is (now) out of sync"""
+        with self._lock:
+            applied = self._apply_diff(event)
+        if not applied and self.fetch_snapshot is not None and time.monotonic() >= self._next_resync:
+            return self.resync()
+        return applied
+
+    def _apply_diff(self, event: Dict) -> bool:
+        first_id, last_id = int(event['U']), int(event['u'])
+        if not self.synced:
+            self._buffer_event(event)
+            return False
+        if self.last_update_id is not None:
+            if last_id <= self.last_update_id:
+                # Already contained in the snapshot
+                return True
+            if first_id > self.last_update_id + 1:
+                print(f"Order book gap for {self.symbol}: expected {self.last_update_id + 1}, got {first_id}")
+                self.gaps += 1
+                self.synced = False
+                self._buffer_event(event)
+                return False
+
+        self.bid_prices, self.bid_sizes = _merge(self.bid_prices, self.bid_sizes, *_levels(event.get('b', [])))
+        self.ask_prices, self.ask_sizes = _merge(self.ask_prices, self.ask_sizes, *_levels(event.get('a', [])))
+        self._trim()
+        self.last_update_id = last_id
+        self.timestamp = event.get('E', self.timestamp)
+        self.updates += 1
+        return True
+
+    def _buffer_event(self, event: Dict) -> None:
+        self._buffer.append(event)
+        if len(self._buffer) > self.max_buffer:
+            del self._buffer[0]
+
+    def _trim(self) -> None:
+        if len(self.bid_prices) > self.max_levels:
+            self.bid_prices = self.bid_prices[-self.max_levels:]
+            self.bid_sizes = self.bid_sizes[-self.max_levels:]
+        if len(self.ask_prices) > self.max_levels:
+            self.ask_prices = self.ask_prices[:self.max_levels]
+            self.ask_sizes = self.ask_sizes[:self.max_levels]
+
+    def resync(self) -> bool:
+        """Reload the book from a fresh snapshot and replay buffered diffs.
+
+        Returns False straight away while another resync is running.
+        """
+        if self.fetch_snapshot is None or not self._resync_lock.acquire(blocking=False):
+            return False
+        try:
+            try:
+                snapshot = self.fetch_snapshot()
+                if not snapshot:
+                    raise Exception("Empty order book snapshot received")
+                self.apply_snapshot(snapshot)
+                self.resyncs += 1
+            except Exception as e:
+                print(f"Error resyncing order book for {self.symbol}: {str(e)}")
+            if self.synced:
+                self.resync_failures = 0
+                self._next_resync = 0.0
+            else:
+                # E.g. a snapshot older than the buffered diffs: back off before asking again
+                self.resync_failures += 1
+                delay = min(self.max_resync_delay, self.resync_delay * 2 ** (self.resync_failures - 1))
+                self._next_resync = time.monotonic() + delay
+            return self.synced
+        finally:
+            self._resync_lock.release()
+
+    def best_bid(self) -> Optional[float]:
+        """Highest bid price"""
+        return float(self.bid_prices[-1]) if len(self.bid_prices) else None
+
+    def best_ask(self) -> Optional[float]:
+        """Lowest ask price"""
+        return float(self.ask_prices[0]) if len(self.ask_prices) else None
+
+    def mid(self) -> Optional[float]:
+        """Mid price between the best bid and ask"""
+        with self._lock:
+            bid, ask = self.best_bid(), self.best_ask()
+        return None if bid is None or ask is None else (bid + ask) / 2
+
+    def spread(self, relative: bool = False) -> Optional[float]:
+        """Best ask minus best bid, or its fraction of the mid price if ``relative``"""
+        with self._lock:
+            bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return None
+        spread = ask - bid
+        return spread / ((bid + ask) / 2) if relative else spread
+
+    def depth(self, pct: float, quote: bool = False) -> Dict[str, float]:
+        """Bid and ask size within ``pct`` percent of the mid price (in quote currency if ``quote``)"""
+        with self._lock:
+            bid, ask = self.best_bid(), self.best_ask()
+            if bid is None or ask is None:
+                return {'bids': 0.0, 'asks': 0.0}
+            mid = (bid + ask) / 2
+            low, high = mid * (1 - pct / 100), mid * (1 + pct / 100)
+            bid_start = np.searchsorted(self.bid_prices, low, side='left')
+            ask_stop = np.searchsorted(self.ask_prices, high, side='right')
+            bid_prices, bid_sizes = self.bid_prices[bid_start:], self.bid_sizes[bid_start:]
+            ask_prices, ask_sizes = self.ask_prices[:ask_stop], self.ask_sizes[:ask_stop]
+            if quote:
+                return {'bids': float(bid_prices @ bid_sizes), 'asks': float(ask_prices @ ask_sizes)}
+            return {'bids': float(bid_sizes.sum()), 'asks': float(ask_sizes.sum())}
+
+    def imbalance(self, pct: float = None, levels: int = None) -> Optional[float]:
+        """Bid/ask size imbalance in [-1, 1] within ``pct`` percent of mid or over the top ``levels``"""
+        if pct is not None:
+            depth = self.depth(pct)
+            bids, asks = depth['bids'], depth['asks']
+        else:
+            with self._lock:
+                count = levels or self.max_levels
+                bids = float(self.bid_sizes[-count:].sum())
+                asks = float(self.ask_sizes[:count].sum())
+        total = bids + asks
+        return (bids - asks) / total if total > 0 else None
+
+    def to_dict(self, limit: int = 20) -> Dict:
+        """Top ``limit`` levels in the ccxt order book layout returned by get_order_book"""
+        with self._lock:
+            bids = np.column_stack([self.bid_prices[-limit:][::-1], self.bid_sizes[-limit:][::-1]])
+            asks = np.column_stack([self.ask_prices[:limit], self.ask_sizes[:limit]])
+            return {
+                'symbol': self.symbol,
+                'bids': bids.tolist(),
+                'asks': asks.tolist(),
+                'timestamp': self.timestamp,
+                'nonce': self.last_update_id
+            }
+
+    def stats(self) -> Dict[str, float]:
+        """Return sync state and update counters"""
+        return {
+            'synced': self.synced,
+            'last_update_id': self.last_update_id,
+            'bid_levels': len(self.bid_prices),
+            'ask_levels': len(self.ask_prices),
+            'updates': self.updates,
+            'gaps': self.gaps,
+            'resyncs': self.resyncs,
+            'resync_failures': self.resync_failures,
+            'buffered': len(self._buffer)
+        }
+
+
+def read_recording(path: str) -> Iterator[Dict]:
+    """Yield messages from a recorded JSON-lines order book file"""
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def record_message(path: str, message: Dict) -> None:
+    """Append a snapshot or diff message to a JSON-lines recording"""
+    with open(path, 'a') as f:
+        f.write(json.dumps(message) + '\n')
+
+
+def replay(path: str, symbol: str = None, book: OrderBook = None,
+           on_update: Callable[[OrderBook], None] = None) -> OrderBook:
+    """Rebuild an order book from a recording.
+
+    Messages with a ``lastUpdateId`` (or ``nonce``) are treated as snapshots
+    and everything else as diffs; ``on_update`` is called after each message.
+    Snapshots in the recording double as resync points after a gap.
+    """
+    book = book or OrderBook(symbol or path)
+    for message in read_recording(path):
+        if 'U' in message and 'u' in message:
+            book.apply_diff(message)
+        else:
+            book.apply_snapshot(message)
+        if on_update is not None:
+            on_update(book)
+    return book
@@ -0,0 +1,118 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Union
+import numpy as np
+import pandas as pd
+from .analysis import TechnicalAnalyzer
+from .backtester import Backtester
+
+# Coarse grid over the ranges offered by the dashboard sliders
+DEFAULT_GRID = {
+    'rsi_period': [7, 10, 14, 21],
+    'macd_fast': [8, 12, 16, 20],
+    'macd_slow': [21, 26, 30],
+    'macd_signal': [5, 9, 12]
+}
+
+# Per-process views onto the shared candle arrays, set by _attach_worker
+_shared = {}
+
+
+def _attach_worker(prices_name, prices_shape, times_name, times_shape, pairs, horizon, apply_cooldown):
+    """Pool initializer: map the shared candle arrays without copying them"""
+    prices_shm = shared_memory.SharedMemory(name=prices_name)
+    times_shm = shared_memory.SharedMemory(name=times_name)
+    _shared.update(
+        segments=(prices_shm, times_shm),
+        prices=np.ndarray(prices_shape, dtype=np.float64, buffer=prices_shm.buf),
+        timestamps=np.ndarray(times_shape, dtype=np.int64, buffer=times_shm.buf),
+        pairs=pairs,
+        horizon=horizon,
+        apply_cooldown=apply_cooldown
+    )
+
+
+def _evaluate_params(params: Dict[str, int]) -> Dict[str, float]:
+    """Backtest one parameter combination against the shared candles"""
+    high, low, close = _shared['prices']
+    backtester = Backtester(
+        TechnicalAnalyzer(**params),
+        horizon=_shared['horizon'],
+        apply_cooldown=_shared['apply_cooldown']
+    )
+    trades = backtester.run_arrays(high, low, close, _shared['timestamps'], _shared['pairs'])
+    return {**params, **ParameterSweep.score(trades)}
+
+
+class ParameterSweep:
+    """Rank RSI/MACD settings by backtesting a grid on all CPU cores.
+
+    The aligned high/low/close panels and timestamps are placed once in
+    shared memory; worker processes map them directly, so only parameter
+    dicts and result rows cross process boundaries.
+    """
+
+    def __init__(self, data: Union[pd.DataFrame, Dict[str, pd.DataFrame]], horizon: int = 168,
+                 apply_cooldown: bool = True, max_workers: int = None):
+        self.index, self.pairs, high, low, close = Backtester.align(data)
+        self.prices = np.stack([high, low, close])
+        self.horizon = horizon
+        self.apply_cooldown = apply_cooldown
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    @staticmethod
+    def expand_grid(grid: Dict[str, List[int]]) -> List[Dict[str, int]]:
+        """List every combination of the grid, skipping fast >= slow MACD"""
+        names = list(grid)
+        combos = [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+        return [c for c in combos if c.get('macd_fast', 12) < c.get('macd_slow', 26)]
+
+    @staticmethod
+    def score(trades: pd.DataFrame) -> Dict[str, float]:
+        """Aggregate backtest trades over all pairs into sweep metrics"""
+        if trades.empty:
+            return {'signals': 0, 'win_rate': 0.0, 'target_1_rate': 0.0, 'stop_rate': 0.0,
+                    'avg_return_pct': 0.0, 'total_return_pct': 0.0}
+        return {
+            'signals': len(trades),
+            'win_rate': float((trades['return_pct'] > 0).mean()),
+            'target_1_rate': float((trades['targets_hit'] >= 1).mean()),
+            'stop_rate': float((trades['outcome'] == 'stop').mean()),
+            'avg_return_pct': float(trades['return_pct'].mean()),
+            'total_return_pct': float(trades['return_pct'].sum())
+        }
+
+    def run(self, grid: Dict[str, List[int]] = None, rank_by: str = 'total_return_pct') -> pd.DataFrame:
+        """Evaluate every grid combination and return results ranked by ``rank_by``"""
+        combos = self.expand_grid(grid or DEFAULT_GRID)
+        if not combos:
+            return pd.DataFrame()
+
+        timestamps = self.index.as_unit('ns').asi8
+        prices_shm = shared_memory.SharedMemory(create=True, size=self.prices.nbytes)
+        times_shm = shared_memory.SharedMemory(create=True, size=max(timestamps.nbytes, 1))
+        try:
+            np.ndarray(self.prices.shape, dtype=np.float64, buffer=prices_shm.buf)[:] = self.prices
+            np.ndarray(timestamps.shape, dtype=np.int64, buffer=times_shm.buf)[:] = timestamps
+
+            workers = min(self.max_workers, len(combos))
+            chunksize = max(1, len(combos) // (workers * 4))
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_attach_worker,
+                initargs=(prices_shm.name, self.prices.shape, times_shm.name, timestamps.shape,
+                          self.pairs, self.horizon, self.apply_cooldown)
+            ) as pool:
+                results = list(pool.map(_evaluate_params, combos, chunksize=chunksize))
+        finally:
+            prices_shm.close()
+            prices_shm.unlink()
+            times_shm.close()
+            times_shm.unlink()
+
+        ranked = pd.DataFrame(results).sort_values(rank_by, ascending=False, ignore_index=True)
+        ranked.index += 1
+        ranked.index.name = 'rank'
+        return ranked
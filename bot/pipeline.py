@@ -0,0 +1,210 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+_STOP = object()
+
+
+class Batch:
+    """Tracks a group of pipeline items (e.g. one monitor cycle) until each has a result.
+
+    Items are keyed; a stage records ``finish(key, result)`` once an item
+    is decided. Keys can be abandoned (timed out or skipped), after which
+    stages drop the item and later results for it are ignored.
+    """
+
+    def __init__(self, keys: Iterable[Hashable]):
+        self.pending = set(keys)
+        self.results: Dict[Hashable, str] = {}
+        self.started: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if not self.pending:
+            self._done.set()
+
+    def start(self, key: Hashable) -> None:
+        with self._lock:
+            self.started.setdefault(key, time.monotonic())
+
+    def is_open(self, key: Hashable) -> bool:
+        """True while ``key`` still awaits a result"""
+        with self._lock:
+            return key in self.pending
+
+    def finish(self, key: Hashable, result: str) -> None:
+        """Record ``key``'s result; also used to give up on it (timeouts, skips)"""
+        with self._lock:
+            if key not in self.pending:
+                return
+            self.pending.discard(key)
+            self.results[key] = result
+            if not self.pending:
+                self._done.set()
+
+    def running_since(self, key: Hashable) -> Optional[float]:
+        with self._lock:
+            return self.started.get(key) if key in self.pending else None
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+
+class Stage:
+    """One pipeline step: ``workers`` threads applying ``function`` to items from a bounded inbox.
+
+    ``function`` returns the item to pass downstream, or None to end it
+    there. Because inboxes are bounded, a slow stage blocks the ones
+    upstream of it instead of letting work pile up in memory.
+    ``on_error(item, exception)`` is called when ``function`` raises.
+
+    With ``batch_size`` > 1 a worker takes whatever is queued, up to that
+    many items, and ``function`` gets the list and returns an iterable of
+    items to pass downstream. A failing batch reports every item to
+    ``on_error``.
+    """
+
+    def __init__(self, name: str, function: Callable, workers: int = 1, maxsize: int = 100,
+                 on_error: Callable = None, batch_size: int = 1):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.batch_size = batch_size
+        self.inbox = queue.Queue(maxsize=maxsize)
+        self.on_error = on_error
+        self.next_stage: Optional['Stage'] = None
+        self.processed = 0
+        self.errors = 0
+        self.busy = 0
+        self.busy_seconds = 0.0
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _take(self) -> List:
+        """Block for one item, then add whatever else is queued, up to batch_size"""
+        items = [self.inbox.get()]
+        while len(items) < self.batch_size and items[-1] is not _STOP:
+            try:
+                items.append(self.inbox.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self) -> None:
+        while True:
+            items = self._take()
+            stop = items[-1] is _STOP
+            if stop:
+                items.pop()
+            if items:
+                self._process(items)
+            if stop:
+                self.inbox.task_done()
+                return
+
+    def _process(self, items: List) -> None:
+        with self._lock:
+            self.busy += 1
+        started = time.monotonic()
+        try:
+            if self.batch_size > 1:
+                results = list(self.function(items))
+            else:
+                results = [self.function(items[0])]
+            for result in results:
+                if result is not None and self.next_stage is not None:
+                    # Blocks while the next stage is full: this is the backpressure
+                    self.next_stage.inbox.put(result)
+            with self._lock:
+                self.processed += len(items)
+        except Exception as e:
+            with self._lock:
+                self.errors += len(items)
+            for item in items:
+                if self.on_error is not None:
+                    self.on_error(item, e)
+                else:
+                    print(f"Error in {self.name} stage: {str(e)}")
+        finally:
+            with self._lock:
+                self.busy -= 1
+                self.busy_seconds += time.monotonic() - started
+            for _ in items:
+                self.inbox.task_done()
+            with self._lock:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Wait until nothing is queued or being processed"""
+        with self._lock:
+            return self._idle.wait_for(lambda: self.inbox.unfinished_tasks == 0, timeout)
+
+    def stop(self, timeout: float = None) -> None:
+        for _ in self._threads:
+            self.inbox.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'queued': self.inbox.qsize(),
+                'capacity': self.inbox.maxsize,
+                'workers': self.workers,
+                'batch_size': self.batch_size,
+                'busy': self.busy,
+                'processed': self.processed,
+                'errors': self.errors,
+                'busy_seconds': self.busy_seconds
+            }
+
+
+class Pipeline:
+    """Chain of stages connected by bounded queues"""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        for stage, following in zip(stages, stages[1:]):
+            stage.next_stage = following
+        self.running = False
+
+    def start(self) -> None:
+        if not self.running:
+            for stage in self.stages:
+                stage.start()
+            self.running = True
+
+    def stop(self, timeout: float = None) -> None:
+        """Stop the stages in order, letting each drain what is already queued"""
+        if self.running:
+            for stage in self.stages:
+                stage.stop(timeout)
+            self.running = False
+
+    def put(self, item, timeout: float = None) -> None:
+        """Feed an item to the first stage, blocking while it is full"""
+        self.stages[0].inbox.put(item, timeout=timeout)
+
+    def wait_idle(self, stage_names: Iterable[str], timeout: float = None) -> bool:
+        """Wait, in pipeline order, for the named stages to finish everything handed to them"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for stage in self.stages:
+            if stage.name in stage_names:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not stage.wait_idle(remaining):
+                    return False
+        return True
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {stage.name: stage.inbox.qsize() for stage in self.stages}
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {stage.name: stage.stats() for stage in self.stages}
@@ -0,0 +1,250 @@
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from typing import Dict
+import ccxt
+from .metrics import metrics
+
+# Request weight of each endpoint, following Binance's spot API weights
+ENDPOINT_WEIGHTS = {
+    'fetch_ohlcv': 2,
+    'fetch_ticker': 2,
+    'fetch_order_book': 5,
+    'load_markets': 20
+}
+
+# (bucket capacity, refill per second) in request weight per exchange. A full
+# bucket plus a minute of refill stays under the per-minute limit (Binance:
+# 6000 weight/min), so even a burst from idle cannot exceed it.
+EXCHANGE_LIMITS = {
+    'binance': (500, 90.0),
+    # Offline ReplayExchange: only its simulated latency limits throughput
+    'replay': (1e9, 1e9)
+}
+DEFAULT_LIMITS = (100, 18.0)
+
+# Upper bounds (seconds) of the queue wait histogram buckets
+WAIT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+# Errors worth retrying; anything else is raised straight away
+RATE_LIMIT_ERRORS = (ccxt.RateLimitExceeded, ccxt.DDoSProtection)
+TRANSIENT_ERRORS = (ccxt.NetworkError, ccxt.ExchangeNotAvailable, ccxt.RequestTimeout)
+
+# Headers of the last response received by the current thread or task, see watch_responses
+_response_headers = contextvars.ContextVar('response_headers', default=None)
+
+
+def watch_responses(exchange) -> None:
+    """Make a ccxt exchange record response headers per thread and asyncio task.
+
+    ``exchange.last_response_headers`` is shared by every caller of the
+    instance, so under concurrency it may hold another request's headers.
+    ccxt passes each response's headers to ``handle_errors`` before raising
+    on an error status, in the context of the request that got them.
+    """
+    handle_errors = getattr(exchange, 'handle_errors', None)
+    if handle_errors is None or getattr(handle_errors, 'records_headers', False):
+        return
+
+    def recording_handle_errors(code, reason, url, method, headers, *args, **kwargs):
+        _response_headers.set(headers)
+        return handle_errors(code, reason, url, method, headers, *args, **kwargs)
+
+    recording_handle_errors.records_headers = True
+    exchange.handle_errors = recording_handle_errors
+
+
+def endpoint_cost(endpoint: str, limit: int = None) -> int:
+    """Request weight of an endpoint call"""
+    if endpoint == 'fetch_order_book' and limit:
+        if limit > 500:
+            return 50
+        if limit > 100:
+            return 25
+    return ENDPOINT_WEIGHTS.get(endpoint, 1)
+
+
+class TokenBucket:
+    """Thread-safe token bucket where callers reserve tokens in arrival order.
+
+    A reservation may take the balance negative; the caller then waits until
+    the refill has paid it back, which queues concurrent callers fairly.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def reserve(self, cost: float) -> float:
+        """Take ``cost`` tokens and return how long to wait before using them"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= cost
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.refill_rate
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for ``seconds``, e.g. after a Retry-After"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -seconds * self.refill_rate)
+
+
+class RateLimiter:
+    """Request scheduler shared by every thread and handler of one exchange.
+
+    Calls reserve their endpoint weight from a token bucket before running.
+    Rate-limit rejections and transient network errors are retried with
+    exponential backoff and jitter, honouring ``Retry-After`` when the
+    failed response carries one; a rejection also pauses the whole bucket
+    since the limit applies to the IP, not the caller.
+    """
+
+    def __init__(self, exchange_id: str, capacity: float = None, refill_rate: float = None,
+                 max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 30.0):
+        default_capacity, default_rate = EXCHANGE_LIMITS.get(exchange_id, DEFAULT_LIMITS)
+        self.exchange_id = exchange_id
+        self.bucket = TokenBucket(capacity or default_capacity, refill_rate or default_rate)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._metrics_lock = threading.Lock()
+        self.requests = 0
+        self.rejections = 0
+        self.retries = 0
+        self.errors = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def _record_wait(self, wait: float) -> None:
+        with self._metrics_lock:
+            self.requests += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            index = next((i for i, bound in enumerate(WAIT_BUCKETS) if wait <= bound), len(WAIT_BUCKETS))
+            self.wait_buckets[index] += 1
+
+    def acquire(self, endpoint: str, cost: float = None) -> float:
+        """Block until ``endpoint`` may be called; returns the time waited"""
+        wait = self.bucket.reserve(cost if cost is not None else endpoint_cost(endpoint))
+        if wait > 0:
+            time.sleep(wait)
+        self._record_wait(wait)
+        return wait
+
+    async def acquire_async(self, endpoint: str, cost: float = None) -> float:
+        """Wait without blocking the event loop until ``endpoint`` may be called"""
+        wait = self.bucket.reserve(cost if cost is not None else endpoint_cost(endpoint))
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._record_wait(wait)
+        return wait
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Delay before the next attempt, or raise ``error`` if out of retries"""
+        rejected = isinstance(error, RATE_LIMIT_ERRORS)
+        with self._metrics_lock:
+            if rejected:
+                self.rejections += 1
+            if attempt >= self.max_retries or not (rejected or isinstance(error, TRANSIENT_ERRORS)):
+                self.errors += 1
+                raise error
+            self.retries += 1
+
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.5)
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if rejected:
+            self.bucket.pause(delay)
+        return delay
+
+    @staticmethod
+    def _retry_after(error: Exception):
+        """Retry-After of the response that failed: from the error, else the one this context received"""
+        headers = getattr(error, 'headers', None) or _response_headers.get() or {}
+        for name, value in headers.items():
+            if name.lower() == 'retry-after':
+                try:
+                    return float(value)
+                except (TypeError, ValueError):
+                    return None
+        return None
+
+    def call(self, endpoint: str, function, *args, cost: float = None, exchange=None, **kwargs):
+        """Run ``function`` under the rate limit, retrying rejections and transient errors"""
+        if exchange is not None:
+            watch_responses(exchange)
+        attempt = 0
+        while True:
+            self.acquire(endpoint, cost)
+            metrics.inc('api_calls_total', exchange=self.exchange_id, endpoint=endpoint)
+            _response_headers.set(None)
+            try:
+                return function(*args, **kwargs)
+            except Exception as e:
+                metrics.inc('api_call_errors_total', exchange=self.exchange_id, endpoint=endpoint)
+                delay = self._backoff(attempt, e)
+                print(f"{endpoint} attempt {attempt + 1} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    async def call_async(self, endpoint: str, function, *args, cost: float = None, exchange=None, **kwargs):
+        """Async counterpart of ``call`` for coroutine functions"""
+        if exchange is not None:
+            watch_responses(exchange)
+        attempt = 0
+        while True:
+            await self.acquire_async(endpoint, cost)
+            metrics.inc('api_calls_total', exchange=self.exchange_id, endpoint=endpoint)
+            _response_headers.set(None)
+            try:
+                return await function(*args, **kwargs)
+            except Exception as e:
+                metrics.inc('api_call_errors_total', exchange=self.exchange_id, endpoint=endpoint)
+                delay = self._backoff(attempt, e)
+                print(f"{endpoint} attempt {attempt + 1} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def metrics(self) -> Dict[str, float]:
+        """Return request, rejection and queue wait statistics"""
+        with self._metrics_lock:
+            return {
+                'requests': self.requests,
+                'rejections': self.rejections,
+                'retries': self.retries,
+                'errors': self.errors,
+                'wait_seconds_total': self.wait_seconds_total,
+                'wait_seconds_max': self.wait_seconds_max,
+                'wait_seconds_avg': self.wait_seconds_total / self.requests if self.requests else 0.0,
+                'wait_histogram': dict(zip([str(b) for b in WAIT_BUCKETS] + ['+Inf'], self.wait_buckets))
+            }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(exchange_id: str) -> RateLimiter:
+    """Return the process-wide rate limiter for an exchange"""
+    with _limiters_lock:
+        limiter = _limiters.get(exchange_id)
+        if limiter is None:
+            limiter = _limiters[exchange_id] = RateLimiter(exchange_id)
+        return limiter
+
+
+def all_rate_limiters() -> Dict[str, RateLimiter]:
+    """Return every rate limiter created in this process by exchange id"""
+    with _limiters_lock:
+        return dict(_limiters)
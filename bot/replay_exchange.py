@@ -0,0 +1,395 @@
+import asyncio
+import bisect
+import inspect
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import zlib
+from typing import Dict, List, Sequence, Tuple
+import ccxt
+import numpy as np
+from .candle_store import CandleStore
+
+DEFAULT_OHLCV_LIMIT = 500  # what ccxt exchanges typically return without a limit
+SYNTHETIC_HISTORY = 5000  # candles available before the simulated start time
+DEFAULT_ERROR_TYPES = (ccxt.NetworkError, ccxt.RequestTimeout, ccxt.RateLimitExceeded)
+
+
+def synthetic_pairs(count: int, quote: str = 'USDT') -> List[str]:
+    """Symbols like ``SYN0001/USDT`` for load tests with many pairs"""
+    return [f"SYN{i:04d}/{quote}" for i in range(1, count + 1)]
+
+
+def _seed(*parts) -> int:
+    return zlib.crc32('|'.join(str(p) for p in parts).encode())
+
+
+def default_replay_id(recording: str = None, start_time: int = None, seed: int = 0) -> str:
+    """Id of a replay, derived from what determines its data"""
+    return f"replay-{_seed(recording or 'synthetic', start_time, seed):08x}"
+
+
+def replay_store_root(replay_id: str) -> str:
+    """Candle store directory of one replay, kept apart from the live store"""
+    return os.path.join(os.getenv('REPLAY_STORE_DIR', os.path.join(tempfile.gettempdir(), 'replay')), replay_id)
+
+
+class _SyntheticSeries:
+    """Deterministic random-walk candles for one (symbol, timeframe), extended on demand"""
+
+    def __init__(self, symbol: str, timeframe: str, origin_ms: int):
+        self.period = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        self.origin = origin_ms - origin_ms % self.period
+        self._rng = np.random.default_rng(_seed(symbol, timeframe))
+        self._sigma = 0.001 * np.sqrt(self.period / 60000)
+        self._price = float(np.exp(self._rng.uniform(np.log(0.1), np.log(50000))))
+        self._rows = np.empty((0, 6))
+        self._lock = threading.Lock()
+
+    def _extend(self, count: int) -> None:
+        size = max(count - len(self._rows), 1000)
+        returns = self._rng.normal(0, self._sigma, size)
+        close = self._price * np.exp(np.cumsum(returns))
+        open_ = np.r_[self._price, close[:-1]]
+        wick = np.abs(self._rng.normal(0, self._sigma / 2, (2, size)))
+        high = np.maximum(open_, close) * (1 + wick[0])
+        low = np.minimum(open_, close) * (1 - wick[1])
+        volume = self._rng.lognormal(3, 1, size)
+        start = len(self._rows)
+        timestamps = self.origin + (start + np.arange(size)) * self.period
+        self._rows = np.vstack([self._rows, np.column_stack([timestamps, open_, high, low, close, volume])])
+        self._price = float(close[-1])
+
+    def candles(self, now_ms: int, since: int = None, limit: int = None) -> np.ndarray:
+        """Candles opened up to ``now_ms``, from ``since`` or else the latest ``limit``"""
+        last = (now_ms - self.origin) // self.period
+        if last < 0:
+            return np.empty((0, 6))
+        limit = limit or DEFAULT_OHLCV_LIMIT
+        if since is None:
+            start = max(0, last - limit + 1)
+        else:
+            start = max(0, -(-(since - self.origin) // self.period))
+        stop = min(last + 1, start + limit)
+        with self._lock:
+            if stop > len(self._rows):
+                self._extend(stop)
+            return self._rows[start:stop]
+
+
+class ReplayExchange:
+    """Offline stand-in for a ccxt exchange serving recorded or synthetic market data.
+
+    Implements the subset of the ccxt interface used by the handlers
+    (``fetch_ohlcv``, ``fetch_ticker``, ``fetch_order_book``, markets and
+    the clock). Responses come from a recording made with
+    ``RecordingExchange`` where available and from deterministic synthetic
+    random walks otherwise. The simulated clock starts at ``start_time``
+    (the first recorded response, or now) and runs ``speed`` times faster
+    than real time. ``latency`` adds a random delay per call and
+    ``error_rate`` makes that share of calls raise one of ``error_types``.
+
+    Candles fetched through a handler go to the replay's own
+    ``candle_store`` (under ``replay_store_root(replay_id)``, where the id
+    defaults to one derived from the recording, start time and seed) and
+    its markets are served directly, so synthetic data never mixes into
+    the live store or markets cache.
+    """
+
+    id = 'replay'
+
+    def __init__(self, recording: str = None, symbols: Sequence[str] = None, start_time: int = None,
+                 speed: float = 1.0, latency: Tuple[float, float] = (0.0, 0.0), error_rate: float = 0.0,
+                 error_types: Sequence[type] = DEFAULT_ERROR_TYPES, seed: int = 0, replay_id: str = None,
+                 candle_store: CandleStore = None):
+        self.speed = speed
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_types = tuple(error_types)
+        self.markets = {}
+        self.currencies = {}
+        self.last_response_headers = {}
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], _SyntheticSeries] = {}
+        self._series_lock = threading.Lock()
+        self._recorded_markets = None
+        self._recorded_ohlcv: Dict[Tuple[str, str], np.ndarray] = {}
+        self._recorded_snapshots: Dict[Tuple[str, str], Tuple[List[int], List[Dict]]] = {}
+
+        if recording:
+            self._load_recording(recording)
+        recorded_symbols = list(dict.fromkeys(s for s, _ in self._recorded_ohlcv))
+        self.symbols = list(symbols or recorded_symbols or synthetic_pairs(10))
+        if start_time is None:
+            start_time = self._recording_start if recording else int(time.time() * 1000)
+        self.start_time = int(start_time)
+        self._started = time.monotonic()
+        self._advanced_ms = 0
+
+        self.replay_id = replay_id or default_replay_id(recording, self.start_time, seed)
+        self.candle_store = candle_store or CandleStore(replay_store_root(self.replay_id))
+        # Loaded up front so handlers never fall back to the shared markets cache
+        self.set_markets(*self._markets())
+
+    # ccxt helpers used by the handlers
+    parse_timeframe = staticmethod(ccxt.Exchange.parse_timeframe)
+
+    def milliseconds(self) -> int:
+        """Simulated exchange time in milliseconds"""
+        return self.start_time + self._advanced_ms + int((time.monotonic() - self._started) * 1000 * self.speed)
+
+    def advance(self, milliseconds: int) -> None:
+        """Move the simulated clock forward without waiting"""
+        # Kept apart from the elapsed time so it also works with a frozen clock (speed=0)
+        self._advanced_ms += int(milliseconds)
+
+    def _load_recording(self, path: str) -> None:
+        ohlcv: Dict[Tuple[str, str], List] = {}
+        first = None
+        with open(path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                method, response = entry['method'], entry['response']
+                first = entry['timestamp'] if first is None else min(first, entry['timestamp'])
+                if method == 'load_markets':
+                    self._recorded_markets = (response, entry.get('currencies', {}))
+                elif method == 'fetch_ohlcv':
+                    ohlcv.setdefault((entry['symbol'], entry.get('timeframe', '1m')), []).extend(response)
+                else:
+                    times, responses = self._recorded_snapshots.setdefault((method, entry['symbol']), ([], []))
+                    times.append(entry['timestamp'])
+                    responses.append(response)
+
+        for key, rows in ohlcv.items():
+            data = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+            data = data[np.argsort(data[:, 0], kind='stable')]
+            keep = np.append(data[1:, 0] != data[:-1, 0], True)
+            self._recorded_ohlcv[key] = data[keep]
+        for times, responses in self._recorded_snapshots.values():
+            order = sorted(range(len(times)), key=times.__getitem__)
+            times[:] = [times[i] for i in order]
+            responses[:] = [responses[i] for i in order]
+        self._recording_start = first if first is not None else int(time.time() * 1000)
+
+    def _series_for(self, symbol: str, timeframe: str) -> _SyntheticSeries:
+        key = (symbol, timeframe)
+        with self._series_lock:
+            series = self._series.get(key)
+            if series is None:
+                period = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+                origin = self.start_time - SYNTHETIC_HISTORY * period
+                series = self._series[key] = _SyntheticSeries(symbol, timeframe, origin)
+            return series
+
+    def _recorded(self, method: str, symbol: str):
+        """Latest recorded response at the simulated time, or None"""
+        recorded = self._recorded_snapshots.get((method, symbol))
+        if not recorded:
+            return None
+        times, responses = recorded
+        index = bisect.bisect_right(times, self.milliseconds()) - 1
+        return dict(responses[max(index, 0)])
+
+    def _delay(self) -> float:
+        """Pick this call's latency and raise an injected error if it is due"""
+        with self._random_lock:
+            self.calls += 1
+            delay = self._random.uniform(*self.latency)
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+            error_type = self._random.choice(self.error_types) if failed else None
+        if error_type is not None:
+            with self._random_lock:
+                self.errors += 1
+            raise error_type(f"{self.id} injected {error_type.__name__}")
+        return delay
+
+    def _call(self, function, *args):
+        delay = self._delay()
+        if delay > 0:
+            time.sleep(delay)
+        return function(*args)
+
+    def _markets(self) -> Tuple[Dict, Dict]:
+        if self._recorded_markets is not None:
+            return self._recorded_markets
+        markets, currencies = {}, {}
+        for symbol in self.symbols:
+            base, quote = symbol.split('/')
+            markets[symbol] = {
+                'id': base + quote, 'symbol': symbol, 'base': base, 'quote': quote,
+                'type': 'spot', 'spot': True, 'active': True,
+                'precision': {'amount': 8, 'price': 8},
+                'limits': {'amount': {'min': 0.0, 'max': None}, 'price': {'min': 0.0, 'max': None}}
+            }
+            for code in (base, quote):
+                currencies[code] = {'id': code, 'code': code, 'active': True}
+        return markets, currencies
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = markets
+        self.currencies = currencies or {}
+        return self.markets
+
+    def _ohlcv(self, symbol: str, timeframe: str = '1m', since: int = None, limit: int = None) -> List[List[float]]:
+        now = self.milliseconds()
+        recorded = self._recorded_ohlcv.get((symbol, timeframe))
+        if recorded is None:
+            return self._series_for(symbol, timeframe).candles(now, since, limit).tolist()
+        limit = limit or DEFAULT_OHLCV_LIMIT
+        stop = int(np.searchsorted(recorded[:, 0], now, side='right'))
+        if since is None:
+            return recorded[max(0, stop - limit):stop].tolist()
+        start = int(np.searchsorted(recorded[:, 0], since, side='left'))
+        return recorded[start:min(stop, start + limit)].tolist()
+
+    def _ticker(self, symbol: str) -> Dict:
+        recorded = self._recorded('fetch_ticker', symbol)
+        if recorded is not None:
+            return recorded
+        now = self.milliseconds()
+        day = self._series_for(symbol, '1m').candles(now, limit=1440)
+        last = float(day[-1, 4])
+        return {
+            'symbol': symbol,
+            'timestamp': now,
+            'datetime': ccxt.Exchange.iso8601(now),
+            'high': float(day[:, 2].max()),
+            'low': float(day[:, 3].min()),
+            'bid': last * 0.9999,
+            'ask': last * 1.0001,
+            'open': float(day[0, 1]),
+            'close': last,
+            'last': last,
+            'change': last - float(day[0, 1]),
+            'percentage': (last / float(day[0, 1]) - 1) * 100,
+            'baseVolume': float(day[:, 5].sum()),
+            'quoteVolume': float(day[:, 4] @ day[:, 5])
+        }
+
+    def _order_book(self, symbol: str, limit: int = None) -> Dict:
+        limit = limit or 100
+        recorded = self._recorded('fetch_order_book', symbol)
+        if recorded is not None:
+            recorded['bids'] = recorded['bids'][:limit]
+            recorded['asks'] = recorded['asks'][:limit]
+            return recorded
+        now = self.milliseconds()
+        mid = float(self._series_for(symbol, '1m').candles(now, limit=1)[-1, 4])
+        rng = np.random.default_rng(_seed(symbol, now // 1000))
+        steps = np.arange(1, limit + 1) * 0.0001
+        sizes = rng.exponential(1.0, (2, limit))
+        return {
+            'symbol': symbol,
+            'bids': np.column_stack([mid * (1 - steps), sizes[0]]).tolist(),
+            'asks': np.column_stack([mid * (1 + steps), sizes[1]]).tolist(),
+            'timestamp': now,
+            'datetime': ccxt.Exchange.iso8601(now),
+            'nonce': now
+        }
+
+    def load_markets(self, reload=False):
+        """Serve recorded markets, or synthetic spot markets for ``symbols``"""
+        if not self.markets or reload:
+            self._call(lambda: self.set_markets(*self._markets()))
+        return self.markets
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params=None):
+        return self._call(self._ohlcv, symbol, timeframe, since, limit)
+
+    def fetch_ticker(self, symbol, params=None):
+        return self._call(self._ticker, symbol)
+
+    def fetch_order_book(self, symbol, limit=None, params=None):
+        return self._call(self._order_book, symbol, limit)
+
+    def close(self):
+        pass
+
+    def stats(self) -> Dict[str, float]:
+        """Return call and injected error counts"""
+        return {'calls': self.calls, 'errors': self.errors, 'simulated_time': self.milliseconds()}
+
+
+class AsyncReplayExchange(ReplayExchange):
+    """ReplayExchange with coroutine methods, for AsyncExchangeHandler"""
+
+    async def _call_async(self, function, *args):
+        delay = self._delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return function(*args)
+
+    async def load_markets(self, reload=False):
+        if not self.markets or reload:
+            await self._call_async(lambda: self.set_markets(*self._markets()))
+        return self.markets
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params=None):
+        return await self._call_async(self._ohlcv, symbol, timeframe, since, limit)
+
+    async def fetch_ticker(self, symbol, params=None):
+        return await self._call_async(self._ticker, symbol)
+
+    async def fetch_order_book(self, symbol, limit=None, params=None):
+        return await self._call_async(self._order_book, symbol, limit)
+
+    async def close(self):
+        pass
+
+
+class RecordingExchange:
+    """Wraps a real (sync or async) ccxt exchange and appends its responses to a recording.
+
+    Every other attribute is forwarded to the wrapped exchange, so the
+    recorder can be handed to the handlers in place of it. The resulting
+    JSON-lines file is what ``ReplayExchange(recording=...)`` plays back.
+    """
+
+    RECORDED_METHODS = ('load_markets', 'fetch_ohlcv', 'fetch_ticker', 'fetch_order_book')
+
+    def __init__(self, exchange, path: str):
+        self.exchange = exchange
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attribute = getattr(self.exchange, name)
+        if name not in self.RECORDED_METHODS:
+            return attribute
+
+        def recorded(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            if inspect.isawaitable(result):
+                async def finish():
+                    response = await result
+                    self._record(name, args, kwargs, response)
+                    return response
+                return finish()
+            self._record(name, args, kwargs, result)
+            return result
+        return recorded
+
+    def _record(self, method: str, args, kwargs, response) -> None:
+        entry = {'method': method, 'timestamp': self.exchange.milliseconds()}
+        if method == 'load_markets':
+            entry['currencies'] = self.exchange.currencies
+        else:
+            entry['symbol'] = args[0] if args else kwargs.get('symbol')
+        if method == 'fetch_ohlcv':
+            entry['timeframe'] = args[1] if len(args) > 1 else kwargs.get('timeframe', '1m')
+        entry['response'] = response
+        try:
+            line = json.dumps(entry, default=str)
+            with self._lock:
+                with open(self.path, 'a') as f:
+                    f.write(line + '\n')
+        except Exception as e:
+            print(f"Error recording {method} response: {str(e)}")
@@ -0,0 +1,111 @@
+import threading
+from typing import Dict, Hashable, Tuple
+import ccxt
+import numpy as np
+import pandas as pd
+
+# Weekly bars open on Monday 00:00 UTC like on the exchanges; 1970-01-05 is a Monday
+WEEK_MS = 7 * 24 * 3600 * 1000
+WEEK_ORIGIN_MS = 4 * 24 * 3600 * 1000
+
+
+def timeframe_ms(timeframe: str) -> int:
+    """Length of a ccxt timeframe string in milliseconds"""
+    if timeframe.endswith('M') or timeframe.endswith('y'):
+        raise ValueError(f"Calendar timeframe {timeframe} cannot be resampled")
+    return ccxt.Exchange.parse_timeframe(timeframe) * 1000
+
+
+def bucket_start(timestamps_ms, timeframe: str):
+    """Open time (ms) of the ``timeframe`` bar containing each timestamp"""
+    period = timeframe_ms(timeframe)
+    origin = WEEK_ORIGIN_MS if period % WEEK_MS == 0 else 0
+    return timestamps_ms - (timestamps_ms - origin) % period
+
+
+def base_timeframe_for(timeframe: str) -> str:
+    """Finest stored timeframe used to build ``timeframe`` bars"""
+    period = timeframe_ms(timeframe)
+    if period < timeframe_ms('1h'):
+        return '1m'
+    return '1h' if period < timeframe_ms('1d') else '1d'
+
+
+def resample_ohlcv(df: pd.DataFrame, timeframe: str, base_timeframe: str = None) -> pd.DataFrame:
+    """Aggregate an OHLCV frame into coarser ``timeframe`` bars.
+
+    Open is the first open, high/low the extremes, close the last close and
+    volume the sum of the base candles in each bar. ``df.attrs['partial']``
+    on the result tells whether the last bar is still missing base candles.
+    """
+    base_timeframe = base_timeframe or df.attrs.get('timeframe')
+    if df.empty:
+        return df.copy()
+
+    timestamps = df.index.as_unit('ms').asi8
+    buckets = bucket_start(timestamps, timeframe)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(df)] - 1
+
+    result = pd.DataFrame({
+        'open': df['open'].to_numpy()[starts],
+        'high': np.maximum.reduceat(df['high'].to_numpy(), starts),
+        'low': np.minimum.reduceat(df['low'].to_numpy(), starts),
+        'close': df['close'].to_numpy()[ends],
+        'volume': np.add.reduceat(df['volume'].to_numpy(), starts)
+    }, index=pd.to_datetime(buckets[starts], unit='ms'))
+    result.index.name = 'timestamp'
+
+    partial = True
+    if base_timeframe:
+        # The last bar is complete once its final base candle has been seen
+        partial = timestamps[-1] + timeframe_ms(base_timeframe) < buckets[-1] + timeframe_ms(timeframe)
+    result.attrs.update(df.attrs, timeframe=timeframe, partial=bool(partial))
+    return result
+
+
+class OHLCVResampler:
+    """Builds coarser bars from a finer series incrementally.
+
+    Finished bars are kept per series; on each update only the base
+    candles from the end of the last finished bar onwards are aggregated,
+    so the newest bar is rebuilt while older ones are reused.
+    """
+
+    def __init__(self, max_bars: int = 1000):
+        self.max_bars = max_bars
+        self._closed: Dict[Hashable, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+
+    def update(self, df: pd.DataFrame, timeframe: str, base_timeframe: str = None) -> pd.DataFrame:
+        """Return ``timeframe`` bars for a base OHLCV frame, reusing completed bars"""
+        base_timeframe = base_timeframe or df.attrs.get('timeframe')
+        key: Tuple = (df.attrs.get('exchange'), df.attrs.get('symbol'), base_timeframe, timeframe)
+
+        with self._lock:
+            closed = self._closed.get(key)
+        if closed is not None and not closed.empty and not df.empty:
+            next_open = closed.index[-1] + pd.Timedelta(milliseconds=timeframe_ms(timeframe))
+            # Reuse only if the base frame reaches back to the first unfinished bar
+            if df.index[0] <= next_open <= df.index[-1] + pd.Timedelta(milliseconds=1):
+                fresh = resample_ohlcv(df[df.index >= next_open], timeframe, base_timeframe)
+                if fresh.empty:
+                    result = closed.copy()
+                    result.attrs['partial'] = False
+                else:
+                    result = pd.concat([closed, fresh])
+                    result.attrs = dict(fresh.attrs)
+            else:
+                result = resample_ohlcv(df, timeframe, base_timeframe)
+        else:
+            result = resample_ohlcv(df, timeframe, base_timeframe)
+
+        # The newest bar is rebuilt every time: even when all of its base
+        # candles are present, the last of them may still be open
+        with self._lock:
+            self._closed[key] = result.iloc[:-1].tail(self.max_bars)
+        return result
+
+
+# Shared by every ExchangeHandler in the process
+ohlcv_resampler = OHLCVResampler()
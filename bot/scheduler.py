@@ -0,0 +1,117 @@
+import heapq
+import itertools
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
+from .resampler import bucket_start, timeframe_ms
+
+Job = Tuple[str, str]  # (pair, timeframe)
+
+
+class CandleScheduler:
+    """Priority queue of (pair, timeframe) jobs due just after their candle closes.
+
+    Each job is due at its timeframe's next candle boundary plus ``lag_ms``,
+    which gives the exchange time to publish the closed candle. Jobs that
+    ran too early (the exchange still served the old candle) can be retried
+    after another lag, up to ``max_retries`` times per candle. Rescheduling a
+    job supersedes its queued entry, which is dropped lazily when popped.
+    """
+
+    def __init__(self, lag_ms: int = 5000, max_retries: int = 3):
+        self.lag_ms = lag_ms
+        self.max_retries = max_retries
+        self._heap: List[Tuple[int, int, Job]] = []
+        self._entries: Dict[Job, int] = {}  # job -> sequence number of its live heap entry
+        self._attempts: Dict[Job, int] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def next_close(self, timeframe: str, now_ms: int) -> int:
+        """Time (ms) a job on ``timeframe`` is next due after ``now_ms``"""
+        return int(bucket_start(now_ms, timeframe)) + timeframe_ms(timeframe) + self.lag_ms
+
+    def _push(self, job: Job, due_ms: int) -> None:
+        sequence = next(self._counter)
+        self._entries[job] = sequence
+        heapq.heappush(self._heap, (due_ms, sequence, job))
+
+    def schedule(self, pair: str, timeframe: str, now_ms: int, due_ms: int = None) -> int:
+        """Queue a job for the next candle close (or ``due_ms``) and return its due time"""
+        job = (pair, timeframe)
+        if due_ms is None:
+            due_ms = self.next_close(timeframe, now_ms - self.lag_ms)
+        with self._lock:
+            self._attempts.pop(job, None)
+            self._push(job, due_ms)
+        return due_ms
+
+    def retry(self, pair: str, timeframe: str, now_ms: int) -> Optional[int]:
+        """Requeue a job for the same candle after ``lag_ms``; None once retries are used up"""
+        job = (pair, timeframe)
+        with self._lock:
+            attempts = self._attempts.get(job, 0) + 1
+            if attempts > self.max_retries:
+                return None
+            self._attempts[job] = attempts
+            due_ms = now_ms + self.lag_ms
+            self._push(job, due_ms)
+        return due_ms
+
+    def remove(self, pair: str, timeframe: str) -> None:
+        """Drop a job; its queued entry is discarded when reached"""
+        with self._lock:
+            self._entries.pop((pair, timeframe), None)
+            self._attempts.pop((pair, timeframe), None)
+
+    def sync(self, jobs: List[Job], now_ms: int) -> None:
+        """Make the queued jobs match ``jobs``; new ones are due at once, missing ones dropped"""
+        wanted = set(jobs)
+        with self._lock:
+            current = set(self._entries)
+        for job in current - wanted:
+            self.remove(*job)
+        for job in wanted - current:
+            self.schedule(*job, now_ms, due_ms=now_ms)
+
+    def _discard_stale(self) -> None:
+        while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+
+    def next_due(self) -> Optional[int]:
+        """Due time (ms) of the earliest job, or None if nothing is queued"""
+        with self._lock:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now_ms: int) -> List[Job]:
+        """Remove and return every job due at ``now_ms``"""
+        due = []
+        with self._lock:
+            self._discard_stale()
+            while self._heap and self._heap[0][0] <= now_ms:
+                _, _, job = heapq.heappop(self._heap)
+                del self._entries[job]
+                due.append(job)
+                self._discard_stale()
+        return due
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class CandleTracker:
+    """Remembers the newest candle processed per key to skip unchanged data"""
+
+    def __init__(self):
+        self._last: Dict[Hashable, object] = {}
+        self._lock = threading.Lock()
+
+    def is_new(self, key: Hashable, candle_timestamp) -> bool:
+        """True if ``candle_timestamp`` differs from the last one marked for ``key``"""
+        with self._lock:
+            return self._last.get(key) != candle_timestamp
+
+    def mark(self, key: Hashable, candle_timestamp) -> None:
+        with self._lock:
+            self._last[key] = candle_timestamp
@@ -0,0 +1,371 @@
+import bisect
+import hashlib
+import multiprocessing as mp
+import threading
+import time
+from multiprocessing.connection import wait
+from typing import Dict, Iterable, List
+
+import pandas as pd
+
+from .resampler import timeframe_ms
+
+HEARTBEAT_INTERVAL = 5  # seconds between coordinator health checks
+STOP_POLL_INTERVAL = 0.5  # seconds between worker heartbeats / stop flag checks
+
+
+class ConsistentHashRing:
+    """Maps keys to nodes so that a key keeps its node while the node set is unchanged.
+
+    Each node gets ``replicas`` points on a 64-bit ring derived from MD5, so
+    the assignment depends only on the node names and not on process
+    state, and adding or removing a node moves only about 1/N of the keys.
+    """
+
+    def __init__(self, nodes: Iterable[str], replicas: int = 100):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+    def add(self, node: str) -> None:
+        for i in range(self.replicas):
+            point = self._hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._nodes.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        keep = [i for i, n in enumerate(self._nodes) if n != node]
+        self._points = [self._points[i] for i in keep]
+        self._nodes = [self._nodes[i] for i in keep]
+
+    def node_for(self, key: str) -> str:
+        """Node owning ``key``"""
+        index = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        return self._nodes[index]
+
+    def partition(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        """Group ``keys`` by owning node (every node is present, possibly empty)"""
+        groups = {node: [] for node in dict.fromkeys(self._nodes)}
+        for key in keys:
+            groups[self.node_for(key)].append(key)
+        return groups
+
+
+class _ShardNotifier:
+    """Stands in for TelegramNotifier inside a shard: forwards signals to the coordinator.
+
+    The coordinator notifies, stores and tracks a signal only once it has
+    passed deduplication, so the shard sends the whole signal from
+    ``save_signal`` and its ``send_trading_signal`` does nothing.
+    """
+
+    def __init__(self, connection, shard):
+        self.connection = connection
+        self.shard = shard
+        self._lock = threading.Lock()
+
+    def send_trading_signal(self, **kwargs):
+        pass
+
+    def save_signal(self, signal, indicators):
+        with self._lock:
+            self.connection.send({'shard': self.shard, 'time': time.time(),
+                                  'signal': signal, 'indicators': indicators})
+
+
+def _run_shard(shard, pairs, config, connection, heartbeat, stop_flag):
+    """Worker process: run a SignalMonitor over this shard's pairs until told to stop"""
+    from .analysis import TechnicalAnalyzer
+    from .exchange_handler import ExchangeHandler
+    from .signal_generator import SignalGenerator
+    from .signal_monitor import SignalMonitor
+
+    exchange_id = config.get('exchange_id', 'binance')
+    if exchange_id == 'replay':
+        from .replay_exchange import ReplayExchange
+        exchange = ReplayExchange(symbols=pairs, **config.get('replay', {}))
+        # A restarted shard resumes at the replay's current time, which the shared store has reached
+        exchange.advance(config.get('replay_elapsed', 0))
+        handler = ExchangeHandler('replay', exchange=exchange)
+    else:
+        handler = ExchangeHandler(exchange_id)
+
+    # All shards share the exchange's per-IP limit, so each gets its slice
+    share = config.get('rate_limit_share', 1.0)
+    bucket = handler.rate_limiter.bucket
+    bucket.capacity *= share
+    bucket.refill_rate *= share
+    bucket.tokens = min(bucket.tokens, bucket.capacity)
+
+    signal_generator = SignalGenerator()
+    if config.get('load_cooldowns'):
+        signal_generator.load_cooldowns()
+
+    notifier = _ShardNotifier(connection, shard)
+    monitor = SignalMonitor(
+        handler,
+        TechnicalAnalyzer(**config.get('analyzer', {})),
+        signal_generator,
+        notifier,
+        pairs,
+        save_signal=notifier.save_signal,
+        **config.get('monitor', {})
+    )
+    monitor.start()
+    try:
+        while not stop_flag.value:
+            # Only a live monitor loop counts as healthy
+            if monitor.monitor_thread.is_alive():
+                heartbeat.value = time.time()
+            time.sleep(STOP_POLL_INTERVAL)
+    finally:
+        # Let queued signals reach the coordinator before the process exits
+        monitor.stop(timeout=monitor.pair_timeout)
+
+
+class ShardedMonitor:
+    """Runs SignalMonitor in ``shards`` worker processes with a coordinator in this process.
+
+    Pairs are split by consistent hashing on the shard names, so a pair is
+    always handled by the same shard, including after a restart. Each
+    worker reports signals over its own pipe, so a killed shard cannot wedge
+    the others' channel. The coordinator drops duplicates of the same pair
+    and direction within ``dedup_window`` seconds (e.g. from a restarted
+    shard that lost its cooldowns because ``load_cooldowns`` is off) and
+    sends the rest through ``telegram_notifier``, stores them with
+    ``save_signal`` and follows them in ``signal_tracker`` against the
+    candles the shards write to the candle store (whose files are swapped
+    in whole, so the coordinator never reads one mid-write). Shards that exit or stop
+    sending heartbeats for ``heartbeat_timeout`` seconds are restarted.
+    """
+
+    def __init__(self, pairs: List[str], telegram_notifier, shards: int = None, exchange_id: str = 'binance',
+                 analyzer_params: Dict = None, monitor_params: Dict = None, replay_params: Dict = None,
+                 dedup_window: float = 3600, heartbeat_timeout: float = 60, load_cooldowns: bool = False,
+                 save_signal=None, signal_tracker=None, candle_store=None):
+        self.pairs = pairs
+        self.telegram_notifier = telegram_notifier
+        self.save_signal = save_signal  # optional callable(signal, indicators) storing sent signals
+        self.signal_tracker = signal_tracker
+        self.exchange_id = exchange_id
+        self.timeframe = '1h'
+        replay_params = dict(replay_params or {})
+        if exchange_id == 'replay':
+            from .replay_exchange import default_replay_id, replay_store_root
+            from .candle_store import CandleStore
+            # Every shard must replay the same series into one store the coordinator can read
+            if not replay_params.get('recording'):
+                replay_params.setdefault('start_time', int(time.time() * 1000))
+            replay_params.setdefault('replay_id', default_replay_id(
+                replay_params.get('recording'), replay_params.get('start_time'), replay_params.get('seed', 0)))
+            candle_store = candle_store or CandleStore(replay_store_root(replay_params['replay_id']))
+        elif candle_store is None:
+            from .candle_store import candle_store
+        self.candle_store = candle_store
+        self.shards = shards or mp.cpu_count() or 1
+        self.shard_names = [f"shard-{i}" for i in range(self.shards)]
+        self.ring = ConsistentHashRing(self.shard_names)
+        self.assignment = self.ring.partition(pairs)
+        self.config = {
+            'exchange_id': exchange_id,
+            'analyzer': analyzer_params or {},
+            'monitor': monitor_params or {},
+            'replay': replay_params,
+            'rate_limit_share': 1.0 / self.shards,
+            # Restore signal cooldowns from the database when a shard (re)starts
+            'load_cooldowns': load_cooldowns
+        }
+        self.dedup_window = dedup_window
+        self.heartbeat_timeout = heartbeat_timeout
+        # Spawned rather than forked: the parent may be running threads (e.g. Streamlit)
+        self._context = mp.get_context('spawn')
+        # Lock-free shared values: a shard killed while holding a lock (as in
+        # mp.Event or a synchronized Value) would wedge the coordinator
+        self._stop_flag = self._context.RawValue('b', 0)
+        self.processes: Dict[str, mp.Process] = {}
+        self.connections: Dict[str, object] = {}
+        self.heartbeats: Dict[str, object] = {}
+        self.restarts = {name: 0 for name in self.shard_names}
+        self._recent: Dict[tuple, float] = {}
+        self.received = 0
+        self.duplicates = 0
+        self.is_running = False
+        self.coordinator_thread = None
+        self._replay_started = None
+
+    def replay_elapsed(self) -> int:
+        """Simulated milliseconds the replay has run since the shards first started"""
+        if self._replay_started is None:
+            return 0
+        return int((time.time() - self._replay_started) * 1000 * self.config['replay'].get('speed', 1.0))
+
+    def _spawn(self, shard: str) -> None:
+        heartbeat = self._context.RawValue('d', time.time())
+        reader, writer = self._context.Pipe(duplex=False)
+        config = self.config
+        if self.exchange_id == 'replay':
+            config = dict(config, replay_elapsed=self.replay_elapsed())
+        process = self._context.Process(
+            target=_run_shard,
+            args=(shard, self.assignment[shard], config, writer, heartbeat, self._stop_flag),
+            name=f"signal-monitor-{shard}",
+            daemon=True
+        )
+        process.start()
+        # Only the child keeps the write end, so the reader sees EOF when it dies
+        writer.close()
+        old = self.connections.get(shard)
+        if old is not None:
+            old.close()
+        self.processes[shard] = process
+        self.connections[shard] = reader
+        self.heartbeats[shard] = heartbeat
+
+    def start(self):
+        """Start the shard processes and the coordinator"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._stop_flag.value = 0
+        if self._replay_started is None:
+            self._replay_started = time.time()
+        for shard in self.shard_names:
+            if self.assignment[shard]:
+                self._spawn(shard)
+        self.coordinator_thread = threading.Thread(target=self._coordinate, daemon=True)
+        self.coordinator_thread.start()
+        print(f"Sharded signal monitoring started with {len(self.processes)} shards")
+
+    def stop(self, timeout: float = 30):
+        """Stop the coordinator and every shard"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        self._stop_flag.value = 1
+        if self.coordinator_thread:
+            self.coordinator_thread.join()
+        deadline = time.time() + timeout
+        for process in self.processes.values():
+            # Keep reading so shards blocked on a full pipe can finish sending and exit
+            while process.is_alive() and time.time() < deadline:
+                self._drain()
+                process.join(0.5)
+            if process.is_alive():
+                process.terminate()
+        self._drain()
+        self._track()
+        for connection in self.connections.values():
+            connection.close()
+        self.connections = {}
+        print("Sharded signal monitoring stopped")
+
+    def _coordinate(self):
+        last_health_check = time.time()
+        while self.is_running:
+            self._receive(timeout=1)
+            if time.time() - last_health_check >= HEARTBEAT_INTERVAL:
+                self._check_health()
+                self._track()
+                last_health_check = time.time()
+
+    def _receive(self, timeout: float) -> int:
+        """Handle messages from every shard pipe that is readable within ``timeout``"""
+        shards = {connection: shard for shard, connection in self.connections.items()}
+        ready = wait(list(shards), timeout=timeout) if shards else []
+        for connection in ready:
+            try:
+                self._handle(connection.recv())
+            except EOFError:
+                # The shard exited; the health check restarts it
+                connection.close()
+                del self.connections[shards[connection]]
+            except Exception as e:
+                print(f"Error handling shard signal: {str(e)}")
+        return len(ready)
+
+    def _drain(self):
+        while self._receive(timeout=0):
+            pass
+
+    def _handle(self, message):
+        """Deduplicate one signal from a shard, then notify, store and track it"""
+        signal = message['signal']
+        self.received += 1
+        key = (signal['pair'], signal['type'])
+        last = self._recent.get(key)
+        if last is not None and message['time'] - last < self.dedup_window:
+            self.duplicates += 1
+            return
+        self._recent[key] = message['time']
+        self.telegram_notifier.send_trading_signal(
+            pair=signal['pair'],
+            signal_type=signal['type'],
+            entry_price=signal['entry'],
+            targets=signal['targets'],
+            stop_loss=signal['stop_loss'],
+            indicators=message['indicators'],
+            news_sentiment=signal.get('news_sentiment')
+        )
+        saved = None
+        if self.save_signal is not None:
+            saved = self.save_signal(signal, message['indicators'])
+        if self.signal_tracker is not None:
+            # Followed from the candle after the one the signal was read from
+            self.signal_tracker.add(
+                signal['pair'], signal['type'], signal['targets'], signal['stop_loss'],
+                since=signal['candle_timestamp'] + pd.Timedelta(milliseconds=timeframe_ms(self.timeframe)),
+                signal_id=getattr(saved, 'id', None)
+            )
+
+    def _track(self):
+        """Check tracked signals against the candles the shards stored since the last check"""
+        if self.signal_tracker is None:
+            return
+        try:
+            for pair, since in self.signal_tracker.open_pairs().items():
+                rows = self.candle_store.read(self.exchange_id, pair, self.timeframe, since=since)
+                if len(rows):
+                    self.signal_tracker.update(pair, self.candle_store.to_frame(rows))
+            self.signal_tracker.flush()
+        except Exception as e:
+            print(f"Error tracking sharded signals: {str(e)}")
+
+    def _check_health(self):
+        """Restart shards that died or stopped sending heartbeats"""
+        now = time.time()
+        for shard, process in list(self.processes.items()):
+            silent = now - self.heartbeats[shard].value
+            if process.is_alive() and silent < self.heartbeat_timeout:
+                continue
+            reason = f"exit code {process.exitcode}" if not process.is_alive() else f"no heartbeat for {silent:.0f}s"
+            print(f"Restarting {shard} ({reason})")
+            if process.is_alive():
+                process.terminate()
+                process.join(5)
+            self.restarts[shard] += 1
+            self._spawn(shard)
+
+    def stats(self) -> Dict:
+        """Return per-shard health and the coordinator's signal counters"""
+        now = time.time()
+        return {
+            'shards': {
+                shard: {
+                    'pid': process.pid,
+                    'alive': process.is_alive(),
+                    'pairs': len(self.assignment[shard]),
+                    'restarts': self.restarts[shard],
+                    'heartbeat_age': now - self.heartbeats[shard].value
+                }
+                for shard, process in self.processes.items()
+            },
+            'signals_received': self.received,
+            'duplicates_dropped': self.duplicates
+        }
@@ -1,14 +1,30 @@
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, List, Optional
 import numpy as np
 
 class SignalGenerator:
-    def __init__(self):
-        self.signals = []
+    strength_threshold = 0.6  # share of agreeing indicators needed for a signal
+    news_weight = 0.2  # strength added by positive/negative news sentiment
+    buy_target_multipliers = (1.02, 1.04, 1.06)  # 2%/4%/6% profit
+    buy_stop_multiplier = 0.98  # 2% loss
+    sell_target_multipliers = (0.98, 0.96, 0.94)  # 2%/4%/6% profit
+    sell_stop_multiplier = 1.02  # 2% loss
+
+    def __init__(self, history_size: int = 50, max_signals: int = 1000, signal_ttl: float = 86400):
         self.min_signal_interval = 3600  # minimum seconds between signals for same pair
+        self.signal_ttl = signal_ttl  # seconds a pair's history is kept after its last signal
+        self.eviction_interval = 600  # seconds between sweeps for expired pairs
+        self.history_size = history_size
+        self.signals: Deque[dict] = deque(maxlen=max_signals)  # most recent signals, all pairs
+        self.history: Dict[str, Deque[dict]] = {}  # pair -> its most recent signals
+        self.last_signal_time: Dict[str, datetime] = {}  # pair -> time of its last signal
+        self._next_eviction = None
 
     def generate_signal(self, pair, technical_signals, price_levels, news_sentiment=None):
         """Generate trading signal based on technical and optional news analysis"""
         current_time = datetime.now()
+        self._evict_expired(current_time)
         
         # Check if we recently generated a signal for this pair
         if self._check_recent_signal(pair, current_time):
@@ -19,23 +35,173 @@ class SignalGenerator:
         if signal:
             signal['pair'] = pair
             signal['timestamp'] = current_time
-            self.signals.append(signal)
+            self._record(signal)
             return signal
             
         return None
 
+    def _record(self, signal):
+        pair = signal['pair']
+        self.signals.append(signal)
+        if pair not in self.history:
+            self.history[pair] = deque(maxlen=self.history_size)
+        self.history[pair].append(signal)
+        self.last_signal_time[pair] = signal['timestamp']
+
     def _check_recent_signal(self, pair, current_time):
         """Check if we have generated a signal for this pair recently"""
-        if not self.signals:
+        last_signal_time = self.last_signal_time.get(pair)
+        if last_signal_time is None:
             return False
-            
-        recent_signals = [s for s in self.signals if s['pair'] == pair]
-        if recent_signals:
-            last_signal_time = recent_signals[-1]['timestamp']
-            time_diff = (current_time - last_signal_time).total_seconds()
-            return time_diff < self.min_signal_interval
-            
-        return False
+        time_diff = (current_time - last_signal_time).total_seconds()
+        return time_diff < self.min_signal_interval
+
+    def _evict_expired(self, current_time):
+        """Forget pairs whose last signal is older than the TTL, sweeping at most once per eviction_interval"""
+        if self._next_eviction is not None and current_time < self._next_eviction:
+            return
+        # Never drop a pair that is still cooling down
+        ttl = max(self.signal_ttl, self.min_signal_interval)
+        cutoff = current_time - timedelta(seconds=ttl)
+        for pair in [p for p, t in self.last_signal_time.items() if t < cutoff]:
+            del self.last_signal_time[pair]
+            self.history.pop(pair, None)
+        while self.signals and self.signals[0]['timestamp'] < cutoff:
+            self.signals.popleft()
+        self._next_eviction = current_time + timedelta(seconds=self.eviction_interval)
+
+    def recent_signals(self, pair):
+        """Most recent signals generated for ``pair``, oldest first"""
+        return list(self.history.get(pair, ()))
+
+    def load_cooldowns(self, session=None) -> int:
+        """Restore last-signal times from the trading_signals table; returns the number of pairs"""
+        try:
+            from sqlalchemy import func
+            from .database import db_session
+            from .models import TradingSignal
+
+            session = session or db_session
+            # created_at is stored in UTC, cooldowns are checked against local time
+            since = datetime.utcnow() - timedelta(seconds=self.min_signal_interval)
+            rows = (
+                session.query(TradingSignal.pair, func.max(TradingSignal.created_at))
+                .filter(TradingSignal.created_at >= since)
+                .group_by(TradingSignal.pair)
+                .all()
+            )
+            for pair, created_at in rows:
+                local_time = created_at.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+                if local_time > self.last_signal_time.get(pair, datetime.min):
+                    self.last_signal_time[pair] = local_time
+            return len(rows)
+        except Exception as e:
+            print(f"Error loading signal cooldowns: {str(e)}")
+            return 0
+
+    def generate_signals_batch(self, pairs: List[str], outcomes: np.ndarray, prices: np.ndarray,
+                               news_sentiment: np.ndarray = None) -> List[Optional[dict]]:
+        """Batch version of generate_signal: one signal (or None) per pair, in order.
+
+        ``outcomes``, ``prices`` and ``news_sentiment`` are laid out as for
+        score_batch. Cooldowns are checked and recorded as if generate_signal
+        had been called for each pair in turn.
+        """
+        current_time = datetime.now()
+        self._evict_expired(current_time)
+        scores = self.score_batch(outcomes, prices, news_sentiment)
+
+        results: List[Optional[dict]] = [None] * len(pairs)
+        columns = [scores[k].tolist() for k in ('type', 'entry', 'target_1', 'target_2', 'target_3',
+                                                 'stop_loss', 'risk_reward')]
+        for index, signal_type, entry, target_1, target_2, target_3, stop_loss, risk_reward in zip(
+                scores['index'].tolist(), *columns):
+            pair = pairs[index]
+            if self._check_recent_signal(pair, current_time):
+                continue
+            signal = {
+                'type': signal_type,
+                'entry': entry,
+                'targets': [target_1, target_2, target_3],
+                'stop_loss': stop_loss,
+                'risk_reward': risk_reward,
+                'pair': pair,
+                'timestamp': current_time
+            }
+            self._record(signal)
+            results[index] = signal
+        return results
+
+    def score_batch(self, outcomes: np.ndarray, prices: np.ndarray,
+                    news_sentiment: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """Score many pairs at once, without cooldowns.
+
+        ``outcomes`` is a (pairs x rules) array with +1 for a BUY rule that
+        fired, -1 for a SELL rule and 0 for none (see rule_outcomes);
+        ``prices`` holds each pair's current price and ``news_sentiment``
+        its sentiment, NaN where unknown. Returns columns for the pairs that
+        get a signal: their row ``index``, ``type``, ``entry``, targets,
+        ``stop_loss`` and ``risk_reward``, equal to what _analyze_signals
+        returns for each pair.
+        """
+        outcomes = np.asarray(outcomes)
+        prices = np.asarray(prices, dtype=float)
+        buy_counts = (outcomes > 0).sum(axis=1)
+        sell_counts = (outcomes < 0).sum(axis=1)
+        directions = self.signal_directions(buy_counts, sell_counts, buy_counts + sell_counts, news_sentiment)
+
+        index = np.flatnonzero(directions)
+        buy = directions[index] > 0
+        entry = prices[index]
+        multipliers = np.where(
+            buy[:, np.newaxis],
+            np.array(self.buy_target_multipliers + (self.buy_stop_multiplier,)),
+            np.array(self.sell_target_multipliers + (self.sell_stop_multiplier,))
+        )
+        levels = entry[:, np.newaxis] * multipliers
+        target_2, stop_loss = levels[:, 1], levels[:, 3]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            risk_reward = np.where(buy, (target_2 - entry) / (entry - stop_loss),
+                                   (entry - target_2) / (stop_loss - entry))
+
+        return {
+            'index': index,
+            'type': np.where(buy, 'BUY', 'SELL').astype(object),
+            'entry': entry,
+            'target_1': levels[:, 0],
+            'target_2': target_2,
+            'target_3': levels[:, 2],
+            'stop_loss': stop_loss,
+            'risk_reward': risk_reward
+        }
+
+    def signal_directions(self, buy_counts: np.ndarray, sell_counts: np.ndarray, total_counts: np.ndarray,
+                          news_sentiment: np.ndarray = None) -> np.ndarray:
+        """+1 (BUY), -1 (SELL) or 0 per element of rule count arrays, decided as in _analyze_signals"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            buy_strength = np.where(total_counts > 0, buy_counts / total_counts, 0.0)
+            sell_strength = np.where(total_counts > 0, sell_counts / total_counts, 0.0)
+        if news_sentiment is not None:
+            news_sentiment = np.asarray(news_sentiment, dtype=float)
+            buy_strength = np.where(news_sentiment > 0, buy_strength + self.news_weight, buy_strength)
+            sell_strength = np.where(news_sentiment < 0, sell_strength + self.news_weight, sell_strength)
+        directions = np.where(buy_strength > self.strength_threshold, 1,
+                              np.where(sell_strength > self.strength_threshold, -1, 0))
+        # Pairs without any technical signal are never scored
+        return np.where(total_counts > 0, directions, 0)
+
+    @staticmethod
+    def rule_outcomes(technical_signals: List[list]) -> np.ndarray:
+        """Pack per-pair technical signal lists into the (pairs x rules) array score_batch takes"""
+        lengths = np.fromiter(map(len, technical_signals), dtype=np.int64, count=len(technical_signals))
+        outcomes = np.zeros((len(technical_signals), lengths.max(initial=0)), dtype=np.int8)
+        directions = {"BUY": 1, "SELL": -1}
+        values = [directions.get(signal[2], 0) for signals in technical_signals for signal in signals]
+        if values:
+            rows = np.repeat(np.arange(len(technical_signals)), lengths)
+            columns = np.arange(len(values)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            outcomes[rows, columns] = values
+        return outcomes
 
     def _analyze_signals(self, technical_signals, price_levels, news_sentiment):
         """Analyze all signals and generate trading recommendation"""
@@ -54,15 +220,15 @@ class SignalGenerator:
         # Consider news sentiment if available
         if news_sentiment is not None:
             if news_sentiment > 0:
-                buy_strength += 0.2
+                buy_strength += self.news_weight
             elif news_sentiment < 0:
-                sell_strength += 0.2
+                sell_strength += self.news_weight
         
         # Generate signal if strength is significant
         signal = None
-        if buy_strength > 0.6:
+        if buy_strength > self.strength_threshold:
             signal = self._generate_buy_signal(price_levels)
-        elif sell_strength > 0.6:
+        elif sell_strength > self.strength_threshold:
             signal = self._generate_sell_signal(price_levels)
             
         return signal
@@ -72,10 +238,8 @@ class SignalGenerator:
         current_price = price_levels['current_price']
         
         # Calculate targets and stop loss
-        target_1 = current_price * 1.02  # 2% profit
-        target_2 = current_price * 1.04  # 4% profit
-        target_3 = current_price * 1.06  # 6% profit
-        stop_loss = current_price * 0.98  # 2% loss
+        target_1, target_2, target_3 = (current_price * m for m in self.buy_target_multipliers)
+        stop_loss = current_price * self.buy_stop_multiplier
         
         return {
             'type': 'BUY',
@@ -90,10 +254,8 @@ class SignalGenerator:
         current_price = price_levels['current_price']
         
         # Calculate targets and stop loss
-        target_1 = current_price * 0.98  # 2% profit
-        target_2 = current_price * 0.96  # 4% profit
-        target_3 = current_price * 0.94  # 6% profit
-        stop_loss = current_price * 1.02  # 2% loss
+        target_1, target_2, target_3 = (current_price * m for m in self.sell_target_multipliers)
+        stop_loss = current_price * self.sell_stop_multiplier
         
         return {
             'type': 'SELL',
@@ -1,88 +1,432 @@
 import time
 import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from typing import List, Dict
+import pandas as pd
+from .analysis import TechnicalAnalyzer
+from .metrics import metrics
+from .pipeline import Batch, Pipeline, Stage
+from .resampler import timeframe_ms
+from .scheduler import CandleScheduler, CandleTracker
+
+# Per-process analyzers used by analysis pool workers, keyed by indicator parameters
+_process_analyzers = {}
+
+
+def _analyze_in_process(params, data):
+    """Analysis pool worker: indicators and signals for one OHLCV frame"""
+    analyzer = _process_analyzers.get(params)
+    if analyzer is None:
+        analyzer = _process_analyzers[params] = TechnicalAnalyzer(*params)
+    df = analyzer.calculate_indicators(data)
+    latest = df.iloc[-1]
+    indicators = {
+        'RSI': latest.get('rsi', 0),
+        'MACD': latest.get('macd', 0),
+        'Signal': latest.get('macd_signal', 0)
+    }
+    return analyzer._signals_from_rows(df.iloc[-1], df.iloc[-2]), indicators
+
 
 class SignalMonitor:
-    def __init__(self, exchange_handler, technical_analyzer, signal_generator, telegram_notifier, pairs: List[str]):
+    """Checks pairs for trading signals in a fetch → analyze → generate → notify pipeline.
+
+    Stages are connected by bounded queues and each has its own worker
+    threads, so a slow Telegram send or exchange call only holds up its own
+    stage until the queues in front of it fill up, which then throttles
+    the stages upstream. Analysis runs on threads by default or, with
+    ``analysis_processes``, in a process pool. Pairs are fed in as their
+    candles close (see CandleScheduler).
+    """
+
+    def __init__(self, exchange_handler, technical_analyzer, signal_generator, telegram_notifier, pairs: List[str],
+                 max_workers: int = 8, pair_timeout: float = 120, close_lag_ms: int = 5000,
+                 analysis_workers: int = 1, analysis_processes: int = 0, notify_workers: int = 2,
+                 queue_size: int = 100, save_signal=None, signal_tracker=None, news_analyzer=None):
         self.exchange_handler = exchange_handler
         self.technical_analyzer = technical_analyzer
         self.signal_generator = signal_generator
         self.telegram_notifier = telegram_notifier
+        self.save_signal = save_signal  # optional callable(signal, indicators) storing sent signals
+        self.signal_tracker = signal_tracker  # optional SignalTracker following sent signals to their outcome
+        self.news_analyzer = news_analyzer  # optional NewsAnalyzer adding news sentiment to signal strength
         self.pairs = pairs
         self.is_running = False
-        self.check_interval = 300  # 5 minutes
+        self.check_interval = 300  # 5 minutes, the longest a check cycle may run
+        self.timeframe = '1h'
         self.monitor_thread = None
+        self.max_workers = max_workers  # fetch stage threads
+        self.pair_timeout = pair_timeout  # seconds before a pair's check is abandoned
+        self.analysis_workers = analysis_processes or analysis_workers
+        self.analysis_processes = analysis_processes
+        self.notify_workers = notify_workers
+        self.queue_size = queue_size
+        self.pipeline = None
+        self.analysis_pool = None
+        self._stop_event = threading.Event()
+        self._in_flight = {}  # pair -> Batch of its running check
+        self._in_flight_lock = threading.Lock()
+        self.last_cycle = {}
+        self.cycle_durations = deque(maxlen=100)
+        self._stats_lock = threading.Lock()
+        self.scheduler = CandleScheduler(lag_ms=close_lag_ms)
+        self.candle_tracker = CandleTracker()
 
     def start(self):
         """Start signal monitoring"""
         if not self.is_running:
             self.is_running = True
-            self.monitor_thread = threading.Thread(target=self._monitor_loop)
+            self._stop_event = threading.Event()
+            # A loop still winding down after stop() is waited for by the new one, not here
+            self.monitor_thread = threading.Thread(
+                target=self._monitor_loop, args=(self._stop_event, self.monitor_thread)
+            )
             self.monitor_thread.daemon = True
             self.monitor_thread.start()
             print("Signal monitoring started")
 
-    def stop(self):
-        """Stop signal monitoring"""
-        self.is_running = False
-        if self.monitor_thread:
-            self.monitor_thread.join()
+    def stop(self, timeout: float = 1.0):
+        """Stop signal monitoring, waiting at most ``timeout`` seconds.
+
+        A running check cycle gives up on the pairs it has not finished and
+        the monitor thread then shuts the pipeline down in the background,
+        so callers such as a Streamlit rerun are not held up.
+        """
+        if self.is_running:
+            self.is_running = False
+            self._stop_event.set()
+            self.monitor_thread.join(timeout)
             print("Signal monitoring stopped")
+        elif self.monitor_thread is None or not self.monitor_thread.is_alive():
+            # E.g. a pipeline started by calling _check_signals directly
+            self._shutdown()
+
+    def _shutdown(self):
+        """Stop the pipeline and analysis pool"""
+        if self.pipeline:
+            self.pipeline.stop(timeout=self.pair_timeout)
+            self.pipeline = None
+        if self.analysis_pool:
+            self.analysis_pool.shutdown(wait=False, cancel_futures=True)
+            self.analysis_pool = None
+        # Checks torn down with the pipeline never finish; their pairs must not stay busy
+        with self._in_flight_lock:
+            self._in_flight.clear()
+
+    def _get_pipeline(self):
+        if self.pipeline is None:
+            if self.analysis_processes and self.analysis_pool is None:
+                self.analysis_pool = ProcessPoolExecutor(max_workers=self.analysis_processes)
+            self.pipeline = Pipeline([
+                Stage('fetch', self._fetch_stage, self.max_workers, self.queue_size, self._stage_error),
+                Stage('analyze', self._analyze_stage, self.analysis_workers, self.queue_size, self._stage_error),
+                # Signal cooldowns live in one SignalGenerator, so generation stays single-threaded;
+                # it scores everything queued at once instead
+                Stage('generate', self._generate_stage, 1, self.queue_size, self._stage_error,
+                      batch_size=self.queue_size),
+                Stage('notify', self._notify_stage, self.notify_workers, self.queue_size, self._stage_error)
+            ])
+            self.pipeline.start()
+        return self.pipeline
 
-    def _monitor_loop(self):
-        """Main monitoring loop"""
-        while self.is_running:
+    def _now_ms(self):
+        """Exchange clock in milliseconds (simulated for replay exchanges)"""
+        exchange = getattr(self.exchange_handler, 'exchange', None)
+        if exchange is not None and hasattr(exchange, 'milliseconds'):
+            return exchange.milliseconds()
+        return int(time.time() * 1000)
+
+    def _monitor_loop(self, stop_event, previous_thread=None):
+        """Main monitoring loop: check each pair just after its candle closes"""
+        if previous_thread is not None:
+            previous_thread.join()
+        try:
+            self._run_until(stop_event)
+        finally:
+            self._shutdown()
+
+    def _run_until(self, stop_event):
+        while not stop_event.is_set():
             try:
-                self._check_signals()
-                time.sleep(self.check_interval)
+                # New pairs are checked at once, then on every candle close
+                self.scheduler.sync([(pair, self.timeframe) for pair in self.pairs], self._now_ms())
+                due = self.scheduler.pop_due(self._now_ms())
+                if not due:
+                    next_due = self.scheduler.next_due()
+                    wait_ms = 1000 if next_due is None else next_due - self._now_ms()
+                    stop_event.wait(min(max(wait_ms, 0) / 1000, 1.0))
+                    continue
+
+                results = self._check_signals([pair for pair, _ in due], stop_event)
+                now_ms = self._now_ms()
+                for pair, timeframe in due:
+                    if results.get(pair) == 'skipped' and stop_event.is_set():
+                        # Left unscheduled, so the next start checks it at once
+                        continue
+                    # The exchange may not have published the new candle yet
+                    if results.get(pair) in ('stale', 'error') and self.scheduler.retry(pair, timeframe, now_ms):
+                        continue
+                    self.scheduler.schedule(pair, timeframe, now_ms)
             except Exception as e:
                 print(f"Error in monitoring loop: {str(e)}")
-                time.sleep(60)  # Wait before retry
+                stop_event.wait(60)  # Wait before retry
 
-    def _check_signals(self):
-        """Check for signals across all pairs"""
-        for pair in self.pairs:
-            try:
-                # Get market data
-                data = self.exchange_handler.get_ohlcv(pair)
-                if data is None:
-                    continue
+    def _check_signals(self, pairs: List[str] = None, stop_event: threading.Event = None) -> Dict[str, str]:
+        """Run ``pairs`` (default all) through the pipeline and wait for their results.
+
+        A pair's result ('signal', 'none', 'stale', 'error', 'timeout' or
+        'skipped') is known once the generate stage has decided on it;
+        notifications are sent in the background. A failing pair only loses
+        its own result and a slow one is abandoned after ``pair_timeout``
+        seconds. Pairs whose previous check is still running are skipped, as
+        are pairs not yet finished when the cycle reaches ``check_interval``
+        or the monitor is stopped.
+        """
+        pairs = self.pairs if pairs is None else pairs
+        stop_event = stop_event or self._stop_event
+        started = time.monotonic()
+        market_data = {}
+        if hasattr(self.exchange_handler, 'get_market_data_many'):
+            # Async-backed handlers fetch every pair concurrently up front, so the
+            # per-pair fetch_ohlcv and price_levels timers never run for them
+            with metrics.timer('market_data_batch'):
+                market_data = self.exchange_handler.get_market_data_many(pairs, timeframe=self.timeframe)
+
+        news_sentiment = self._news_sentiment(pairs)
+        pipeline = self._get_pipeline()
+        batch = Batch(pairs)
+        for pair in pairs:
+            with self._in_flight_lock:
+                busy = pair in self._in_flight
+            if busy:
+                batch.finish(pair, 'skipped')
+                continue
+            # Blocks while the fetch queue is full
+            pipeline.put({'pair': pair, 'batch': batch, 'prefetched': market_data.get(pair),
+                          'news_sentiment': news_sentiment.get(pair)})
+
+        while not batch.wait(min(1.0, self.pair_timeout)):
+            now = time.monotonic()
+            stopping = stop_event.is_set()
+            for pair in list(batch.pending):
+                pair_started = batch.running_since(pair)
+                if stopping:
+                    batch.finish(pair, 'skipped')
+                elif pair_started is not None and now - pair_started > self.pair_timeout:
+                    print(f"Timed out checking signals for {pair} after {self.pair_timeout}s")
+                    batch.finish(pair, 'timeout')
+                elif pair_started is None and now - started > self.check_interval:
+                    batch.finish(pair, 'skipped')
+
+        stats = {'pairs': len(pairs), 'signals': 0, 'stale': 0, 'errors': 0, 'timeouts': 0, 'skipped': 0}
+        for result in batch.results.values():
+            if result == 'signal':
+                stats['signals'] += 1
+            elif result == 'stale':
+                stats['stale'] += 1
+            elif result == 'error':
+                stats['errors'] += 1
+            elif result == 'timeout':
+                stats['timeouts'] += 1
+            elif result == 'skipped':
+                stats['skipped'] += 1
 
-                # Get price levels
+        flush_digest = getattr(self.telegram_notifier, 'flush_digest', None)
+        if flush_digest is not None and getattr(self.telegram_notifier, 'digest', False):
+            # Send the cycle's signals together once they have been generated and queued
+            pipeline.wait_idle(('generate', 'notify'), timeout=self.pair_timeout)
+            flush_digest()
+
+        if self.signal_tracker is not None:
+            with metrics.timer('signal_state_write'):
+                self.signal_tracker.flush()
+
+        duration = time.monotonic() - started
+        metrics.observe('cycle', duration)
+        stats.update(duration=duration, finished_at=datetime.now(), interval=self.check_interval,
+                     queue_depths=pipeline.queue_depths())
+        with self._stats_lock:
+            self.last_cycle = stats
+            self.cycle_durations.append(duration)
+        if duration > self.check_interval:
+            print(f"Signal check cycle took {duration:.1f}s, longer than the {self.check_interval}s interval")
+        return dict(batch.results)
+
+    def _news_sentiment(self, pairs: List[str]) -> Dict[str, float]:
+        """News sentiment per pair's base currency, fetched for all pairs together"""
+        if self.news_analyzer is None:
+            return {}
+        try:
+            bases = {pair: pair.split('/')[0] for pair in pairs}
+            with metrics.timer('news'):
+                signals = self.news_analyzer.get_trading_signals(bases.values())
+            # Currencies without news have no sentiment rather than a neutral one
+            return {pair: signals[base][1] for pair, base in bases.items() if signals[base][0] is not None}
+        except Exception as e:
+            print(f"Error fetching news sentiment: {str(e)}")
+            return {}
+
+    def _finish(self, item, result):
+        """Record a pair's result and release it for the next cycle"""
+        item['batch'].finish(item['pair'], result)
+        with self._in_flight_lock:
+            # A check left over from a stopped pipeline must not release a newer one
+            if self._in_flight.get(item['pair']) is item['batch']:
+                del self._in_flight[item['pair']]
+
+    def _stage_error(self, item, error):
+        print(f"Error checking signals for {item['pair']}: {str(error)}")
+        metrics.inc('pair_errors_total')
+        self._finish(item, 'error')
+
+    def _fetch_stage(self, item):
+        """Get OHLCV data and price levels, dropping pairs without a new candle"""
+        pair, batch = item['pair'], item['batch']
+        if not batch.is_open(pair):
+            return None
+        batch.start(pair)
+        with self._in_flight_lock:
+            self._in_flight[pair] = batch
+
+        # Get market data
+        if item['prefetched'] is not None:
+            data, price_levels = item['prefetched']
+        else:
+            with metrics.timer('fetch_ohlcv'):
+                data = self.exchange_handler.get_ohlcv(pair, timeframe=self.timeframe)
+            price_levels = None
+        if data is None:
+            self._finish(item, 'none')
+            return None
+
+        # Signals are read from closed candles only, like in Backtester; the last
+        # row is the candle that opened when the previous one closed
+        if len(data) < 3:
+            self._finish(item, 'none')
+            return None
+        if self.signal_tracker is not None:
+            for event in self.signal_tracker.update(pair, data):
+                if event['outcome'] != 'open':
+                    metrics.inc('signal_outcomes_total', outcome=event['outcome'])
+        closed = data.iloc[:-1].copy()
+
+        # Nothing to do until the exchange serves a new candle
+        candle_timestamp = closed.index[-1]
+        if not self.candle_tracker.is_new((pair, self.timeframe), candle_timestamp):
+            self._finish(item, 'stale')
+            return None
+
+        # Get price levels
+        if price_levels is None:
+            with metrics.timer('price_levels'):
                 price_levels = self.exchange_handler.calculate_price_levels(pair)
-                if price_levels is None:
-                    continue
+        if price_levels is None:
+            self._finish(item, 'none')
+            return None
 
-                # Generate technical signals
-                technical_signals = self.technical_analyzer.generate_signals(data)
-                
-                # Generate trading signal
-                signal = self.signal_generator.generate_signal(
-                    pair=pair,
-                    technical_signals=technical_signals,
-                    price_levels=price_levels
-                )
-
-                # If signal generated, send notification
-                if signal:
-                    # Prepare indicators info
-                    latest_data = data.iloc[-1]
-                    indicators = {
-                        'RSI': latest_data.get('rsi', 0),
-                        'MACD': latest_data.get('macd', 0),
-                        'Signal': latest_data.get('macd_signal', 0)
-                    }
-
-                    # Send notification
-                    self.telegram_notifier.send_trading_signal(
-                        pair=signal['pair'],
-                        signal_type=signal['type'],
-                        entry_price=signal['entry'],
-                        targets=signal['targets'],
-                        stop_loss=signal['stop_loss'],
-                        indicators=indicators
-                    )
+        item.update(data=closed, price_levels=price_levels, candle_timestamp=candle_timestamp)
+        return item
 
-            except Exception as e:
-                print(f"Error checking signals for {pair}: {str(e)}")
+    def _analyze_stage(self, item):
+        """Generate technical signals and the indicator values shown in notifications"""
+        if not item['batch'].is_open(item['pair']):
+            # Timed out upstream; the result is already recorded
+            self._finish(item, 'timeout')
+            return None
+
+        data = item['data']
+        if self.analysis_pool is not None:
+            with metrics.timer('indicators'):
+                item['technical_signals'], item['indicators'] = self.analysis_pool.submit(
+                    _analyze_in_process, self.technical_analyzer._params(), data
+                ).result()
+            return item
+
+        with metrics.timer('indicators'):
+            item['technical_signals'] = self.technical_analyzer.generate_signals(
+                data, stream_key=(item['pair'], self.timeframe)
+            )
+        latest_data = data.iloc[-1]
+        item['indicators'] = {
+            'RSI': latest_data.get('rsi', 0),
+            'MACD': latest_data.get('macd', 0),
+            'Signal': latest_data.get('macd_signal', 0)
+        }
+        return item
+
+    def _generate_stage(self, items):
+        """Turn the technical signals of every queued pair into trading signals in one batch"""
+        ready = []
+        for item in items:
+            if item['batch'].is_open(item['pair']):
+                ready.append(item)
+            else:
+                # Timed out upstream; the result is already recorded
+                self._finish(item, 'timeout')
+        if not ready:
+            return []
+
+        news_sentiment = None
+        if any(item.get('news_sentiment') is not None for item in ready):
+            news_sentiment = [float('nan') if item.get('news_sentiment') is None else item['news_sentiment']
+                              for item in ready]
+        with metrics.timer('signal_generation'):
+            signals = self.signal_generator.generate_signals_batch(
+                [item['pair'] for item in ready],
+                self.signal_generator.rule_outcomes([item['technical_signals'] for item in ready]),
+                [item['price_levels']['current_price'] for item in ready],
+                news_sentiment
+            )
+
+        passed = []
+        for item, signal in zip(ready, signals):
+            self.candle_tracker.mark((item['pair'], self.timeframe), item['candle_timestamp'])
+            self._finish(item, 'signal' if signal else 'none')
+            if signal:
+                metrics.inc('signals_total', type=signal['type'])
+                signal['news_sentiment'] = item.get('news_sentiment')
+                signal['candle_timestamp'] = item['candle_timestamp']
+                item['signal'] = signal
+                passed.append(item)
+        return passed
+
+    def _notify_stage(self, item):
+        """Send the signal to Telegram and store it"""
+        signal = item['signal']
+        with metrics.timer('notification'):
+            self.telegram_notifier.send_trading_signal(
+                pair=signal['pair'],
+                signal_type=signal['type'],
+                entry_price=signal['entry'],
+                targets=signal['targets'],
+                stop_loss=signal['stop_loss'],
+                indicators=item['indicators'],
+                news_sentiment=signal['news_sentiment']
+            )
+        saved = None
+        if self.save_signal is not None:
+            with metrics.timer('db_write'):
+                saved = self.save_signal(signal, item['indicators'])
+        if self.signal_tracker is not None:
+            # Followed from the candle after the one the signal was read from, which was
+            # forming when it was sent
+            self.signal_tracker.add(
+                signal['pair'], signal['type'], signal['targets'], signal['stop_loss'],
+                since=signal['candle_timestamp'] + pd.Timedelta(milliseconds=timeframe_ms(self.timeframe)),
+                signal_id=getattr(saved, 'id', None)
+            )
+
+    def cycle_stats(self) -> Dict:
+        """Return the last cycle's counters plus average and max cycle duration"""
+        with self._stats_lock:
+            durations = list(self.cycle_durations)
+            stats = dict(self.last_cycle)
+        if durations:
+            stats.update(avg_duration=sum(durations) / len(durations), max_duration=max(durations))
+        return stats
+
+    def pipeline_stats(self) -> Dict:
+        """Return queue depth, busy workers and throughput counters per stage"""
+        return self.pipeline.stats() if self.pipeline else {}
@@ -0,0 +1,326 @@
+import threading
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+OUTCOMES = ('open', 'target_3', 'stop', 'expired')
+OPEN, TARGET_3, STOP, EXPIRED = range(4)
+STOP_SLOT = 3  # slot of the stop loss; targets use 0..2
+
+
+def _to_ms(timestamp) -> int:
+    return int(pd.Timestamp(timestamp).value // 1_000_000)
+
+
+class _LevelIndex:
+    """Sorted trigger prices of one pair and kind, with the signal and slot each belongs to"""
+
+    def __init__(self):
+        self.levels = np.empty(0)
+        self.signals = np.empty(0, dtype=np.int64)
+        self.slots = np.empty(0, dtype=np.int8)
+
+    def insert(self, levels, signals, slots) -> None:
+        positions = np.searchsorted(self.levels, levels)
+        self.levels = np.insert(self.levels, positions, levels)
+        self.signals = np.insert(self.signals, positions, signals)
+        self.slots = np.insert(self.slots, positions, slots)
+
+    def at_or_below(self, price: float) -> slice:
+        return slice(0, int(np.searchsorted(self.levels, price, side='right')))
+
+    def at_or_above(self, price: float) -> slice:
+        return slice(int(np.searchsorted(self.levels, price, side='left')), len(self.levels))
+
+    def keep(self, mask: np.ndarray) -> None:
+        self.levels, self.signals, self.slots = self.levels[mask], self.signals[mask], self.slots[mask]
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+
+class SignalTracker:
+    """Follows open trading signals until a candle reaches their third target or stop loss.
+
+    Targets and stops are kept per pair in price-sorted arrays, so a candle
+    only touches the levels inside its high/low range: two binary searches
+    per kind find them, whatever the number of open signals. A signal is
+    checked against candles that open after it was created; when a target
+    and the stop fall in the same candle the stop is assumed to come first,
+    as in Backtester. Signals older than ``max_age`` seconds expire.
+    Closed signals with a database id are written as inactive in bulk by
+    ``flush``, which also drops closed signals once ``compact_after`` have
+    piled up; a signal's index is only valid until then.
+    """
+
+    def __init__(self, max_age: float = 7 * 24 * 3600, capacity: int = 1024, compact_after: int = 1000):
+        self.max_age_ms = int(max_age * 1000)
+        self.compact_after = compact_after
+        self._size = 0
+        self._closed = 0  # closed signals still held in the arrays
+        self._dropped = np.zeros(len(OUTCOMES), dtype=np.int64)  # outcomes of compacted signals
+        self._ids = np.full(capacity, -1, dtype=np.int64)  # database ids, -1 if unsaved
+        self._since = np.zeros(capacity, dtype=np.int64)  # first candle open time (ms) checked
+        self._is_buy = np.zeros(capacity, dtype=bool)
+        self._targets_hit = np.zeros(capacity, dtype=np.int8)
+        self._outcome = np.zeros(capacity, dtype=np.int8)
+        self._pairs: List[str] = []
+        self._open: Dict[str, np.ndarray] = {}  # pair -> indexes of its open signals
+        # pair -> levels that trigger on a high at or above them / a low at or below them
+        self._rising: Dict[str, _LevelIndex] = {}
+        self._falling: Dict[str, _LevelIndex] = {}
+        self._last_candle: Dict[str, int] = {}
+        self._pending: List[int] = []  # database ids closed since the last flush
+        self._lock = threading.Lock()
+
+    def _grow(self, needed: int) -> None:
+        extra = max(len(self._ids), needed)
+        self._ids = np.concatenate([self._ids, np.full(extra, -1, dtype=np.int64)])
+        for name in ('_since', '_is_buy', '_targets_hit', '_outcome'):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros(extra, dtype=array.dtype)]))
+
+    def add(self, pair: str, signal_type: str, targets, stop_loss, since, signal_id: int = None) -> int:
+        """Start tracking a signal from the candle opening at or after ``since``; returns its index"""
+        return self.add_many([(pair, signal_type, targets, stop_loss, since, signal_id)])[0]
+
+    def add_many(self, signals) -> List[int]:
+        """Track ``(pair, signal_type, targets, stop_loss, since, signal_id)`` tuples; returns their indexes"""
+        signals = list(signals)
+        with self._lock:
+            if self._size + len(signals) > len(self._ids):
+                self._grow(self._size + len(signals) - len(self._ids))
+            indexes = list(range(self._size, self._size + len(signals)))
+            self._size += len(signals)
+
+            by_pair: Dict[str, Dict[str, list]] = {}
+            for index, (pair, signal_type, targets, stop_loss, since, signal_id) in zip(indexes, signals):
+                is_buy = signal_type == 'BUY'
+                self._ids[index] = -1 if signal_id is None else signal_id
+                self._since[index] = _to_ms(since)
+                self._is_buy[index] = is_buy
+                self._pairs.append(pair)
+
+                # A BUY reaches its targets on the way up and its stop on the way down, a SELL the opposite
+                up = [(level, index, slot) for slot, level in enumerate(targets) if level is not None]
+                down = [(stop_loss, index, STOP_SLOT)] if stop_loss is not None else []
+                if not is_buy:
+                    up, down = down, up
+                entry = by_pair.setdefault(pair, {'open': [], 'rising': [], 'falling': []})
+                entry['open'].append(index)
+                entry['rising'] += up
+                entry['falling'] += down
+
+            for pair, entry in by_pair.items():
+                # Open signals stay ordered by start time, so expiry only looks at the oldest
+                open_signals = np.concatenate([self._open.get(pair, np.empty(0, dtype=np.int64)),
+                                               np.array(entry['open'], dtype=np.int64)])
+                self._open[pair] = open_signals[np.argsort(self._since[open_signals], kind='stable')]
+                for book, levels in ((self._rising, entry['rising']), (self._falling, entry['falling'])):
+                    if levels:
+                        levels.sort(key=lambda level: level[0])
+                        prices, owners, slots = zip(*levels)
+                        book.setdefault(pair, _LevelIndex()).insert(
+                            np.array(prices, dtype=float), np.array(owners, dtype=np.int64),
+                            np.array(slots, dtype=np.int8)
+                        )
+            return indexes
+
+    @staticmethod
+    def _row(row) -> tuple:
+        return (row.pair, row.signal_type, [row.target_1, row.target_2, row.target_3],
+                row.stop_loss, row.created_at, row.id)
+
+    def add_row(self, row) -> int:
+        """Track a stored TradingSignal"""
+        return self.add_many([self._row(row)])[0]
+
+    def load_active(self, session=None) -> int:
+        """Track every active signal in the trading_signals table; returns how many were loaded"""
+        try:
+            from .database import db_session
+            from .models import TradingSignal
+
+            session = session or db_session
+            rows = session.query(TradingSignal).filter(TradingSignal.is_active.is_(True)).all()
+            with self._lock:
+                tracked = set(self._ids[:self._size].tolist())
+            return len(self.add_many(self._row(row) for row in rows if row.id not in tracked))
+        except Exception as e:
+            print(f"Error loading active signals: {str(e)}")
+            return 0
+
+    def open_pairs(self) -> Dict[str, int]:
+        """Pairs with open signals and the open time (ms) of the first candle update still needs"""
+        with self._lock:
+            return {
+                pair: self._last_candle.get(pair, int(self._since[open_signals].min()))
+                for pair, open_signals in self._open.items() if len(open_signals)
+            }
+
+    def update(self, pair: str, candles: pd.DataFrame) -> List[Dict]:
+        """Check ``pair``'s open signals against its closed candles not seen yet.
+
+        The last row of ``candles`` is taken to be the candle still forming
+        and is left for a later call. Returns the signals whose state
+        changed, as ``{'index', 'id', 'pair', 'type', 'targets_hit', 'outcome'}``.
+        """
+        if candles is None or len(candles) < 2 or len(self._open.get(pair, ())) == 0:
+            return []
+        closed = candles.iloc[:-1]
+        times = closed.index.as_unit('ms').asi8 if isinstance(closed.index, pd.DatetimeIndex) \
+            else np.asarray(closed.index, dtype=np.int64)
+        highs = closed['high'].to_numpy(dtype=float)
+        lows = closed['low'].to_numpy(dtype=float)
+
+        with self._lock:
+            last = self._last_candle.get(pair)
+            start = 0 if last is None else int(np.searchsorted(times, last, side='right'))
+            if start == len(times):
+                return []
+            self._last_candle[pair] = int(times[-1])
+            changed = {}
+            for i in range(start, len(times)):
+                if len(self._open.get(pair, ())) == 0:
+                    break
+                for index in self._evaluate(pair, int(times[i]), highs[i], lows[i]):
+                    changed[index] = self._event(index)
+            return list(changed.values())
+
+    def _evaluate(self, pair: str, time_ms: int, high: float, low: float) -> np.ndarray:
+        """Apply one candle to ``pair``'s open signals; returns the indexes that changed"""
+        rising, falling = self._rising.get(pair), self._falling.get(pair)
+        windows = []
+        if rising is not None:
+            windows.append((rising, rising.at_or_below(high)))
+        if falling is not None:
+            windows.append((falling, falling.at_or_above(low)))
+        hits = []  # (book, slice into it, reached mask)
+        for book, window in windows:
+            if window.start == window.stop:
+                continue
+            signals = book.signals[window]
+            reached = (self._outcome[signals] == OPEN) & (self._since[signals] <= time_ms)
+            hits.append((book, window, reached))
+
+        reached_signals = [book.signals[window][reached] for book, window, reached in hits]
+        reached_slots = [book.slots[window][reached] for book, window, reached in hits]
+        signals = np.concatenate(reached_signals) if reached_signals else np.empty(0, dtype=np.int64)
+        slots = np.concatenate(reached_slots) if reached_slots else np.empty(0, dtype=np.int8)
+
+        stopped = np.unique(signals[slots == STOP_SLOT])
+        targets = (slots != STOP_SLOT) & ~np.isin(signals, stopped)
+        np.maximum.at(self._targets_hit, signals[targets], slots[targets] + 1)
+        self._outcome[stopped] = STOP
+        completed = np.unique(signals[targets])
+        completed = completed[self._targets_hit[completed] == 3]
+        self._outcome[completed] = TARGET_3
+
+        open_signals = self._open[pair]
+        expired = np.empty(0, dtype=np.int64)
+        if len(open_signals) and self._since[open_signals[0]] + self.max_age_ms <= time_ms:
+            oldest = open_signals[:np.searchsorted(self._since[open_signals], time_ms - self.max_age_ms, side='right')]
+            expired = oldest[self._outcome[oldest] == OPEN]
+            self._outcome[expired] = EXPIRED
+        changed = np.union1d(np.union1d(signals[targets], stopped), expired)
+        if len(changed) == 0:
+            return changed
+
+        # Drop reached levels and everything belonging to closed signals
+        for book, window, reached in hits:
+            keep = np.ones(len(book), dtype=bool)
+            keep[np.arange(window.start, window.stop)[reached]] = False
+            book.keep(keep & (self._outcome[book.signals] == OPEN))
+        for book in (rising, falling):
+            if book is not None and len(book) and (self._outcome[book.signals] != OPEN).any():
+                book.keep(self._outcome[book.signals] == OPEN)
+        self._open[pair] = open_signals[self._outcome[open_signals] == OPEN]
+
+        closed = changed[self._outcome[changed] != OPEN]
+        self._closed += len(closed)
+        self._pending.extend(int(i) for i in self._ids[closed] if i >= 0)
+        return changed
+
+    def _event(self, index: int) -> Dict:
+        return {
+            'index': int(index),
+            'id': int(self._ids[index]) if self._ids[index] >= 0 else None,
+            'pair': self._pairs[index],
+            'type': 'BUY' if self._is_buy[index] else 'SELL',
+            'targets_hit': int(self._targets_hit[index]),
+            'outcome': OUTCOMES[self._outcome[index]]
+        }
+
+    def flush(self, session=None, chunk_size: int = 500) -> int:
+        """Mark the signals closed since the last flush inactive in the database; returns how many"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            self._compact()
+            return 0
+        try:
+            from .database import db_session
+            from .models import TradingSignal
+        except Exception as e:
+            print(f"Error updating signal states: {str(e)}")
+            with self._lock:
+                self._pending = pending + self._pending
+            return 0
+
+        session = session or db_session
+        try:
+            for start in range(0, len(pending), chunk_size):
+                session.query(TradingSignal).filter(
+                    TradingSignal.id.in_(pending[start:start + chunk_size])
+                ).update({TradingSignal.is_active: False}, synchronize_session=False)
+            session.commit()
+            self._compact()
+            return len(pending)
+        except Exception as e:
+            print(f"Error updating signal states: {str(e)}")
+            session.rollback()
+            with self._lock:
+                self._pending = pending + self._pending
+            return 0
+
+    def _compact(self) -> None:
+        """Drop closed signals from the arrays and the pair maps once enough have piled up"""
+        with self._lock:
+            # Signals waiting for their database write stay, so load_active does not track them twice
+            if self._closed < self.compact_after or self._pending:
+                return
+            keep = self._outcome[:self._size] == OPEN
+            size = int(keep.sum())
+            self._dropped += np.bincount(self._outcome[:self._size][~keep], minlength=len(OUTCOMES))
+            moved = np.full(self._size, -1, dtype=np.int64)
+            moved[keep] = np.arange(size)
+
+            for name in ('_ids', '_since', '_is_buy', '_targets_hit', '_outcome'):
+                array = getattr(self, name)
+                compacted = np.full_like(array, -1) if name == '_ids' else np.zeros_like(array)
+                compacted[:size] = array[:self._size][keep]
+                setattr(self, name, compacted)
+            self._pairs = [pair for pair, kept in zip(self._pairs, keep) if kept]
+            self._open = {pair: moved[open_signals] for pair, open_signals in self._open.items() if len(open_signals)}
+            for book in (self._rising, self._falling):
+                for pair in list(book):
+                    if pair in self._open and len(book[pair]):
+                        book[pair].signals = moved[book[pair].signals]
+                    else:
+                        del book[pair]
+            self._last_candle = {pair: time_ms for pair, time_ms in self._last_candle.items() if pair in self._open}
+            self._size = size
+            self._closed = 0
+
+    def state(self, index: int) -> Dict:
+        """Current state of a tracked signal"""
+        with self._lock:
+            return self._event(index)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            outcomes = np.bincount(self._outcome[:self._size], minlength=len(OUTCOMES))
+            stats = {name: int(count) for name, count in zip(OUTCOMES, outcomes + self._dropped)}
+            stats.update(pairs=sum(1 for open_signals in self._open.values() if len(open_signals)),
+                         pending_writes=len(self._pending), tracked=self._size)
+            return stats
@@ -1,36 +1,310 @@
 import telegram
 import asyncio
-from datetime import datetime
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from telegram.error import BadRequest, NetworkError, RetryAfter
+from .metrics import metrics
+from .rate_limiter import TokenBucket
+
+GLOBAL_MESSAGES_PER_SECOND = 30  # Telegram's overall bot limit
+CHAT_MESSAGES_PER_SECOND = 1  # per chat; groups allow about 20 a minute
+MAX_MESSAGE_LENGTH = 4096  # UTF-16 code units per Telegram message
+
+# Message templates, formatted with str.format
+SIGNAL_TEMPLATE = (
+    "🚨 <b>Trading Signal</b> 🚨\n\n"
+    "📊 Pair: {pair}\n"
+    "⚡ Signal: {signal_type}\n"
+    "💰 Entry Price: {entry_price:.8f}\n\n"
+    "🎯 Targets:\n{targets}"
+    "\n🛑 Stop Loss: {stop_loss:.8f}\n\n"
+    "{indicators}{news}"
+    "{footer}"
+    "\n⏰ Time: {timestamp}"
+)
+TARGET_LINE = "   Target {index}: {target:.8f}\n"
+INDICATORS_HEADER = "📈 Technical Indicators:\n"
+INDICATOR_LINES = {
+    'RSI': "   RSI: {value:.2f} ({label})\n",
+    'MACD': "   MACD: {value:.8f}\n",
+    'Signal': "   Signal Line: {value:.8f}\n"
+}
+OTHER_INDICATOR_LINE = "   {name}: {value}\n"
+NEWS_LINE = "\n📰 News Sentiment: {emoji} {sentiment:.2f}\n"
+FOOTER = "\n⚠️ This is using Binance Testnet data\n"
+DIGEST_HEADER = "📋 <b>Signal Digest</b>{part} · {count} signals\n⏰ {timestamp}\n"
+DIGEST_LINE = "\n{emoji} <b>{pair}</b> {signal_type} @ {entry_price:.8f}\n   🎯 {targets} · 🛑 {stop_loss:.8f}{extra}\n"
+DIGEST_EMOJI = {'BUY': "🟢", 'SELL': "🔴"}
+
+
+def _rsi_label(value):
+    return 'Oversold' if value < 30 else 'Overbought' if value > 70 else 'Neutral'
+
+
+def render_signal(pair, signal_type, entry_price, targets, stop_loss, indicators=None, news_sentiment=None,
+                  timestamp=None):
+    """Full HTML message for one trading signal"""
+    indicator_text = ''
+    if indicators:
+        indicator_text = INDICATORS_HEADER + ''.join(
+            INDICATOR_LINES[name].format(value=value, label=_rsi_label(value)) if name in INDICATOR_LINES
+            else OTHER_INDICATOR_LINE.format(name=name, value=value)
+            for name, value in indicators.items()
+        )
+    news_text = ''
+    if news_sentiment is not None:
+        emoji = "😊" if news_sentiment > 0 else "😐" if news_sentiment == 0 else "😟"
+        news_text = NEWS_LINE.format(emoji=emoji, sentiment=news_sentiment)
+    return SIGNAL_TEMPLATE.format(
+        pair=pair,
+        signal_type=signal_type,
+        entry_price=entry_price,
+        targets=''.join(TARGET_LINE.format(index=i, target=t) for i, t in enumerate(targets, 1)),
+        stop_loss=stop_loss,
+        indicators=indicator_text,
+        news=news_text,
+        footer=FOOTER,
+        timestamp=timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    )
+
+
+def render_digest_line(pair, signal_type, entry_price, targets, stop_loss, indicators=None, news_sentiment=None):
+    """Compact digest entry for one trading signal"""
+    extra = ''
+    if indicators and 'RSI' in indicators:
+        extra += f" · RSI {indicators['RSI']:.1f}"
+    if news_sentiment is not None:
+        extra += f" · 📰 {news_sentiment:.2f}"
+    return DIGEST_LINE.format(
+        emoji=DIGEST_EMOJI.get(signal_type, "⚡"),
+        pair=pair,
+        signal_type=signal_type,
+        entry_price=entry_price,
+        targets=' / '.join(f"{t:.8f}" for t in targets),
+        stop_loss=stop_loss,
+        extra=extra
+    )
+
+
+def _message_length(text: str) -> int:
+    """Length as Telegram counts it (UTF-16 code units; emoji take two)"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def pack_digest(lines, timestamp=None, limit: int = MAX_MESSAGE_LENGTH):
+    """Pack digest lines into as few messages as fit within ``limit`` each"""
+    timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # Room for the longest header this digest can get
+    reserve = _message_length(DIGEST_HEADER.format(part=f" ({len(lines)}/{len(lines)})", count=len(lines),
+                                                   timestamp=timestamp) + FOOTER)
+    chunks, current, size = [], [], reserve
+    for line in lines:
+        length = _message_length(line)
+        if current and size + length > limit:
+            chunks.append(current)
+            current, size = [], reserve
+        current.append(line)
+        size += length
+    if current:
+        chunks.append(current)
+
+    messages = []
+    for number, chunk in enumerate(chunks, 1):
+        part = f" ({number}/{len(chunks)})" if len(chunks) > 1 else ''
+        header = DIGEST_HEADER.format(part=part, count=len(chunk), timestamp=timestamp)
+        messages.append(header + ''.join(chunk) + FOOTER)
+    return messages
+
+
+class TelegramDispatcher:
+    """Delivers Telegram messages from a background thread with its own event loop.
+
+    ``submit`` only appends to a queue, so callers such as the monitor's
+    notify stage never wait on the network. The worker keeps one
+    initialized Bot (and so one HTTP connection pool) for its lifetime,
+    paces sends with a global and a per-chat token bucket, and on a 429
+    pauses for the ``retry_after`` Telegram asks for before trying the
+    same message again. When ``max_queue`` messages are waiting the
+    oldest is dropped.
+    """
+
+    def __init__(self, bot, max_queue: int = 1000, max_retries: int = 5,
+                 global_rate: float = GLOBAL_MESSAGES_PER_SECOND, chat_rate: float = CHAT_MESSAGES_PER_SECOND):
+        self.bot = bot
+        self.max_retries = max_retries
+        self.chat_rate = chat_rate
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_buckets = {}
+        self._queue = deque(maxlen=max_queue)
+        self._lock = threading.Lock()
+        self._wakeup = None
+        self._loop = None
+        self._thread = None
+        self._running = False
+        self._idle = threading.Event()
+        self._idle.set()
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._loop = asyncio.new_event_loop()
+            self._wakeup = asyncio.Event()
+            self._thread = threading.Thread(target=self._run, name='telegram-dispatcher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        """Deliver what is queued (for up to ``timeout`` seconds), then stop the worker"""
+        self.flush(timeout)
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+        self._thread.join(timeout)
+
+    def submit(self, chat_id, text: str, parse_mode: str = 'HTML') -> None:
+        """Queue a message and return at once"""
+        self.start()
+        with self._lock:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+                metrics.inc('telegram_dropped_total')
+            self._queue.append((chat_id, text, parse_mode))
+            self._idle.clear()
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every queued message was delivered or given up on"""
+        return self._idle.wait(timeout)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._work())
+        finally:
+            self._loop.close()
+
+    async def _work(self) -> None:
+        initialize = getattr(self.bot, 'initialize', None)
+        if initialize is not None:
+            try:
+                await initialize()
+            except Exception as e:
+                print(f"Error initializing Telegram bot: {str(e)}")
+        try:
+            while True:
+                with self._lock:
+                    message = self._queue.popleft() if self._queue else None
+                    if message is None:
+                        self._idle.set()
+                        self._wakeup.clear()
+                if message is not None:
+                    await self._deliver(*message)
+                elif not self._running:
+                    return
+                else:
+                    await self._wakeup.wait()
+        finally:
+            shutdown = getattr(self.bot, 'shutdown', None)
+            if shutdown is not None:
+                try:
+                    await shutdown()
+                except Exception as e:
+                    print(f"Error closing Telegram bot: {str(e)}")
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(1, self.chat_rate)
+        return bucket
+
+    async def _deliver(self, chat_id, text: str, parse_mode: str) -> None:
+        chat_bucket = self._chat_bucket(chat_id)
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(max(chat_bucket.reserve(1), self.global_bucket.reserve(1)))
+            try:
+                with metrics.timer('telegram_send'):
+                    await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                self.sent += 1
+                return
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                # Flood control applies to the whole bot, so hold back every chat
+                self.global_bucket.pause(retry_after)
+                chat_bucket.pause(retry_after)
+                error = e
+            except BadRequest as e:
+                # Malformed message or unknown chat: retrying cannot help
+                error = e
+                break
+            except NetworkError as e:
+                await asyncio.sleep(min(2 ** attempt, 30))
+                error = e
+            except Exception as e:
+                error = e
+                break
+            self.retries += 1
+            metrics.inc('telegram_retries_total')
+        self.failed += 1
+        print(f"Error sending Telegram message: {str(error)}")
+        metrics.inc('telegram_errors_total')
+
+    def stats(self):
+        return {'queued': self.pending(), 'sent': self.sent, 'retries': self.retries,
+                'failed': self.failed, 'dropped': self.dropped}
+
 
 class TelegramNotifier:
-    def __init__(self, token, chat_id):
+    def __init__(self, token, chat_id, bot=None, max_queue: int = 1000, digest: bool = False,
+                 digest_window: float = None):
         self.token = token
         self.chat_id = chat_id
-        self.bot = None
-        self.enabled = False
+        self.bot = bot
+        self.enabled = bot is not None and chat_id is not None
+        self.dispatcher = None
+        # With digest on, signals are collected and sent together by flush_digest, which the
+        # monitor calls after each cycle and a timer calls digest_window seconds after the first one
+        self.digest = digest
+        self.digest_window = digest_window
+        self._digest_signals = []
+        self._digest_timer = None
+        self._digest_lock = threading.Lock()
 
-        if token and chat_id:
+        if bot is None and token and chat_id:
             try:
                 self.bot = telegram.Bot(token=token)
                 self.enabled = True
             except Exception as e:
                 print(f"Error initializing Telegram bot: {str(e)}")
                 print("Telegram notifications will be disabled")
+        if self.enabled:
+            self.dispatcher = TelegramDispatcher(self.bot, max_queue=max_queue)
 
-    async def send_message(self, message):
-        """Send message to Telegram channel"""
+    def queue_message(self, message):
+        """Hand a message to the background dispatcher without waiting for delivery"""
         if not self.enabled:
             print("Telegram notifications are disabled")
             return
+        self.dispatcher.submit(self.chat_id, message)
 
-        try:
-            await self.bot.send_message(
-                chat_id=self.chat_id,
-                text=message,
-                parse_mode='HTML'
-            )
-        except Exception as e:
-            print(f"Error sending Telegram message: {str(e)}")
+    def close(self, timeout: float = 10):
+        """Send any pending digest, deliver queued messages and stop the dispatcher"""
+        self.flush_digest()
+        if self.dispatcher is not None:
+            self.dispatcher.stop(timeout)
 
     def send_trading_signal(self, pair, signal_type, entry_price, targets, stop_loss, indicators=None, news_sentiment=None):
         """Send trading signal with formatted message"""
@@ -38,51 +312,48 @@ class TelegramNotifier:
             print("Telegram notifications are disabled")
             return
 
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        message = f"🚨 <b>Trading Signal</b> 🚨\n\n"
-        message += f"📊 Pair: {pair}\n"
-        message += f"⚡ Signal: {signal_type}\n"
-        message += f"💰 Entry Price: {entry_price:.8f}\n\n"
-
-        message += "🎯 Targets:\n"
-        for i, target in enumerate(targets, 1):
-            message += f"   Target {i}: {target:.8f}\n"
-
-        message += f"\n🛑 Stop Loss: {stop_loss:.8f}\n\n"
-
-        if indicators:
-            message += "📈 Technical Indicators:\n"
-            for indicator, value in indicators.items():
-                if indicator == 'RSI':
-                    message += f"   RSI: {value:.2f} ({'Oversold' if value < 30 else 'Overbought' if value > 70 else 'Neutral'})\n"
-                elif indicator == 'MACD':
-                    message += f"   MACD: {value:.8f}\n"
-                elif indicator == 'Signal':
-                    message += f"   Signal Line: {value:.8f}\n"
-                else:
-                    message += f"   {indicator}: {value}\n"
+        signal = dict(pair=pair, signal_type=signal_type, entry_price=entry_price, targets=targets,
+                      stop_loss=stop_loss, indicators=indicators, news_sentiment=news_sentiment)
+        if not self.digest:
+            self.queue_message(render_signal(**signal))
+            return
 
-        if news_sentiment is not None:
-            sentiment_emoji = "😊" if news_sentiment > 0 else "😐" if news_sentiment == 0 else "😟"
-            message += f"\n📰 News Sentiment: {sentiment_emoji} {news_sentiment:.2f}\n"
+        with self._digest_lock:
+            self._digest_signals.append(signal)
+            if self.digest_window and self._digest_timer is None:
+                self._digest_timer = threading.Timer(self.digest_window, self.flush_digest)
+                self._digest_timer.daemon = True
+                self._digest_timer.start()
 
-        message += f"\n⚠️ This is using Binance Testnet data\n"
-        message += f"\n⏰ Time: {timestamp}"
+    def flush_digest(self) -> int:
+        """Send the collected signals in as few messages as possible; returns the number of messages"""
+        with self._digest_lock:
+            signals, self._digest_signals = self._digest_signals, []
+            if self._digest_timer is not None:
+                self._digest_timer.cancel()
+                self._digest_timer = None
+        if not signals:
+            return 0
+        if len(signals) == 1:
+            self.queue_message(render_signal(**signals[0]))
+            return 1
 
-        # Send message asynchronously
-        asyncio.run(self.send_message(message))
+        messages = pack_digest([render_digest_line(**signal) for signal in signals])
+        for message in messages:
+            self.queue_message(message)
+        metrics.inc('telegram_digest_signals_total', len(signals))
+        return len(messages)
 
     def send_error(self, error_message):
         """Send error message to Telegram"""
         if not self.enabled:
             return
         message = f"❌ Error:\n{error_message}"
-        asyncio.run(self.send_message(message))
+        self.queue_message(message)
 
     def send_status_update(self, status_message):
         """Send status update to Telegram"""
         if not self.enabled:
             return
         message = f"ℹ️ Status Update:\n{status_message}"
-        asyncio.run(self.send_message(message))
\ No newline at end of file
+        self.queue_message(message)
\ No newline at end of file
@@ -4,15 +4,20 @@ import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime
 import json
+import threading
 from bot.analysis import TechnicalAnalyzer
 from bot.news_analyzer import NewsAnalyzer
 from bot.telegram_notifier import TelegramNotifier
 from bot.exchange_handler import ExchangeHandler
 from bot.signal_generator import SignalGenerator
+from bot.signal_tracker import SignalTracker
 from bot.database import init_db, db_session
 from bot.models import BotSettings, TradingSignal
 from utils.logger import setup_logger
 from bot.signal_monitor import SignalMonitor # Import SignalMonitor
+from bot.indicator_cache import indicator_cache
+from bot.metrics import metrics
+from bot.resampler import base_timeframe_for
 
 logger = setup_logger()
 
@@ -35,7 +40,12 @@ def save_settings_to_db(config):
     db_session.commit()
 
 def save_signal_to_db(signal_data, pair, technical_indicators=None, news_sentiment=None):
-    """Save trading signal to database"""
+    """Save trading signal to database.
+
+    Called from the monitor's notify threads, each with its own scoped
+    session; a failed commit is rolled back so the thread's session stays
+    usable, and None is returned.
+    """
     signal = TradingSignal(
         pair=pair,
         signal_type=signal_data['type'],
@@ -48,9 +58,91 @@ def save_signal_to_db(signal_data, pair, technical_indicators=None, news_sentime
         macd_value=technical_indicators.get('MACD') if technical_indicators else None,
         news_sentiment=news_sentiment
     )
-    db_session.add(signal)
-    db_session.commit()
-    return signal
+    try:
+        db_session.add(signal)
+        db_session.commit()
+        return signal
+    except Exception as e:
+        db_session.rollback()
+        logger.error(f"Error saving signal for {pair}: {str(e)}")
+        return None
+
+@st.cache_resource
+def get_bot_state():
+    """Objects kept across reruns and sessions of the app: signal state and the monitor"""
+    signal_generator = SignalGenerator()
+    # Keep cooldowns across restarts of the app
+    signal_generator.load_cooldowns()
+    signal_tracker = SignalTracker()
+    signal_tracker.load_active()
+    return {
+        'lock': threading.Lock(),
+        'signal_generator': signal_generator,
+        'signal_tracker': signal_tracker,
+        'news_analyzer': None,
+        'telegram_notifier': None,
+        'notifier_key': None,
+        'signal_monitor': None,
+        'monitor_key': None
+    }
+
+def get_news_analyzer(state):
+    """Return the shared NewsAnalyzer, so its post and per-currency caches outlive reruns"""
+    with state['lock']:
+        if state['news_analyzer'] is None:
+            state['news_analyzer'] = NewsAnalyzer()
+        return state['news_analyzer']
+
+def get_telegram_notifier(state, token, chat_id, digest):
+    """Return the shared Telegram notifier, replacing it when the bot token, chat or digest mode changes.
+
+    The replaced notifier is closed, which sends its pending digest, delivers
+    what it still has queued and stops its dispatcher thread.
+    """
+    key = (token, chat_id, digest)
+    previous = None
+    with state['lock']:
+        telegram_notifier = state['telegram_notifier']
+        if telegram_notifier is None or state['notifier_key'] != key:
+            previous = telegram_notifier
+            telegram_notifier = TelegramNotifier(
+                token,
+                chat_id,
+                digest=digest,
+                digest_window=60 if digest else None
+            )
+            state['telegram_notifier'] = telegram_notifier
+            state['notifier_key'] = key
+            if state['signal_monitor'] is not None:
+                state['signal_monitor'].telegram_notifier = telegram_notifier
+    if previous is not None:
+        previous.close()
+    return telegram_notifier
+
+def get_signal_monitor(state, exchange_handler, technical_analyzer, pairs, telegram_notifier, news_analyzer):
+    """Return the shared signal monitor, replacing it when the exchange, pairs or indicator settings change"""
+    key = (exchange_handler.exchange_id, tuple(pairs), technical_analyzer._params())
+    with state['lock']:
+        signal_monitor = state['signal_monitor']
+        if signal_monitor is None or state['monitor_key'] != key:
+            if signal_monitor is not None:
+                signal_monitor.stop()
+            signal_monitor = SignalMonitor(
+                exchange_handler=exchange_handler,
+                technical_analyzer=technical_analyzer,
+                signal_generator=state['signal_generator'],
+                telegram_notifier=telegram_notifier,
+                pairs=pairs,
+                save_signal=lambda signal, indicators: save_signal_to_db(
+                    signal, signal['pair'], indicators, signal.get('news_sentiment')
+                ),
+                signal_tracker=state['signal_tracker'],
+                news_analyzer=news_analyzer
+            )
+            state['signal_monitor'] = signal_monitor
+            state['monitor_key'] = key
+        signal_monitor.news_analyzer = news_analyzer
+        return signal_monitor
 
 def main():
     st.set_page_config(
@@ -129,6 +221,11 @@ def main():
             "Telegram Chat ID", 
             value=settings.get('telegram_chat_id', '')
         )
+        telegram_digest = st.sidebar.checkbox(
+            "📦 Об'єднувати сигнали циклу в дайджест",
+            value=settings.get('telegram_digest', False),
+            help="Сигнали, знайдені за один цикл перевірки, надсилаються кількома зведеними повідомленнями"
+        )
 
         # Save configuration button
         if st.sidebar.button("💾 Зберегти налаштування"):
@@ -141,7 +238,8 @@ def main():
                 'macd_signal': macd_signal,
                 'enable_news': enable_news,
                 'telegram_token': telegram_token,
-                'telegram_chat_id': telegram_chat_id
+                'telegram_chat_id': telegram_chat_id,
+                'telegram_digest': telegram_digest
             }
             save_settings_to_db(config)
             st.sidebar.success("✅ Налаштування збережено!")
@@ -173,20 +271,14 @@ def main():
             macd_signal=macd_signal
         )
 
-        if enable_news:
-            news_analyzer = NewsAnalyzer()
-
-        telegram_notifier = TelegramNotifier(telegram_token, telegram_chat_id)
-        signal_generator = SignalGenerator()
+        bot_state = get_bot_state()
+        news_analyzer = get_news_analyzer(bot_state) if enable_news else None
+        telegram_notifier = get_telegram_notifier(bot_state, telegram_token, telegram_chat_id, telegram_digest)
 
-        # Initialize signal monitor
+        # Signal monitor, shared by every rerun until its settings change
         pairs_list = [pair.strip() for pair in trading_pairs.split(",")]
-        signal_monitor = SignalMonitor(
-            exchange_handler=exchange_handler,
-            technical_analyzer=technical_analyzer,
-            signal_generator=signal_generator,
-            telegram_notifier=telegram_notifier,
-            pairs=pairs_list
+        signal_monitor = get_signal_monitor(
+            bot_state, exchange_handler, technical_analyzer, pairs_list, telegram_notifier, news_analyzer
         )
 
         # Add signal monitoring control
@@ -200,6 +292,15 @@ def main():
             signal_monitor.stop()
             st.sidebar.info("ℹ️ Моніторинг сигналів вимкнено")
 
+        # Performance metrics
+        metrics.enabled = st.sidebar.checkbox("📏 Збирати метрики продуктивності", value=metrics.enabled)
+        if metrics.enabled:
+            try:
+                metrics_port = metrics.start_http_server()
+                st.sidebar.caption(f"Prometheus: http://127.0.0.1:{metrics_port}/metrics")
+            except OSError as e:
+                st.sidebar.warning(f"⚠️ Не вдалося запустити сервер метрик: {str(e)}")
+
 
         # Display latest signals
         st.subheader("📊 Останні сигнали")
@@ -224,6 +325,12 @@ def main():
             index=0
         )
 
+        chart_timeframe = st.selectbox(
+            "Таймфрейм графіка",
+            ["5m", "15m", "1h", "4h", "1d", "1w"],
+            index=2
+        )
+
         # Add auto-refresh option
         auto_refresh = st.checkbox("🔄 Автоматичне оновлення", value=True)
         if auto_refresh:
@@ -231,8 +338,14 @@ def main():
 
         chart_placeholder = st.empty()
 
-        def plot_analysis(pair):
-            data = exchange_handler.get_ohlcv(pair)
+        def plot_analysis(pair, timeframe='1h'):
+            if timeframe == '1h':
+                data = exchange_handler.get_ohlcv(pair)
+            else:
+                # Other timeframes are built locally from stored finer candles
+                data = exchange_handler.get_resampled_ohlcv(
+                    pair, timeframe, base_timeframe=base_timeframe_for(timeframe)
+                )
             if data is not None:
                 fig = go.Figure()
 
@@ -250,7 +363,7 @@ def main():
                 technical_analyzer.add_indicators_to_plot(fig, data)
 
                 fig.update_layout(
-                    title=f'{pair} Аналіз',
+                    title=f'{pair} {timeframe} Аналіз',
                     yaxis_title='Ціна',
                     xaxis_title='Дата',
                     template='plotly_dark',
@@ -261,7 +374,7 @@ def main():
 
         # Display chart for selected pair
         try:
-            chart = plot_analysis(selected_pair)
+            chart = plot_analysis(selected_pair, chart_timeframe)
             if chart:
                 chart_placeholder.plotly_chart(chart, use_container_width=True)
             else:
@@ -269,6 +382,22 @@ def main():
         except Exception as e:
             st.error(f"❌ Помилка побудови графіка: {str(e)}")
 
+        # Stage latency summary
+        if metrics.enabled:
+            st.subheader("⏱️ Затримки етапів")
+            latency_rows = metrics.summary()
+            if latency_rows:
+                st.dataframe(pd.DataFrame(latency_rows).set_index('stage').round(1))
+            else:
+                st.info("Поки що немає вимірювань")
+
+        # Indicator cache statistics
+        cache_stats = indicator_cache.stats()
+        st.sidebar.caption(
+            f"🧮 Кеш індикаторів: {cache_stats['hits']} влучань / "
+            f"{cache_stats['misses']} промахів ({cache_stats['hit_rate']:.0%})"
+        )
+
     except Exception as e:
         st.error(f"❌ Помилка: {str(e)}")
         logger.error(f"Application error: {str(e)}")
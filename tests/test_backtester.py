@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from bot.analysis import TechnicalAnalyzer
+from bot.backtester import Backtester
+from bot.signal_generator import SignalGenerator
+
+
+def make_candles(n=800, seed=11):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.008, n)))
+    spread = rng.uniform(0.001, 0.012, n)
+    index = pd.date_range('2024-01-01', periods=n, freq='15min', name='timestamp')
+    return pd.DataFrame({'open': close, 'high': close * (1 + spread), 'low': close * (1 - spread),
+                         'close': close, 'volume': rng.uniform(1, 10, n)}, index=index)
+
+
+def per_bar_trades(df, analyzer, generator, horizon):
+    """The live rules applied one bar at a time, each signal then followed candle by candle"""
+    indicators = analyzer.calculate_indicators(df.copy(), use_cache=False)
+    rows = [row for _, row in indicators.iterrows()]
+    high, low, close = (df[column].to_numpy() for column in ('high', 'low', 'close'))
+    trades, last_signal = [], None
+    for t in range(analyzer.warmup_bars(), len(df)):
+        technical_signals = analyzer._signals_from_rows(rows[t], rows[t - 1])
+        signal = generator._analyze_signals(technical_signals, {'current_price': close[t]}, None)
+        if signal is None:
+            continue
+        if last_signal is not None and (df.index[t] - last_signal).total_seconds() < generator.min_signal_interval:
+            continue
+        last_signal = df.index[t]
+
+        is_buy = signal['type'] == 'BUY'
+        targets_hit, outcome = 0, 'expired'
+        last_bar = min(horizon, len(df) - 1 - t)
+        bars_held, exit_price = last_bar, close[t + last_bar]
+        for offset in range(1, last_bar + 1):
+            bar = t + offset
+            # A stop inside the same candle as a target is taken to come first
+            if (low[bar] <= signal['stop_loss']) if is_buy else (high[bar] >= signal['stop_loss']):
+                outcome, bars_held, exit_price = 'stop', offset, signal['stop_loss']
+                break
+            while targets_hit < 3 and ((high[bar] >= signal['targets'][targets_hit]) if is_buy
+                                       else (low[bar] <= signal['targets'][targets_hit])):
+                targets_hit += 1
+            if targets_hit == 3:
+                outcome, bars_held, exit_price = 'target_3', offset, signal['targets'][2]
+                break
+        trades.append((df.index[t], signal['type'], signal['entry'], targets_hit, outcome, bars_held, exit_price))
+    return trades
+
+
+def test_backtest_matches_the_rules_applied_bar_by_bar():
+    df = make_candles()
+    analyzer, generator = TechnicalAnalyzer(), SignalGenerator()
+    backtester = Backtester(analyzer, generator, horizon=48)
+
+    trades, summary = backtester.run(df)
+    expected = per_bar_trades(df, analyzer, generator, horizon=48)
+
+    assert len(expected) > 5
+    assert {outcome for *_, outcome, _, _ in expected} >= {'stop', 'target_3'}
+    actual = list(trades[['timestamp', 'type', 'entry', 'targets_hit', 'outcome', 'bars_held',
+                          'exit_price']].itertuples(index=False, name=None))
+    assert [trade[:2] + trade[3:6] for trade in actual] == [trade[:2] + trade[3:6] for trade in expected]
+    np.testing.assert_allclose([trade[2] for trade in actual], [trade[2] for trade in expected])
+    np.testing.assert_allclose([trade[6] for trade in actual], [trade[6] for trade in expected])
+    assert summary.loc['PAIR', 'signals'] == len(expected)
+
+
+def test_cooldown_drops_signals_like_the_live_generator():
+    df = make_candles()
+    with_cooldown, _ = Backtester(horizon=48).run(df)
+    without, _ = Backtester(horizon=48, apply_cooldown=False).run(df)
+
+    assert len(without) > len(with_cooldown)
+    gaps = with_cooldown['timestamp'].diff().dropna()
+    assert (gaps >= pd.Timedelta(seconds=SignalGenerator().min_signal_interval)).all()
@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+
+from bot.candle_store import CandleStore
+
+HOUR_MS = 3600 * 1000
+
+
+def candles(start, count, close=1.0):
+    times = start + np.arange(count) * HOUR_MS
+    return np.column_stack([times] + [np.full(count, close)] * 5)
+
+
+def test_write_merges_by_timestamp(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.write('test', 'A/USDT', '1h', candles(0, 10))
+    assert store.write('test', 'A/USDT', '1h', candles(8 * HOUR_MS, 5, close=2.0)) == 13
+
+    rows = store.read('test', 'A/USDT', '1h')
+    assert np.all(np.diff(rows[:, 0]) == HOUR_MS)
+    assert rows[:8, 4].tolist() == [1.0] * 8 and rows[8:, 4].tolist() == [2.0] * 5
+    assert store.read('test', 'A/USDT', '1h', since=10 * HOUR_MS, limit=2)[:, 0].tolist() == [11 * HOUR_MS,
+                                                                                               12 * HOUR_MS]
+
+
+def test_reader_of_the_old_file_never_sees_a_partial_rewrite(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.write('test', 'A/USDT', '1h', candles(0, 100))
+    path = store.path('test', 'A/USDT', '1h')
+    # Stands in for another process that mapped the file just before a write
+    reader = CandleStore._map(path)
+
+    store.write('test', 'A/USDT', '1h', candles(50 * HOUR_MS, 80, close=2.0))
+
+    assert reader.shape == (100, 6)
+    assert np.all(reader[:, 4] == 1.0)
+    assert store.count('test', 'A/USDT', '1h') == 130
+    assert os.listdir(os.path.dirname(path)) == ['1h.f64']
@@ -0,0 +1,149 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from bot import exchange_handler
+from bot.async_exchange_handler import AsyncExchangeHandler
+from bot.candle_store import CandleStore
+from bot.exchange_handler import ExchangeHandler
+from bot.replay_exchange import AsyncReplayExchange, ReplayExchange
+from bot.resampler import OHLCVResampler, resample_ohlcv
+
+HOUR_MS = 3600 * 1000
+PAIR = 'ABC/USDT'
+
+
+@pytest.fixture(autouse=True)
+def resampler(monkeypatch):
+    # Finished bars are cached per (exchange, symbol), which every test here shares
+    monkeypatch.setattr(exchange_handler, 'ohlcv_resampler', OHLCVResampler())
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CandleStore(str(tmp_path / 'candles'))
+
+
+def replay_handler(store, exchange_type=ReplayExchange):
+    exchange = exchange_type(symbols=[PAIR], speed=0, start_time=1_700_000_000_000, candle_store=store)
+    return exchange, ExchangeHandler('replay', exchange=exchange)
+
+
+def assert_contiguous(store, timeframe_ms):
+    times = store.read('replay', PAIR, '1h')[:, 0]
+    assert np.all(np.diff(times) == timeframe_ms)
+
+
+def test_stale_store_is_caught_up_without_a_hole(store):
+    exchange, handler = replay_handler(store)
+    assert len(handler.get_ohlcv(PAIR, limit=100)) == 100
+
+    # Offline for longer than one request returns
+    exchange.advance(2500 * HOUR_MS)
+    df = handler.get_ohlcv(PAIR, limit=100)
+
+    assert len(df) == 100
+    assert store.count('replay', PAIR, '1h') == 2600
+    assert_contiguous(store, HOUR_MS)
+    now = exchange.milliseconds()
+    assert store.last_timestamp('replay', PAIR, '1h') == now - now % HOUR_MS
+
+
+def test_async_stale_store_is_caught_up_without_a_hole(store):
+    exchange = AsyncReplayExchange(symbols=[PAIR], speed=0, start_time=1_700_000_000_000, candle_store=store)
+
+    async def run():
+        handler = AsyncExchangeHandler('replay', exchange=exchange)
+        await handler.get_ohlcv(PAIR, limit=100)
+        exchange.advance(1500 * HOUR_MS)
+        return await handler.get_ohlcv(PAIR, limit=100)
+
+    assert len(asyncio.run(run())) == 100
+    assert store.count('replay', PAIR, '1h') == 1600
+    assert_contiguous(store, HOUR_MS)
+
+
+def test_gap_beyond_the_page_cap_falls_back_to_the_latest_window(store, monkeypatch, capsys):
+    monkeypatch.setattr(exchange_handler, 'MAX_CATCH_UP_PAGES', 1)
+    exchange, handler = replay_handler(store)
+    handler.get_ohlcv(PAIR, limit=100)
+    exchange.advance(1500 * HOUR_MS)
+
+    assert len(handler.get_ohlcv(PAIR, limit=100)) == 100
+    assert store.count('replay', PAIR, '1h') == 200
+    assert 'backfill_ohlcv' in capsys.readouterr().out
+
+
+def test_resampling_refills_a_hole_in_the_window(store, tmp_path):
+    exchange, handler = replay_handler(store)
+    handler.get_ohlcv(PAIR, limit=1000)
+    rows = store.read('replay', PAIR, '1h')
+
+    holed = CandleStore(str(tmp_path / 'holed'))
+    holed.write('replay', PAIR, '1h', np.delete(rows, np.s_[700:720], axis=0))
+    exchange.candle_store = holed
+    handler = ExchangeHandler('replay', exchange=exchange)
+    start_ms, _ = handler._resample_window('1d', '1h', 30)
+    assert handler._resample_from_store(PAIR, '1d', '1h', 30, start_ms) is None
+    assert handler._resample_from_store(PAIR, '1d', '1h', 30, start_ms, require_complete=False) is None
+    assert handler._store_hole(PAIR, '1h', start_ms) == int(rows[700, 0])
+
+    df = handler.get_resampled_ohlcv(PAIR, '1d', limit=30)
+    expected = resample_ohlcv(CandleStore.to_frame(rows[rows[:, 0] >= start_ms]), '1d', '1h')
+    np.testing.assert_allclose(df.to_numpy(), expected.to_numpy())
+    np.testing.assert_array_equal(holed.read('replay', PAIR, '1h'), rows)
+
+
+def test_young_pair_is_resampled_from_what_exists(store):
+    exchange, handler = replay_handler(store)
+    handler.get_ohlcv(PAIR, limit=100)
+    start_ms, _ = handler._resample_window('1d', '1h', 30)
+
+    df = handler._resample_from_store(PAIR, '1d', '1h', 30, start_ms, require_complete=False)
+    assert len(df) == len(np.unique(store.read('replay', PAIR, '1h')[:, 0] // (24 * HOUR_MS)))
+
+
+class FlakyReplayExchange(ReplayExchange):
+    """Records every fetch_ohlcv ``since``; fails once on the page starting at ``fail_at``"""
+
+    def __init__(self, fail_at=None, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_at = fail_at
+        self.requests = []
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params=None):
+        self.requests.append(since)
+        if since == self.fail_at:
+            self.fail_at = None
+            raise RuntimeError('connection reset')
+        return super().fetch_ohlcv(symbol, timeframe, since=since, limit=limit, params=params)
+
+
+def test_interrupted_backfill_resumes_from_its_progress(store, tmp_path):
+    start_time = 1_700_000_000_000
+    page_ms = 100 * HOUR_MS
+    start = start_time - start_time % HOUR_MS - 1000 * HOUR_MS
+    first_page = start - start % page_ms
+    fail_at = first_page + 4 * page_ms
+    exchange = FlakyReplayExchange(fail_at=fail_at, symbols=[PAIR], speed=0, start_time=start_time,
+                                   candle_store=store)
+    handler = ExchangeHandler('replay', exchange=exchange)
+
+    with pytest.raises(RuntimeError):
+        handler.backfill_ohlcv(PAIR, start=start, end=start_time, page_limit=100, max_workers=1)
+    assert store.count('replay', PAIR, '1h') > 0
+
+    exchange.requests.clear()
+    stats = handler.backfill_ohlcv(PAIR, start=start, end=start_time, page_limit=100, max_workers=2)
+    # Finished pages are not requested again; the partial first page at the range's edge is
+    assert stats['skipped_pages'] == 3
+    assert not [since for since in exchange.requests if first_page + page_ms <= since < fail_at]
+    assert start in exchange.requests and fail_at in exchange.requests
+    assert store.count('replay', PAIR, '1h') >= 1000
+    assert_contiguous(store, HOUR_MS)
+
+    fresh = CandleStore(str(tmp_path / 'fresh'))
+    clean = ReplayExchange(symbols=[PAIR], speed=0, start_time=start_time, candle_store=fresh)
+    ExchangeHandler('replay', exchange=clean).backfill_ohlcv(PAIR, start=start, end=start_time, page_limit=100)
+    np.testing.assert_array_equal(store.read('replay', PAIR, '1h'), fresh.read('replay', PAIR, '1h'))
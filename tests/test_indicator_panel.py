@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from bot.analysis import INDICATOR_COLUMNS, TechnicalAnalyzer
+
+
+def test_panel_matches_per_symbol_indicators_with_late_listing():
+    rng = np.random.default_rng(1)
+    n = 200
+    panel = pd.DataFrame({
+        'A': 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n))),
+        'B': 50 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    })
+    panel.iloc[:80, 1] = np.nan  # B is listed later
+
+    analyzer = TechnicalAnalyzer()
+    indicators = analyzer.calculate_indicator_panel(panel)
+    for column, symbol in enumerate(panel.columns):
+        listed = panel[symbol].notna().to_numpy()
+        expected = analyzer.calculate_indicators(panel[[symbol]].dropna().rename(columns={symbol: 'close'}),
+                                                 use_cache=False)
+        for name in INDICATOR_COLUMNS:
+            got = indicators[name][:, column]
+            assert np.isnan(got[~listed]).all(), name
+            np.testing.assert_allclose(got[listed], expected[name].to_numpy(), rtol=1e-9, atol=1e-9,
+                                       equal_nan=True, err_msg=f"{symbol} {name}")
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bot.analysis import INDICATOR_COLUMNS, IndicatorStream, TechnicalAnalyzer
+
+
+def make_candles(n=300, seed=7, start='2024-01-01'):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    index = pd.date_range(start, periods=n, freq='1h', name='timestamp')
+    return pd.DataFrame({
+        'open': close,
+        'high': close * 1.01,
+        'low': close * 0.99,
+        'close': close,
+        'volume': rng.uniform(1, 10, n)
+    }, index=index)
+
+
+def batch_indicators(df):
+    return TechnicalAnalyzer().calculate_indicators(df.copy(), use_cache=False)
+
+
+def assert_rows_match(recent, expected):
+    expected = expected.loc[recent.index]
+    for column in ['close'] + INDICATOR_COLUMNS:
+        np.testing.assert_allclose(recent[column].to_numpy(), expected[column].to_numpy(),
+                                   rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=column)
+
+
+def test_stream_matches_batch_on_every_row():
+    df = make_candles()
+    stream = IndicatorStream(history=len(df))
+    for timestamp, close in df['close'].items():
+        stream.update(timestamp, close)
+
+    assert_rows_match(stream.frame(), batch_indicators(df))
+
+
+def test_appended_candles_match_batch():
+    df = make_candles()
+    analyzer = TechnicalAnalyzer()
+    analyzer.update_indicators(df.iloc[:120], 'BTC/USDT')
+    for stop in range(121, len(df) + 1, 7):
+        recent = analyzer.update_indicators(df.iloc[:stop], 'BTC/USDT')
+        assert_rows_match(recent, batch_indicators(df.iloc[:stop]))
+
+
+def test_revised_forming_candle_matches_batch():
+    df = make_candles()
+    analyzer = TechnicalAnalyzer()
+    forming = df.iloc[:200].copy()
+    for close in (95.0, 130.0, df['close'].iloc[199] * 1.02):
+        forming.iloc[-1, forming.columns.get_loc('close')] = close
+        recent = analyzer.update_indicators(forming, 'BTC/USDT')
+        assert_rows_match(recent, batch_indicators(forming))
+
+    # The candle closes with its final value
+    recent = analyzer.update_indicators(df.iloc[:201], 'BTC/USDT')
+    assert_rows_match(recent, batch_indicators(df.iloc[:201]))
+
+
+def test_stream_resets_after_gap():
+    df = make_candles(600)
+    analyzer = TechnicalAnalyzer()
+    analyzer.update_indicators(df.iloc[:200], 'BTC/USDT')
+
+    # The new frame no longer contains the last candle seen, so the stream is rebuilt from it
+    later = df.iloc[300:]
+    recent = analyzer.update_indicators(later, 'BTC/USDT')
+    assert_rows_match(recent, batch_indicators(later))
+
+    analyzer.reset_stream('BTC/USDT')
+    recent = analyzer.update_indicators(df.iloc[:250], 'BTC/USDT')
+    assert_rows_match(recent, batch_indicators(df.iloc[:250]))
+
+
+def test_older_candle_is_rejected():
+    stream = IndicatorStream()
+    stream.update(pd.Timestamp('2024-01-02'), 100.0)
+    with pytest.raises(ValueError):
+        stream.update(pd.Timestamp('2024-01-01'), 101.0)
+
+
+def test_generate_signals_with_stream_matches_batch():
+    df = make_candles(400, seed=3)
+    batch = TechnicalAnalyzer()
+    streamed = TechnicalAnalyzer()
+    for stop in range(60, len(df) + 1):
+        window = df.iloc[:stop]
+        assert streamed.generate_signals(window.copy(), stream_key='ETH/USDT') == \
+            batch.generate_signals(window.copy())
@@ -0,0 +1,104 @@
+import os
+import threading
+
+import pytest
+
+from bot.order_book import OrderBook, replay
+
+RECORDING = os.path.join(os.path.dirname(__file__), 'data', 'order_book_gap.jsonl')
+
+# The book at update 105, covering the two updates missing from the recording
+SNAPSHOT_105 = {
+    'lastUpdateId': 105,
+    'bids': [['99.5', '0.5'], ['99.0', '1.5'], ['98.0', '2.0'], ['97.0', '3.0'], ['96.0', '1.0']],
+    'asks': [['101.5', '1.0'], ['102.0', '2.5'], ['103.0', '4.0']]
+}
+
+
+def diff(first, last, bids=(), asks=()):
+    return {'U': first, 'u': last, 'b': list(bids), 'a': list(asks)}
+
+
+def test_replay_resyncs_over_a_gap():
+    snapshots = []
+
+    def fetch_snapshot():
+        snapshots.append(105)
+        return SNAPSHOT_105
+
+    mids = []
+    book = replay(RECORDING, book=OrderBook('BTC/USDT', fetch_snapshot=fetch_snapshot),
+                  on_update=lambda b: mids.append(b.mid()))
+
+    assert mids == [100.0, 100.75, 100.5, 100.5, 100.75]
+    assert snapshots == [105]
+    stats = book.stats()
+    assert stats['synced'] and stats['last_update_id'] == 108
+    assert (stats['gaps'], stats['resyncs'], stats['updates'], stats['buffered']) == (1, 1, 4, 0)
+
+    assert book.best_bid() == 100.0 and book.best_ask() == 101.5
+    assert book.spread() == 1.5
+    assert book.spread(relative=True) == pytest.approx(1.5 / 100.75)
+    assert book.depth(1) == {'bids': 1.0, 'asks': 2.0}
+    assert book.depth(1, quote=True) == {'bids': 100.0, 'asks': 203.0}
+    assert book.imbalance(pct=1) == pytest.approx(-1 / 3)
+    assert book.imbalance(levels=2) == pytest.approx(-0.5)
+    # 98.0 was removed after the snapshot; 96.0 only came with it
+    assert book.to_dict(limit=10)['bids'] == [[100.0, 1.0], [99.5, 0.5], [99.0, 1.5], [97.0, 3.0], [96.0, 1.0]]
+
+
+def test_replay_without_snapshot_source_stays_out_of_sync():
+    book = replay(RECORDING, 'BTC/USDT')
+    assert not book.synced
+    assert book.last_update_id == 103
+    assert book.stats()['buffered'] == 2
+
+
+def test_failed_resync_backs_off_instead_of_fetching_per_diff():
+    calls = []
+
+    def stale_snapshot():
+        calls.append(1)
+        return {'lastUpdateId': 50, 'bids': [['1', '1']], 'asks': [['2', '1']]}
+
+    book = OrderBook('BTC/USDT', fetch_snapshot=stale_snapshot, resync_delay=60)
+    book.apply_snapshot({'lastUpdateId': 100, 'bids': [['1', '1']], 'asks': [['2', '1']]})
+    assert not book.apply_diff(diff(105, 105))
+    for update_id in range(106, 130):
+        assert not book.apply_diff(diff(update_id, update_id))
+
+    assert len(calls) == 1
+    assert book.resync_failures == 1
+    assert book.stats()['buffered'] == 25
+
+    # Once a usable snapshot arrives the buffered diffs are replayed
+    book.fetch_snapshot = lambda: {'lastUpdateId': 104, 'bids': [['1', '1']], 'asks': [['2', '1']]}
+    assert book.resync()
+    assert book.last_update_id == 129 and book.resync_failures == 0
+
+
+def test_one_resync_at_a_time():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_snapshot():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'lastUpdateId': 104, 'bids': [['1', '1']], 'asks': [['2', '1']]}
+
+    book = OrderBook('BTC/USDT', fetch_snapshot=slow_snapshot)
+    book.apply_snapshot({'lastUpdateId': 100, 'bids': [['1', '1']], 'asks': [['2', '1']]})
+    resyncing = threading.Thread(target=book.apply_diff, args=(diff(105, 105),))
+    resyncing.start()
+    assert started.wait(5)
+
+    # Diffs during the snapshot request are buffered without another request
+    for update_id in range(106, 110):
+        assert not book.apply_diff(diff(update_id, update_id, bids=[['1', str(update_id)]]))
+    release.set()
+    resyncing.join(5)
+
+    assert len(calls) == 1
+    assert book.synced and book.last_update_id == 109
+    assert book.bid_sizes[-1] == 109.0
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+
+import ccxt
+
+from bot import rate_limiter
+from bot.rate_limiter import EXCHANGE_LIMITS, RateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_a_minute_from_a_full_bucket_stays_under_the_binance_limit(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', clock.monotonic)
+    bucket = TokenBucket(*EXCHANGE_LIMITS['binance'])
+
+    spent = 0
+    while clock.now < 1060.0:
+        wait = bucket.reserve(2)
+        if wait > 0:
+            clock.now += wait
+        if clock.now < 1060.0:
+            spent += 2
+    assert spent <= 6000
+
+
+class FakeExchange:
+    """Answers like ccxt: handle_errors gets each response's headers before a 429 is raised"""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        self.last_response_headers = {}
+        self.calls = 0
+
+    def handle_errors(self, code, reason, url, method, headers, body, response, request_headers, request_body):
+        if code == 429:
+            raise ccxt.RateLimitExceeded(f"fake {code}")
+
+    def fetch_ticker(self, symbol):
+        self.calls += 1
+        headers = {'Retry-After': str(self.retry_after[symbol])} if self.calls == 1 else {}
+        # Another thread's response lands in the shared attribute in between
+        self.last_response_headers = {'Retry-After': '99'}
+        self.handle_errors(429 if headers else 200, '', '', 'GET', headers, '', None, {}, None)
+        return {'symbol': symbol}
+
+
+def test_retry_after_comes_from_the_failed_response(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(rate_limiter.time, 'sleep', sleeps.append)
+    exchange = FakeExchange({'BTC/USDT': 3})
+    limiter = RateLimiter('test', capacity=1e6, refill_rate=1e6, base_delay=0.01)
+
+    assert limiter.call('fetch_ticker', exchange.fetch_ticker, 'BTC/USDT', exchange=exchange) == {'symbol': 'BTC/USDT'}
+    assert 3.0 in sleeps
+    assert 99.0 not in sleeps
+    assert limiter.metrics()['rejections'] == 1
+
+
+def test_retry_after_is_kept_apart_per_thread():
+    limiter = RateLimiter('test', capacity=1e6, refill_rate=1e6)
+    exchange = FakeExchange({})
+    rate_limiter.watch_responses(exchange)
+    barrier = threading.Barrier(2)
+    seen = {}
+
+    def request(name, seconds):
+        exchange.handle_errors(200, '', '', 'GET', {'Retry-After': str(seconds)}, '', None, {}, None)
+        barrier.wait()
+        seen[name] = limiter._retry_after(ccxt.RateLimitExceeded('fake'))
+
+    threads = [threading.Thread(target=request, args=(name, seconds)) for name, seconds in (('a', 1), ('b', 7))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen == {'a': 1.0, 'b': 7.0}
+
+
+def test_async_retry_after_comes_from_the_failed_response(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(rate_limiter.asyncio, 'sleep', fake_sleep)
+    exchange = FakeExchange({'ETH/USDT': 4})
+    limiter = RateLimiter('test', capacity=1e6, refill_rate=1e6, base_delay=0.01)
+
+    async def fetch_ticker(symbol):
+        return exchange.fetch_ticker(symbol)
+
+    result = asyncio.run(limiter.call_async('fetch_ticker', fetch_ticker, 'ETH/USDT', exchange=exchange))
+    assert result == {'symbol': 'ETH/USDT'}
+    assert 4.0 in sleeps
@@ -0,0 +1,53 @@
+import asyncio
+
+import pandas as pd
+
+from bot.exchange_handler import ExchangeHandler
+from bot.replay_exchange import AsyncReplayExchange, RecordingExchange, ReplayExchange
+
+PAIRS = ['ABC/USDT', 'XYZ/BTC']
+START = 1_700_000_000_000
+HOUR_MS = 3600 * 1000
+
+
+def test_recording_plays_back_the_same_responses(tmp_path, monkeypatch):
+    monkeypatch.setenv('REPLAY_STORE_DIR', str(tmp_path / 'stores'))
+    path = str(tmp_path / 'recording.jsonl')
+    source = ReplayExchange(symbols=PAIRS, speed=0, start_time=START)
+    recorder = RecordingExchange(source, path)
+
+    markets = recorder.load_markets(reload=True)
+    recorded_ohlcv = {pair: recorder.fetch_ohlcv(pair, '1h', since=START - 200 * HOUR_MS, limit=200)
+                      for pair in PAIRS}
+    ticker = recorder.fetch_ticker(PAIRS[0])
+    book = recorder.fetch_order_book(PAIRS[0], 20)
+    candles = ExchangeHandler('replay', exchange=recorder).get_ohlcv(PAIRS[1], '1h', limit=50)
+
+    replay = ReplayExchange(recording=path, speed=0)
+    assert replay.start_time == START
+    assert replay.symbols == PAIRS
+    assert replay.load_markets() == markets
+    for pair in PAIRS:
+        assert replay.fetch_ohlcv(pair, '1h', since=START - 200 * HOUR_MS, limit=200) == recorded_ohlcv[pair]
+    assert replay.fetch_ticker(PAIRS[0]) == ticker
+    assert replay.fetch_order_book(PAIRS[0], 20) == book
+    # Recorded pages are not padded with synthetic candles
+    assert replay.fetch_ohlcv(PAIRS[0], '1h', since=START - 500 * HOUR_MS, limit=500) == recorded_ohlcv[PAIRS[0]]
+
+    replayed = ExchangeHandler('replay', exchange=replay).get_ohlcv(PAIRS[1], '1h', limit=50)
+    pd.testing.assert_frame_equal(replayed, candles)
+
+
+def test_async_recording_plays_back_the_same_responses(tmp_path, monkeypatch):
+    monkeypatch.setenv('REPLAY_STORE_DIR', str(tmp_path / 'stores'))
+    path = str(tmp_path / 'recording.jsonl')
+    recorder = RecordingExchange(AsyncReplayExchange(symbols=PAIRS, speed=0, start_time=START), path)
+
+    async def record():
+        return (await recorder.fetch_ohlcv(PAIRS[0], '1h', limit=100),
+                await recorder.fetch_order_book(PAIRS[0], 10))
+
+    ohlcv, book = asyncio.run(record())
+    replay = ReplayExchange(recording=path, speed=0)
+    assert replay.fetch_ohlcv(PAIRS[0], '1h', limit=100) == ohlcv
+    assert replay.fetch_order_book(PAIRS[0], 10) == book
@@ -0,0 +1,68 @@
+import time
+
+from bot.replay_exchange import ReplayExchange
+from bot.sharded_monitor import ShardedMonitor
+
+HOUR_MS = 3600 * 1000
+
+
+class Notifier:
+    def __init__(self):
+        self.sent = []
+
+    def send_trading_signal(self, **signal):
+        self.sent.append(signal)
+
+
+def wait_for(condition, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def test_restarted_replay_shard_resumes_at_the_replay_time(tmp_path, monkeypatch):
+    monkeypatch.setenv('REPLAY_STORE_DIR', str(tmp_path))
+    pairs = [f"R{i}/USDT" for i in range(6)]
+    monitor = ShardedMonitor(pairs, Notifier(), shards=2, exchange_id='replay',
+                             replay_params={'speed': 3600.0})
+    store = monitor.candle_store
+    shard = 'shard-0'
+    pair = monitor.assignment[shard][0]
+
+    def stored_until():
+        return store.last_timestamp('replay', pair, '1h') or 0
+
+    def replay_now():
+        return monitor.config['replay']['start_time'] + monitor.replay_elapsed()
+
+    monitor.start()
+    try:
+        assert wait_for(lambda: stored_until() >= replay_now() - 3 * HOUR_MS, 30)
+        monitor.processes[shard].kill()
+        monitor.processes[shard].join(5)
+        monitor._check_health()
+        assert monitor.restarts[shard] == 1
+
+        restarted = stored_until()
+        # The new shard keeps fetching from where the store is, not from the replay's start
+        assert wait_for(lambda: stored_until() >= restarted + 3 * HOUR_MS, 30)
+        assert stored_until() >= replay_now() - 3 * HOUR_MS
+    finally:
+        monitor.stop(timeout=10)
+
+
+def test_replay_elapsed_matches_an_advanced_exchange(tmp_path, monkeypatch):
+    monkeypatch.setenv('REPLAY_STORE_DIR', str(tmp_path))
+    monitor = ShardedMonitor(['A/USDT'], Notifier(), shards=1, exchange_id='replay',
+                             replay_params={'speed': 0.0})
+    assert monitor.replay_elapsed() == 0
+
+    monitor._replay_started = time.time() - 10
+    monitor.config['replay']['speed'] = 600.0
+    exchange = ReplayExchange(symbols=['A/USDT'], **monitor.config['replay'])
+    exchange.advance(monitor.replay_elapsed())
+    expected = monitor.config['replay']['start_time'] + 10 * 1000 * 600
+    assert abs(exchange.milliseconds() - expected) < 1000 * 600
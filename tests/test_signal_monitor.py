@@ -0,0 +1,106 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from bot.analysis import TechnicalAnalyzer
+from bot.signal_generator import SignalGenerator
+from bot.signal_monitor import SignalMonitor
+
+SLOW = 'SLOW/USDT'
+
+
+def make_candles(n=150, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    index = pd.date_range('2024-01-01', periods=n, freq='1h', name='timestamp')
+    return pd.DataFrame({'open': close, 'high': close * 1.01, 'low': close * 0.99,
+                         'close': close, 'volume': rng.uniform(1, 10, n)}, index=index)
+
+
+class FakeHandler:
+    """Serves the same candles for every pair; pairs in ``blocked`` hang until ``release`` is set"""
+
+    exchange_id = 'fake'
+
+    def __init__(self, blocked=()):
+        self.blocked = set(blocked)
+        self.release = threading.Event()
+        self.candles = make_candles()
+
+    def get_ohlcv(self, pair, timeframe='1h', limit=100):
+        if pair in self.blocked:
+            self.release.wait(10)
+        return self.candles
+
+    def calculate_price_levels(self, pair):
+        close = float(self.candles['close'].iloc[-1])
+        return {'support_1': close * 0.97, 'support_2': close * 0.95, 'resistance_1': close * 1.03,
+                'resistance_2': close * 1.05, 'current_price': close}
+
+
+class Notifier:
+    def send_trading_signal(self, **signal):
+        pass
+
+
+def make_monitor(handler, **kwargs):
+    return SignalMonitor(handler, TechnicalAnalyzer(), SignalGenerator(), Notifier(), [SLOW], **kwargs)
+
+
+def test_pairs_of_a_torn_down_pipeline_are_checked_again():
+    handler = FakeHandler(blocked={SLOW})
+    monitor = make_monitor(handler, pair_timeout=0.5)
+
+    assert monitor._check_signals() == {SLOW: 'timeout'}
+    # The hung check still holds the pair
+    assert monitor._check_signals() == {SLOW: 'skipped'}
+
+    monitor.stop()
+    handler.blocked.clear()
+    assert monitor._check_signals()[SLOW] in ('signal', 'none')
+
+    # The abandoned check finishing late does not release the pair's newer check
+    handler.release.set()
+    time.sleep(0.2)
+    monitor.stop()
+
+
+def test_stop_returns_while_a_check_hangs():
+    handler = FakeHandler(blocked={SLOW})
+    monitor = make_monitor(handler, pair_timeout=30)
+    monitor.start()
+    deadline = time.time() + 5
+    while not monitor._in_flight and time.time() < deadline:
+        time.sleep(0.05)
+    assert SLOW in monitor._in_flight
+
+    started = time.monotonic()
+    monitor.stop(timeout=0.5)
+    assert time.monotonic() - started < 2
+    assert not monitor.is_running
+
+    # The cycle gives up on the hung pair; the old loop then waits for the stuck fetch thread
+    deadline = time.time() + 5
+    while not monitor.cycle_durations and time.time() < deadline:
+        time.sleep(0.05)
+    assert monitor.last_cycle['skipped'] == 1
+    old_thread = monitor.monitor_thread
+    assert old_thread.is_alive()
+
+    # A restart does not run two loops at once: the new one waits for the old to wind down
+    monitor.start()
+    handler.blocked.clear()
+    handler.release.set()
+    old_thread.join(35)
+    deadline = time.time() + 10
+    while len(monitor.cycle_durations) < 2 and time.time() < deadline:
+        time.sleep(0.05)
+    # The skipped pair was left unscheduled, so it is checked as soon as the new loop runs
+    assert len(monitor.cycle_durations) == 2
+    assert monitor.last_cycle['skipped'] == 0
+
+    monitor.stop(timeout=5)
+    monitor.monitor_thread.join(35)
+    assert monitor.pipeline is None
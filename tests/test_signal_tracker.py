@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from bot.signal_tracker import SignalTracker
+
+# flush imports bot.database, which builds its engine from DATABASE_URL
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+START = pd.Timestamp('2024-01-01')
+
+
+def candles(*bars):
+    """One hourly candle per ``(high, low)``, plus the forming candle update leaves alone"""
+    index = pd.date_range(START, periods=len(bars) + 1, freq='1h', name='timestamp')
+    highs = [high for high, _ in bars] + [np.nan]
+    lows = [low for _, low in bars] + [np.nan]
+    return pd.DataFrame({'open': 100.0, 'high': highs, 'low': lows, 'close': 100.0, 'volume': 1.0}, index=index)
+
+
+class FakeQuery:
+    def __init__(self, session):
+        self.session = session
+
+    def filter(self, *args):
+        return self
+
+    def update(self, values, synchronize_session=False):
+        self.session.updates += 1
+
+
+class FakeSession:
+    def __init__(self):
+        self.updates = 0
+
+    def query(self, model):
+        return FakeQuery(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_flush_compacts_closed_signals():
+    tracker = SignalTracker(compact_after=3)
+    # Three BUYs on A stop out at 95; one SELL on A and a BUY on B stay open
+    for signal_id in (1, 2, 3):
+        tracker.add('A/USDT', 'BUY', [105, 110, 115], 95, START, signal_id=signal_id)
+    tracker.add('A/USDT', 'SELL', [90, 85, 80], 120, START, signal_id=4)
+    tracker.add('B/USDT', 'BUY', [105, 110, 115], 95, START, signal_id=5)
+
+    events = tracker.update('A/USDT', candles((101, 94)))
+    assert sorted(event['id'] for event in events) == [1, 2, 3]
+
+    session = FakeSession()
+    assert tracker.flush(session=session) == 3
+    assert session.updates == 1
+    stats = tracker.stats()
+    assert (stats['tracked'], stats['stop'], stats['open']) == (2, 3, 2)
+    assert tracker._pairs == ['A/USDT', 'B/USDT']
+    assert sorted(tracker.open_pairs()) == ['A/USDT', 'B/USDT']
+    assert len(tracker._falling['A/USDT']) == 3 and len(tracker._rising['A/USDT']) == 1
+
+    # The kept signals are still followed under their new indexes
+    events = tracker.update('A/USDT', candles((101, 94), (99, 79)))
+    assert [(event['id'], event['outcome']) for event in events] == [(4, 'target_3')]
+    assert tracker.state(events[0]['index'])['id'] == 4
+    events = tracker.update('B/USDT', candles((116, 99)))
+    assert [(event['id'], event['outcome']) for event in events] == [(5, 'target_3')]
+
+    assert tracker.flush(session=session) == 2
+    assert tracker.stats()['tracked'] == 2  # below the threshold, nothing dropped yet
+    assert tracker.stats()['target_3'] == 2
+
+
+def test_signals_awaiting_their_write_are_not_compacted():
+    tracker = SignalTracker(compact_after=1)
+    tracker.add('A/USDT', 'BUY', [105, 110, 115], 95, START, signal_id=1)
+    tracker.update('A/USDT', candles((101, 94)))
+
+    class FailingSession(FakeSession):
+        def commit(self):
+            raise RuntimeError('database is locked')
+
+    assert tracker.flush(session=FailingSession()) == 0
+    assert tracker.stats()['tracked'] == 1
+    assert tracker.flush(session=FakeSession()) == 1
+    assert tracker.stats()['tracked'] == 0 and tracker.open_pairs() == {}
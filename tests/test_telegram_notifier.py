@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+from telegram.error import RetryAfter
+
+from bot.telegram_notifier import MAX_MESSAGE_LENGTH, TelegramDispatcher, pack_digest, render_digest_line
+
+
+class FakeBot:
+    """Records when each message went out; ``delay`` slows sends, ``flood`` rejects the first ones"""
+
+    def __init__(self, delay=0.0, flood=()):
+        self.delay = delay
+        self.flood = list(flood)
+        self.sent = []
+        self.attempts = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.attempts.append((time.monotonic(), chat_id, text))
+        if self.flood:
+            raise RetryAfter(self.flood.pop(0))
+        await asyncio.sleep(self.delay)
+        self.sent.append((time.monotonic(), chat_id, text))
+
+
+def gaps(times):
+    return [later - earlier for earlier, later in zip(times, times[1:])]
+
+
+def test_submit_does_not_wait_for_delivery():
+    bot = FakeBot(delay=0.3)
+    dispatcher = TelegramDispatcher(bot, global_rate=1000, chat_rate=1000)
+
+    started = time.monotonic()
+    for i in range(5):
+        dispatcher.submit(i, f"message {i}")
+    assert time.monotonic() - started < 0.2
+
+    assert dispatcher.flush(10)
+    dispatcher.stop()
+    assert [text for _, _, text in bot.sent] == [f"message {i}" for i in range(5)]
+    assert dispatcher.stats() == {'queued': 0, 'sent': 5, 'retries': 0, 'failed': 0, 'dropped': 0}
+
+
+def test_sends_are_paced_per_chat_and_globally():
+    bot = FakeBot()
+    dispatcher = TelegramDispatcher(bot, global_rate=1000, chat_rate=5)
+    for i in range(4):
+        dispatcher.submit('chat', f"message {i}")
+    assert dispatcher.flush(10)
+    dispatcher.stop()
+    assert all(gap >= 0.18 for gap in gaps([sent for sent, _, _ in bot.sent]))
+
+    bot = FakeBot()
+    dispatcher = TelegramDispatcher(bot, global_rate=5, chat_rate=1000)
+    for i in range(8):
+        dispatcher.submit(i, f"message {i}")
+    assert dispatcher.flush(10)
+    dispatcher.stop()
+    # The global bucket lets a burst of 5 through, then one every 0.2s
+    times = [sent for sent, _, _ in bot.sent]
+    assert times[-1] - times[0] >= 0.55
+    assert all(gap >= 0.18 for gap in gaps(times[4:]))
+
+
+def test_retry_after_pauses_every_chat_then_resends():
+    bot = FakeBot(flood=[1])
+    dispatcher = TelegramDispatcher(bot, global_rate=1000, chat_rate=1000)
+    dispatcher.submit('a', 'first')
+    dispatcher.submit('b', 'second')
+    assert dispatcher.flush(10)
+    dispatcher.stop()
+
+    assert [(chat, text) for _, chat, text in bot.attempts] == [('a', 'first'), ('a', 'first'), ('b', 'second')]
+    assert bot.attempts[1][0] - bot.attempts[0][0] >= 0.95
+    assert bot.attempts[2][0] - bot.attempts[0][0] >= 0.95
+    assert dispatcher.stats()['retries'] == 1 and dispatcher.stats()['sent'] == 2
+
+
+def utf16_length(text):
+    return len(text.encode('utf-16-le')) // 2
+
+
+def digest_lines(count):
+    return [render_digest_line(f"PAIR{i}/USDT", 'BUY' if i % 2 else 'SELL', 100.0 + i, [101.0, 102.0, 103.0],
+                               99.0, indicators={'RSI': 45.0}, news_sentiment=0.25) for i in range(count)]
+
+
+def test_digest_is_split_under_the_message_limit():
+    lines = digest_lines(120)
+    messages = pack_digest(lines, timestamp='2024-01-01 00:00:00')
+
+    assert len(messages) > 1
+    # Emoji count twice towards Telegram's limit, so Python's len would undercount
+    assert all(utf16_length(message) <= MAX_MESSAGE_LENGTH for message in messages)
+    assert any(len(message) < utf16_length(message) for message in messages)
+    assert ''.join(messages).count('PAIR') == 120
+    positions = [''.join(messages).index(line) for line in lines]
+    assert positions == sorted(positions)
+    for number, message in enumerate(messages, 1):
+        assert f"({number}/{len(messages)})" in message
+    # Every message but the last is filled as far as one more line allows
+    for message in messages[:-1]:
+        assert utf16_length(message) > MAX_MESSAGE_LENGTH - 2 * utf16_length(lines[0])
+
+
+def test_short_digest_is_one_message_without_part_numbers():
+    messages = pack_digest(digest_lines(3), timestamp='2024-01-01 00:00:00')
+    assert len(messages) == 1
+    assert '(1/1)' not in messages[0] and '3 signals' in messages[0]